@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""
+Shared Django bootstrap for the benchmark scripts.
+
+The benchmarks are run from the repository root as modules, e.g.
+``python -m benchmarks.verify_lookup``. They configure a throwaway Django
+project on either SQLite (default) or PostgreSQL.
+
+PostgreSQL is selected with ``--engine postgresql`` and reads the usual
+``PGHOST``, ``PGPORT``, ``PGUSER`` and ``PGPASSWORD`` environment variables.
+"""
+
+import os
+import statistics
+import tempfile
+
+import django
+from django.conf import settings
+
+PHONE_VERIFICATION = {
+    "BACKEND": "benchmarks.backends.NullBackend",
+    "OPTIONS": {},
+    "TOKEN_LENGTH": 6,
+    "MESSAGE": "Welcome to {app}! Please use security code {security_code} to proceed.",
+    "APP_NAME": "Phone Verify",
+    "SECURITY_CODE_EXPIRATION_SECONDS": 600,
+    "VERIFY_SECURITY_CODE_ONLY_ONCE": False,
+}
+
+
+def add_database_arguments(parser):
+    parser.add_argument(
+        "--engine",
+        choices=("sqlite", "postgresql"),
+        default="sqlite",
+        help="Database engine to benchmark against (default: sqlite)",
+    )
+    parser.add_argument(
+        "--name",
+        help="Database name (sqlite: file path, defaults to a temporary file)",
+    )
+
+
+def setup_django(options, **extra_settings):
+    """Configure settings for the selected database and run migrations."""
+    if options.engine == "postgresql":
+        database = {
+            "ENGINE": "django.db.backends.postgresql",
+            "NAME": options.name or "phone_verify_benchmark",
+            "HOST": os.environ.get("PGHOST", "localhost"),
+            "PORT": os.environ.get("PGPORT", "5432"),
+            "USER": os.environ.get("PGUSER", ""),
+            "PASSWORD": os.environ.get("PGPASSWORD", ""),
+        }
+    else:
+        name = options.name or os.path.join(tempfile.mkdtemp(), "benchmark.sqlite3")
+        # Writers in concurrent benchmarks wait for the database lock instead of failing.
+        database = {"ENGINE": "django.db.backends.sqlite3", "NAME": name, "OPTIONS": {"timeout": 30}}
+
+    django_settings = {
+        "SECRET_KEY": "benchmark-secret-key-at-least-32-bytes-long",
+        "DATABASES": {"default": database},
+        "INSTALLED_APPS": [
+            "django.contrib.auth",
+            "django.contrib.contenttypes",
+            "phone_verify",
+        ],
+        "USE_TZ": True,
+        "PHONE_VERIFICATION": dict(PHONE_VERIFICATION),
+    }
+    django_settings.update(extra_settings)
+    settings.configure(**django_settings)
+    django.setup()
+
+    from django.core.management import call_command
+
+    call_command("migrate", verbosity=0)
+
+
+def percentile(samples, pct):
+    """Return the ``pct`` percentile of ``samples`` (nearest-rank)."""
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def summarize(samples):
+    """Return mean/p50/p95/p99 of ``samples``, which are in seconds, in milliseconds."""
+    return {
+        "mean": statistics.mean(samples) * 1000 if samples else 0.0,
+        "p50": percentile(samples, 50) * 1000,
+        "p95": percentile(samples, 95) * 1000,
+        "p99": percentile(samples, 99) * 1000,
+    }
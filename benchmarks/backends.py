@@ -0,0 +1,15 @@
+# -*- coding: utf-8 -*-
+"""
+Stub SMS backends used by the benchmarks.
+
+Imported lazily through ``PHONE_VERIFICATION["BACKEND"]`` once Django is set up.
+"""
+
+from phone_verify.backends.base import BaseBackend
+
+
+class NullBackend(BaseBackend):
+    """Backend that never talks to a provider, so only our own code is measured."""
+
+    def send_sms(self, number, message):
+        return None
@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+"""
+Measure the cost of checking a security code stored as an HMAC digest.
+
+``HASH_SECURITY_CODES`` stores ``HMAC-SHA256(SECRET_KEY, phone number and
+code)`` instead of the code. This benchmark compares, per check:
+
+- ``plain``: ``constant_time_compare`` of the stored code
+- ``hmac``: ``security_code_digest`` plus ``hmac.compare_digest``
+- ``pbkdf2``: Django's default password hasher (``check_password``), which
+  is deliberately slow and only shown for contrast
+
+and then runs the ``verify_code`` scenario of ``benchmarks.endpoints`` with
+the option off and on, to show the end-to-end verify latency.
+
+Usage::
+
+    python -m benchmarks.code_hashing
+    python -m benchmarks.code_hashing --iterations 1000000 --requests 2000
+    python -m benchmarks.code_hashing --engine postgresql --name phone_verify_bench
+"""
+
+import argparse
+import hmac
+import time
+
+from ._django import add_database_arguments, setup_django
+
+DEFAULT_ITERATIONS = 100_000
+DEFAULT_PASSWORD_HASHER_ITERATIONS = 5
+DEFAULT_REQUESTS = 500
+
+PHONE_NUMBER = "+13478379634"
+SECURITY_CODE = "123456"
+
+
+def _per_call_us(check, iterations):
+    started = time.perf_counter()
+    for _ in range(iterations):
+        check()
+    return (time.perf_counter() - started) / iterations * 1_000_000
+
+
+def measure_code_checks(iterations=DEFAULT_ITERATIONS, password_hasher_iterations=DEFAULT_PASSWORD_HASHER_ITERATIONS):
+    """
+    Time one check of a correct code with each method.
+
+    :param password_hasher_iterations: checks timed for ``pbkdf2``; 0 skips it
+    :return: dict of method to ``{"us": microseconds per check, "bytes":
+        stored size}``
+    """
+    from django.contrib.auth.hashers import check_password, make_password
+    from django.utils.crypto import constant_time_compare
+
+    from phone_verify.storage import security_code_digest
+
+    digest = security_code_digest(PHONE_NUMBER, SECURITY_CODE)
+    results = {
+        "plain": {
+            "us": _per_call_us(lambda: constant_time_compare(SECURITY_CODE, SECURITY_CODE), iterations),
+            "bytes": len(SECURITY_CODE),
+        },
+        "hmac": {
+            "us": _per_call_us(
+                lambda: hmac.compare_digest(digest, security_code_digest(PHONE_NUMBER, SECURITY_CODE)), iterations
+            ),
+            "bytes": len(digest),
+        },
+    }
+    if password_hasher_iterations:
+        encoded = make_password(SECURITY_CODE)
+        results["pbkdf2"] = {
+            "us": _per_call_us(lambda: check_password(SECURITY_CODE, encoded), password_hasher_iterations),
+            "bytes": len(encoded),
+        }
+    return results
+
+
+def measure_verify(requests=DEFAULT_REQUESTS):
+    """Run the ``verify_code`` scenario with ``HASH_SECURITY_CODES`` off and on."""
+    from django.conf import settings
+    from django.test import override_settings
+
+    from .endpoints import run_scenario
+
+    results = {}
+    first_index = 0
+    for hashed in (False, True):
+        phone_verification = dict(settings.PHONE_VERIFICATION, STORAGE_OPTIONS={"HASH_SECURITY_CODES": hashed})
+        with override_settings(PHONE_VERIFICATION=phone_verification):
+            results["hmac" if hashed else "plain"] = run_scenario(
+                "verify_code", requests, concurrency=1, first_index=first_index
+            )
+        first_index += requests
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    add_database_arguments(parser)
+    parser.add_argument(
+        "--iterations",
+        type=int,
+        default=DEFAULT_ITERATIONS,
+        help=f"Checks timed per method (default: {DEFAULT_ITERATIONS})",
+    )
+    parser.add_argument(
+        "--password-hasher-iterations",
+        type=int,
+        default=DEFAULT_PASSWORD_HASHER_ITERATIONS,
+        help=f"Checks timed for pbkdf2, 0 to skip (default: {DEFAULT_PASSWORD_HASHER_ITERATIONS})",
+    )
+    parser.add_argument(
+        "--requests",
+        type=int,
+        default=DEFAULT_REQUESTS,
+        help=f"Verify requests per mode (default: {DEFAULT_REQUESTS})",
+    )
+    options = parser.parse_args(argv)
+
+    setup_django(options)
+
+    from django.db import connection
+
+    from phone_verify.models import SMSVerification
+
+    print("{:<8} {:>14} {:>13}".format("method", "us per check", "stored bytes"))
+    checks = measure_code_checks(options.iterations, options.password_hasher_iterations)
+    for method, result in checks.items():
+        print("{:<8} {us:>14.2f} {bytes:>13}".format(method, **result))
+
+    SMSVerification.objects.all().delete()
+    print("\nverify_code, {} requests on {}\n".format(options.requests, connection.vendor))
+    print("{:<8} {:>9} {:>9} {:>9}".format("storage", "p50 ms", "p95 ms", "p99 ms"))
+    for method, result in measure_verify(options.requests).items():
+        print("{:<8} {p50:>9.3f} {p95:>9.3f} {p99:>9.3f}".format(method, **result))
+
+
+if __name__ == "__main__":
+    main()
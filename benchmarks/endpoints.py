@@ -0,0 +1,264 @@
+# -*- coding: utf-8 -*-
+"""
+Load-test the register and verify endpoints and the services behind them.
+
+Each scenario sends ``--requests`` requests from ``--concurrency`` threads
+(each with its own database connection) against a stub backend, and reports
+throughput, p50/p95/p99 latency and database queries per request:
+
+- ``register``: ``POST /phone/register`` (``VerificationViewSet.register``)
+- ``verify``: ``POST /phone/verify`` (``VerificationViewSet.verify``)
+- ``send``: ``services.send_security_code_and_generate_session_token``
+- ``verify_code``: ``services.verify_security_code``
+
+Every request uses its own phone number, so the numbers measure the library
+rather than contention on a single row.
+
+Usage::
+
+    python -m benchmarks.endpoints
+    python -m benchmarks.endpoints --concurrency 1 8 32 --requests 2000
+    python -m benchmarks.endpoints --engine postgresql --name phone_verify_bench
+
+To catch regressions, save a run and compare later runs against it; the
+command exits with status 1 if any scenario's p95 latency or throughput is
+more than ``--max-regression`` worse, or it runs more queries per request::
+
+    python -m benchmarks.endpoints --save baseline.json
+    python -m benchmarks.endpoints --baseline baseline.json --max-regression 0.2
+"""
+
+import argparse
+import json
+import sys
+import threading
+import time
+
+from ._django import add_database_arguments, setup_django, summarize
+
+SCENARIOS = ("register", "verify", "send", "verify_code")
+DEFAULT_CONCURRENCY = (1, 4, 16)
+DEFAULT_REQUESTS = 500
+DEFAULT_MAX_REGRESSION = 0.2
+
+
+def _phone_number(index):
+    # Unique numbers that pass the serializers' validation (New York, 347 area code).
+    return "+1347{:03d}{:04d}".format(200 + index // 10_000, index % 10_000)
+
+
+class QueryCounter(object):
+    """``connection.execute_wrapper`` hook counting the queries of the current thread."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def _issue_codes(first_index, count):
+    """Store a code for each number and return ``[(phone_number, security_code, session_token)]``."""
+    from phone_verify.backends import get_sms_backend
+
+    backend = get_sms_backend(None)
+    numbers = [_phone_number(first_index + index) for index in range(count)]
+    return backend.create_security_codes_and_session_tokens(numbers)
+
+
+def _make_request(scenario, client):
+    """Return a callable sending one request of ``scenario`` for ``(index, issued)``."""
+    from phone_verify import services
+
+    if scenario == "register":
+        return lambda index, issued: client.post("/phone/register", {"phone_number": _phone_number(index)})
+    if scenario == "verify":
+        return lambda index, issued: client.post(
+            "/phone/verify",
+            {"phone_number": issued[0], "security_code": issued[1], "session_token": issued[2]},
+        )
+    if scenario == "send":
+        return lambda index, issued: services.send_security_code_and_generate_session_token(_phone_number(index))
+    if scenario == "verify_code":
+        return lambda index, issued: services.verify_security_code(issued[0], issued[1], issued[2])
+    raise ValueError("Unknown scenario {!r}".format(scenario))
+
+
+def _check_response(scenario, response):
+    status_code = getattr(response, "status_code", 200)
+    if status_code != 200:
+        raise RuntimeError("{} returned HTTP {}: {}".format(scenario, status_code, response.content[:200]))
+    if scenario == "verify_code" and response[1] != 0:
+        raise RuntimeError("verify_code returned status {}".format(response[1]))
+
+
+def run_scenario(scenario, requests, concurrency, first_index=0):
+    """
+    Send ``requests`` requests of ``scenario`` from ``concurrency`` threads.
+
+    With a concurrency of 1 the requests run in the calling thread.
+
+    :return: dict with ``throughput`` (requests/second), ``mean``, ``p50``,
+        ``p95`` and ``p99`` (milliseconds) and ``queries`` (per request)
+    """
+    from django.db import connection, connections
+    from django.test import Client
+
+    indexes = list(range(first_index, first_index + requests))
+    issued = {}
+    if scenario in ("verify", "verify_code"):
+        issued = {index: entry for index, entry in zip(indexes, _issue_codes(first_index, requests))}
+
+    timings = []
+    queries = []
+    errors = []
+    lock = threading.Lock()
+
+    def worker(worker_indexes):
+        send = _make_request(scenario, Client())
+        counter = QueryCounter()
+        worker_timings = []
+        try:
+            with connection.execute_wrapper(counter):
+                for index in worker_indexes:
+                    started = time.perf_counter()
+                    response = send(index, issued.get(index))
+                    worker_timings.append(time.perf_counter() - started)
+                    _check_response(scenario, response)
+        except Exception as exc:
+            errors.append(exc)
+        finally:
+            if threading.current_thread() is not threading.main_thread():
+                connections.close_all()
+        with lock:
+            timings.extend(worker_timings)
+            queries.append(counter.count)
+
+    started = time.perf_counter()
+    if concurrency <= 1:
+        worker(indexes)
+    else:
+        threads = [
+            threading.Thread(target=worker, args=(indexes[offset::concurrency],)) for offset in range(concurrency)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    elapsed = time.perf_counter() - started
+    if errors:
+        raise errors[0]
+
+    result = summarize(timings)
+    result["throughput"] = len(timings) / elapsed if elapsed else 0.0
+    result["queries"] = sum(queries) / len(timings) if timings else 0.0
+    return result
+
+
+def find_regressions(results, baseline, max_regression=DEFAULT_MAX_REGRESSION):
+    """
+    Compare ``results`` with ``baseline``, both ``{"scenario@concurrency": result}``.
+
+    :return: list of human-readable regressions, empty if there are none
+    """
+    regressions = []
+    for key, result in sorted(results.items()):
+        previous = baseline.get(key)
+        if previous is None:
+            continue
+        if result["p95"] > previous["p95"] * (1 + max_regression):
+            regressions.append(
+                "{}: p95 {:.3f}ms is more than {:.0%} above the baseline {:.3f}ms".format(
+                    key, result["p95"], max_regression, previous["p95"]
+                )
+            )
+        if result["throughput"] < previous["throughput"] * (1 - max_regression):
+            regressions.append(
+                "{}: throughput {:.1f}/s is more than {:.0%} below the baseline {:.1f}/s".format(
+                    key, result["throughput"], max_regression, previous["throughput"]
+                )
+            )
+        if result["queries"] > previous["queries"]:
+            regressions.append(
+                "{}: {:.2f} queries per request, the baseline ran {:.2f}".format(
+                    key, result["queries"], previous["queries"]
+                )
+            )
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    add_database_arguments(parser)
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--concurrency", type=int, nargs="+", default=list(DEFAULT_CONCURRENCY))
+    parser.add_argument(
+        "--requests",
+        type=int,
+        default=DEFAULT_REQUESTS,
+        help=f"Requests per scenario and concurrency level (default: {DEFAULT_REQUESTS})",
+    )
+    parser.add_argument("--save", help="Write the results as JSON to this file, to use as a baseline")
+    parser.add_argument("--baseline", help="Fail if the results regress from this JSON file")
+    parser.add_argument(
+        "--max-regression",
+        type=float,
+        default=DEFAULT_MAX_REGRESSION,
+        help=f"Allowed p95/throughput regression as a fraction (default: {DEFAULT_MAX_REGRESSION})",
+    )
+    options = parser.parse_args(argv)
+
+    setup_django(
+        options,
+        ROOT_URLCONF="phone_verify.urls",
+        ALLOWED_HOSTS=["testserver"],
+        INSTALLED_APPS=[
+            "django.contrib.auth",
+            "django.contrib.contenttypes",
+            "rest_framework",
+            "phone_verify",
+        ],
+    )
+
+    from django.db import connection
+
+    from phone_verify.models import SMSVerification
+
+    SMSVerification.objects.all().delete()
+    print("{} requests per run on {}\n".format(options.requests, connection.vendor))
+    print(
+        "{:<12} {:>11} {:>12} {:>9} {:>9} {:>9} {:>9}".format(
+            "scenario", "concurrency", "requests/s", "p50 ms", "p95 ms", "p99 ms", "queries"
+        )
+    )
+    results = {}
+    first_index = 0
+    for scenario in options.scenarios:
+        for concurrency in options.concurrency:
+            result = run_scenario(scenario, options.requests, concurrency, first_index=first_index)
+            first_index += options.requests
+            results["{}@{}".format(scenario, concurrency)] = result
+            print(
+                "{:<12} {:>11} {throughput:>12.1f} {p50:>9.3f} {p95:>9.3f} {p99:>9.3f} {queries:>9.2f}".format(
+                    scenario, concurrency, **result
+                )
+            )
+
+    if options.save:
+        with open(options.save, "w") as results_file:
+            json.dump(results, results_file, indent=2, sort_keys=True)
+
+    if options.baseline:
+        with open(options.baseline) as baseline_file:
+            regressions = find_regressions(results, json.load(baseline_file), options.max_regression)
+        if regressions:
+            print("\nRegressions against {}:".format(options.baseline))
+            for regression in regressions:
+                print("  " + regression)
+            sys.exit(1)
+        print("\nNo regressions against {}.".format(options.baseline))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""
+Measure the cost of generating and checking one session token.
+
+For each ``SESSION_TOKEN_FORMAT`` this times, per token:
+
+- ``generate``: ``generator.generate()`` with an expiry, as with
+  ``SIGNED_SESSION_TOKENS``
+- ``buffered``: the same with ``SESSION_TOKEN_OPTIONS = {"BUFFER_SIZE": ...}``
+- ``check``: ``generator.check()`` of a valid token
+
+and, for contrast, ``legacy``: the ``jwt.encode`` call with a
+``random.random()`` nonce that generated tokens before.
+
+Usage::
+
+    python -m benchmarks.session_tokens
+    python -m benchmarks.session_tokens --iterations 1000000 --buffer-size 4096
+"""
+
+import argparse
+import random
+import time
+
+from ._django import add_database_arguments, setup_django
+
+DEFAULT_ITERATIONS = 100_000
+DEFAULT_BUFFER_SIZE = 1024
+
+PHONE_NUMBER = "+13478379634"
+
+
+def _per_call_us(call, iterations):
+    started = time.perf_counter()
+    for _ in range(iterations):
+        call()
+    return (time.perf_counter() - started) / iterations * 1_000_000
+
+
+def measure_session_tokens(iterations=DEFAULT_ITERATIONS, buffer_size=DEFAULT_BUFFER_SIZE):
+    """
+    Time token generation and checking for every built-in format.
+
+    :return: dict of format to ``{"generate", "buffered", "check"}``
+        microseconds per token and ``"length"`` in characters, plus
+        ``"legacy"`` with ``generate`` and ``length`` only
+    """
+    import jwt
+    from django.conf import settings
+    from django.utils.module_loading import import_string
+
+    from phone_verify.constants import SESSION_TOKEN_GENERATORS
+    from phone_verify.tokens import SESSION_TOKEN_ALGORITHM
+
+    exp = int(time.time()) + 3600
+    legacy = jwt.encode(
+        {"phone_number": PHONE_NUMBER, "nonce": random.random(), "exp": exp},
+        settings.SECRET_KEY,
+        algorithm=SESSION_TOKEN_ALGORITHM,
+    )
+    results = {
+        "legacy": {
+            "generate": _per_call_us(
+                lambda: jwt.encode(
+                    {"phone_number": PHONE_NUMBER, "nonce": random.random(), "exp": exp},
+                    settings.SECRET_KEY,
+                    algorithm=SESSION_TOKEN_ALGORITHM,
+                ),
+                iterations,
+            ),
+            "length": len(legacy),
+        },
+    }
+    for fmt, path in SESSION_TOKEN_GENERATORS.items():
+        results[fmt] = _measure_generator(import_string(path), exp, iterations, buffer_size)
+    return results
+
+
+def _measure_generator(generator_cls, exp, iterations, buffer_size):
+    generator = generator_cls()
+    buffered = generator_cls(BUFFER_SIZE=buffer_size)
+    session_token = generator.generate(PHONE_NUMBER, exp)
+    return {
+        "generate": _per_call_us(lambda: generator.generate(PHONE_NUMBER, exp), iterations),
+        "buffered": _per_call_us(lambda: buffered.generate(PHONE_NUMBER, exp), iterations),
+        "check": _per_call_us(lambda: generator.check(session_token, PHONE_NUMBER), iterations),
+        "length": len(session_token),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    add_database_arguments(parser)
+    parser.add_argument(
+        "--iterations",
+        type=int,
+        default=DEFAULT_ITERATIONS,
+        help=f"Tokens timed per measurement (default: {DEFAULT_ITERATIONS})",
+    )
+    parser.add_argument(
+        "--buffer-size",
+        type=int,
+        default=DEFAULT_BUFFER_SIZE,
+        help=f"BUFFER_SIZE for the buffered measurement (default: {DEFAULT_BUFFER_SIZE})",
+    )
+    options = parser.parse_args(argv)
+
+    setup_django(options)
+
+    print("{:<8} {:>12} {:>12} {:>12} {:>7}".format("format", "generate us", "buffered us", "check us", "chars"))
+    for fmt, result in measure_session_tokens(options.iterations, options.buffer_size).items():
+        print(
+            "{:<8} {:>12.2f} {:>12} {:>12} {:>7}".format(
+                fmt,
+                result["generate"],
+                "{:.2f}".format(result["buffered"]) if "buffered" in result else "-",
+                "{:.2f}".format(result["check"]) if "check" in result else "-",
+                result["length"],
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
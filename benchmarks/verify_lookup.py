@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark ``BaseBackend.validate_security_code`` latency as the table grows.
+
+The table is grown in place to each requested size, and a random sample of
+existing ``(phone_number, session_token)`` pairs is verified at every step.
+With the unique index on ``phone_number`` serving the lookup the latency
+should stay flat. Pass ``--without-index`` to drop that index for comparison;
+the table then no longer supports upserts, so use a separate ``--name``.
+
+Usage::
+
+    python -m benchmarks.verify_lookup
+    python -m benchmarks.verify_lookup --rows 10000 100000 --samples 200
+    python -m benchmarks.verify_lookup --engine postgresql --name phone_verify_bench
+
+Loading 10M rows takes a while; pass a reused ``--name`` to keep the data
+between runs.
+"""
+
+import argparse
+import copy
+import random
+import time
+
+from ._django import add_database_arguments, setup_django, summarize
+
+DEFAULT_ROW_COUNTS = (10_000, 1_000_000, 10_000_000)
+INSERT_BATCH_SIZE = 10_000
+
+
+def _phone_number(index):
+    # Unique 10-digit US numbers: 10,000 lines per exchange, area codes 200-999,
+    # exchanges from 555 up.
+    block, line = divmod(index, 10_000)
+    exchange, area_code = divmod(block, 800)
+    return "+1{:03d}{:03d}{:04d}".format(200 + area_code, 555 + exchange, line)
+
+
+def drop_lookup_index():
+    """
+    Drop the unique index on ``phone_number`` that serves the verify lookup.
+
+    Only the index is removed, with the schema editor, so the table keeps
+    every column of the current migrations.
+    """
+    from django.db import connection
+
+    from phone_verify.models import SMSVerification
+
+    with connection.cursor() as cursor:
+        constraints = connection.introspection.get_constraints(cursor, SMSVerification._meta.db_table)
+    if not any(c["unique"] and c["columns"] == ["phone_number"] for c in constraints.values()):
+        return
+    old_field = SMSVerification._meta.get_field("phone_number")
+    new_field = copy.deepcopy(old_field)
+    new_field._unique = False
+    with connection.schema_editor() as schema_editor:
+        schema_editor.alter_field(SMSVerification, old_field, new_field)
+
+
+def grow_table(target_rows):
+    from phone_verify.models import SMSVerification, security_code_expires_at
+
+    current = SMSVerification.objects.count()
+    while current < target_rows:
+        batch = min(INSERT_BATCH_SIZE, target_rows - current)
+        expires_at = security_code_expires_at()
+        SMSVerification.objects.bulk_create(
+            [
+                SMSVerification(
+                    phone_number=_phone_number(index),
+                    security_code="{:06d}".format(index % 1_000_000),
+                    session_token="benchmark-token-{}".format(index),
+                    expires_at=expires_at,
+                )
+                for index in range(current, current + batch)
+            ],
+            batch_size=INSERT_BATCH_SIZE,
+        )
+        current += batch
+    return current
+
+
+def explain_lookup(phone_number, session_token):
+    from phone_verify.models import SMSVerification
+
+    queryset = SMSVerification.objects.filter(phone_number=phone_number, session_token=session_token)
+    return queryset.explain()
+
+
+def measure(row_count, samples):
+    from phone_verify.backends import get_sms_backend
+
+    backend = get_sms_backend(None)
+    timings = []
+    for _ in range(samples):
+        index = random.randrange(row_count)
+        phone_number = _phone_number(index)
+        start = time.perf_counter()
+        backend.validate_security_code(
+            security_code="{:06d}".format(index % 1_000_000),
+            phone_number=phone_number,
+            session_token="benchmark-token-{}".format(index),
+        )
+        timings.append(time.perf_counter() - start)
+    return summarize(timings)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    add_database_arguments(parser)
+    parser.add_argument("--rows", type=int, nargs="+", default=list(DEFAULT_ROW_COUNTS))
+    parser.add_argument("--samples", type=int, default=1000, help="Verify calls per table size")
+    parser.add_argument(
+        "--without-index",
+        action="store_true",
+        help="Drop the unique phone_number index to measure the sequential scan",
+    )
+    options = parser.parse_args(argv)
+
+    setup_django(options)
+    if options.without_index:
+        drop_lookup_index()
+
+    print("{:>12}  {:>9}  {:>9}  {:>9}  {:>9}".format("rows", "mean ms", "p50 ms", "p95 ms", "p99 ms"))
+    for target in sorted(options.rows):
+        row_count = grow_table(target)
+        stats = measure(row_count, options.samples)
+        print(
+            "{:>12,}  {mean:>9.3f}  {p50:>9.3f}  {p95:>9.3f}  {p99:>9.3f}".format(row_count, **stats)
+        )
+
+    print()
+    print("Query plan for the verify lookup:")
+    print(explain_lookup(_phone_number(0), "benchmark-token-0"))
+
+
+if __name__ == "__main__":
+    main()
@@ -14,6 +14,7 @@ import django
 # Third Party Stuff
 import pytest
 from django.conf import settings
+from django.test import override_settings
 
 from tests import test_settings
 
@@ -69,6 +70,27 @@ def backend(request):
     return phone_verification_settings
 
 
+@pytest.fixture
+def phone_settings():
+    """Override PHONE_VERIFICATION with a copy of the test settings.
+
+    ``phone_settings(**overrides)`` returns an ``override_settings`` context
+    manager; an ``OPTIONS`` override is merged into the test ``OPTIONS``.
+
+    Usages:
+    >>> with phone_settings(MAX_FAILED_ATTEMPTS=2, OPTIONS={"KEY": "fake"}):
+    ...     backend = get_sms_backend(phone_number)
+    """
+
+    def override(**overrides):
+        phone_verification_settings = copy.deepcopy(test_settings.DJANGO_SETTINGS["PHONE_VERIFICATION"])
+        phone_verification_settings["OPTIONS"].update(overrides.pop("OPTIONS", {}))
+        phone_verification_settings.update(overrides)
+        return override_settings(PHONE_VERIFICATION=phone_verification_settings)
+
+    return override
+
+
 def pytest_configure():
     from tests import test_settings
 
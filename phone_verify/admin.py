@@ -3,8 +3,80 @@ from __future__ import absolute_import, unicode_literals
 
 # Third Party Stuff
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import BooleanField, ExpressionWrapper, Q, QuerySet
+from django.utils import timezone
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
 
-from .models import SMSVerification
+from .models import SMSDeliveryAttempt, SMSOutbox, SMSVerification
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that reads the row count of an unfiltered table from the
+    database's statistics instead of running ``COUNT(*)``.
+
+    Counting tens of millions of rows takes longer than the admin's request
+    timeout. PostgreSQL (``pg_class.reltuples``, summed over partitions) and
+    MySQL (``information_schema.TABLES``) keep an estimate; it is used once it
+    exceeds ``estimate_threshold`` rows. Filtered lists, other databases and
+    tables without statistics are counted exactly.
+    """
+
+    estimate_threshold = 100_000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if isinstance(queryset, QuerySet) and not queryset.query.where:
+            estimate = self._estimate(queryset)
+            if estimate is not None and estimate > self.estimate_threshold:
+                return estimate
+        return super().count
+
+    def _estimate(self, queryset):
+        connection = connections[queryset.db]
+        table = queryset.model._meta.db_table
+        with connection.cursor() as cursor:
+            if connection.vendor == "postgresql":
+                cursor.execute(
+                    "SELECT SUM(GREATEST(reltuples, 0)), BOOL_OR(reltuples < 0) FROM pg_class "
+                    # A partitioned parent has no statistics of its own.
+                    "WHERE (oid = %s::regclass AND relkind <> 'p') "
+                    "OR oid IN (SELECT inhrelid FROM pg_inherits WHERE inhparent = %s::regclass)",
+                    [table, table],
+                )
+                estimate, unknown = cursor.fetchone()
+                # -1 means the table (or a partition) was never analyzed.
+                return None if unknown or estimate is None else int(estimate)
+            if connection.vendor == "mysql":
+                cursor.execute(
+                    "SELECT TABLE_ROWS FROM information_schema.TABLES "
+                    "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+                    [table],
+                )
+                row = cursor.fetchone()
+                return None if row is None or row[0] is None else int(row[0])
+        return None
+
+
+class ValidityListFilter(admin.SimpleListFilter):
+    """Filter on whether the security code is still valid, as an ``expires_at`` range."""
+
+    title = _("Is Valid")
+    parameter_name = "is_valid"
+
+    def lookups(self, request, model_admin):
+        return (("1", _("Yes")), ("0", _("No")))
+
+    def queryset(self, request, queryset):
+        if self.value() == "1":
+            return queryset.live()
+        if self.value() == "0":
+            return queryset.expired()
+        return queryset
 
 
 @admin.register(SMSVerification)
@@ -19,8 +91,10 @@ class SMSVerificationAdmin(admin.ModelAdmin):
         "created_at",
     )
     search_fields = ("phone_number",)
+    # Served by the unique index on phone_number.
     ordering = ("phone_number",)
-    list_filter = ("is_verified", "created_at")
+    # Served by the expires_at, created_at and (is_verified, created_at) indexes.
+    list_filter = ("is_verified", ValidityListFilter, "created_at")
     readonly_fields = (
         "security_code",
         "phone_number",
@@ -28,11 +102,54 @@ class SMSVerificationAdmin(admin.ModelAdmin):
         "is_verified",
         "is_valid",
         "failed_attempts",
+        "expires_at",
         "created_at",
         "modified_at",
     )
+    paginator = EstimatedCountPaginator
+    # Skip the second, unfiltered COUNT(*) behind "N results (M total)".
+    show_full_result_count = False
 
-    @admin.display(description="Is Valid", boolean=True)
+    def get_queryset(self, request):
+        # Computed in SQL so the column can be sorted on.
+        return super().get_queryset(request).annotate(
+            is_valid=ExpressionWrapper(Q(expires_at__gte=timezone.now()), output_field=BooleanField())
+        )
+
+    @admin.display(description="Is Valid", boolean=True, ordering="is_valid")
     def is_valid(self, obj):
         """Display whether the security code is still valid (not expired)."""
+        is_valid = getattr(obj, "is_valid", None)
+        if isinstance(is_valid, bool):
+            return is_valid
         return not obj.is_expired
+
+
+class SMSDeliveryAttemptInline(admin.TabularInline):
+    model = SMSDeliveryAttempt
+    extra = 0
+    can_delete = False
+    fields = ("created_at", "backend", "success", "provider_message_id", "error")
+    readonly_fields = fields
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(SMSOutbox)
+class SMSOutboxAdmin(admin.ModelAdmin):
+    list_display = ("id", "phone_number", "status", "attempts", "created_at", "sent_at")
+    search_fields = ("phone_number",)
+    list_filter = ("status",)
+    # Pending messages contain the plaintext security code.
+    exclude = ("message",)
+    readonly_fields = (
+        "phone_number",
+        "status",
+        "attempts",
+        "last_error",
+        "created_at",
+        "sent_at",
+        "claimed_at",
+    )
+    inlines = (SMSDeliveryAttemptInline,)
@@ -3,13 +3,44 @@
 # Third Party Stuff
 from rest_framework import viewsets
 from rest_framework.decorators import action
+from rest_framework.exceptions import Throttled
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
 
+from .ratelimit import RateLimitExceeded
 from .serializers import PhoneSerializer, SMSVerificationSerializer
 from .services import send_security_code_and_generate_session_token
 
 
+def get_request_language(request):
+    """
+    Return the first language of the request's Accept-Language header, or None.
+
+    Format: "en-US,en;q=0.9,es;q=0.8" -> take first language "en-US"
+    """
+    accept_language = request.META.get('HTTP_ACCEPT_LANGUAGE', '')
+    if not accept_language:
+        return None
+    # Take first language, strip quality params (e.g., "en-US;q=0.9" -> "en-US")
+    return accept_language.split(',')[0].split(';')[0].strip() or None
+
+
+def get_client_ip(request):
+    """
+    Return the client IP address used for the ``IP`` rate limit.
+
+    ``REMOTE_ADDR``, unless DRF's ``NUM_PROXIES`` setting is configured: only
+    then is ``X-Forwarded-For`` read, the way DRF's throttles read it. Without
+    it, DRF would use the whole client-supplied header, and rotating it would
+    get a fresh ``IP`` bucket each time.
+    """
+    if api_settings.NUM_PROXIES is None:
+        return request.META.get("REMOTE_ADDR")
+    return BaseThrottle().get_ident(request)
+
+
 class VerificationViewSet(viewsets.GenericViewSet):
     @action(
         detail=False,
@@ -21,18 +52,14 @@ class VerificationViewSet(viewsets.GenericViewSet):
         serializer = PhoneSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
 
-        # Extract language from Accept-Language header
-        # Format: "en-US,en;q=0.9,es;q=0.8" -> take first language "en-US"
-        accept_language = request.META.get('HTTP_ACCEPT_LANGUAGE', '')
-        language = None
-        if accept_language:
-            # Take first language, strip quality params (e.g., "en-US;q=0.9" -> "en-US")
-            language = accept_language.split(',')[0].split(';')[0].strip() or None
-
-        session_token = send_security_code_and_generate_session_token(
-            str(serializer.validated_data["phone_number"]),
-            language=language
-        )
+        try:
+            session_token = send_security_code_and_generate_session_token(
+                str(serializer.validated_data["phone_number"]),
+                language=get_request_language(request),
+                ip_address=get_client_ip(request),
+            )
+        except RateLimitExceeded as exc:
+            raise Throttled(wait=exc.retry_after) from exc
         return Response({"session_token": session_token})
 
     @action(
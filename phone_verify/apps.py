@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class PhoneVerificationConfig(AppConfig):
     name = "phone_verify"
     verbose_name = "Phone Verification"
+
+    def ready(self):
+        from .constants import check_import_paths, get_settings
+
+        # Fail at startup, not on the first request, if PHONE_VERIFICATION is
+        # missing or invalid or names a class that cannot be imported.
+        check_import_paths(get_settings())
@@ -0,0 +1,10 @@
+# Third Party Stuff
+from django.urls import path
+
+# phone_verify
+from . import async_views
+
+urlpatterns = [
+    path("phone/register", async_views.register, name="phone-register"),
+    path("phone/verify", async_views.verify, name="phone-verify"),
+]
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""
+Native async views for ASGI deployments.
+
+They accept the same payloads and return the same responses as
+``VerificationViewSet``, but await the async service functions instead of
+running the whole flow in a worker thread. Include ``phone_verify.async_urls``
+instead of ``phone_verify.urls`` to use them (Django 4.1+).
+"""
+
+import json
+
+# Third Party Stuff
+from django.http import HttpResponseNotAllowed, JsonResponse
+from rest_framework.exceptions import Throttled
+
+from .api import get_client_ip, get_request_language
+from .backends import get_sms_backend
+from .ratelimit import RateLimitExceeded
+from .serializers import BaseSMSVerificationSerializer, PhoneSerializer, get_verification_error
+from .services import asend_security_code_and_generate_session_token, averify_security_code
+
+
+def _get_request_data(request):
+    if request.content_type == "application/json":
+        try:
+            return json.loads(request.body or b"{}")
+        except ValueError:
+            return None
+    return request.POST
+
+
+def _validate(serializer_class, request):
+    """Return ``(serializer, error_response)`` for the request payload."""
+    if request.method != "POST":
+        return None, HttpResponseNotAllowed(["POST"])
+    data = _get_request_data(request)
+    if data is None:
+        return None, JsonResponse({"detail": "JSON parse error"}, status=400)
+    serializer = serializer_class(data=data)
+    if not serializer.is_valid():
+        return None, JsonResponse(serializer.errors, status=400)
+    return serializer, None
+
+
+async def register(request):
+    serializer, error_response = _validate(PhoneSerializer, request)
+    if error_response is not None:
+        return error_response
+
+    try:
+        session_token = await asend_security_code_and_generate_session_token(
+            str(serializer.validated_data["phone_number"]),
+            language=get_request_language(request),
+            ip_address=get_client_ip(request),
+        )
+    except RateLimitExceeded as exc:
+        throttled = Throttled(wait=exc.retry_after)
+        response = JsonResponse({"detail": str(throttled.detail)}, status=throttled.status_code)
+        response["Retry-After"] = str(exc.retry_after)
+        return response
+    return JsonResponse({"session_token": session_token})
+
+
+async def verify(request):
+    serializer, error_response = _validate(BaseSMSVerificationSerializer, request)
+    if error_response is not None:
+        return error_response
+
+    phone_number = serializer.validated_data["phone_number"]
+    verification, status = await averify_security_code(
+        phone_number=phone_number,
+        security_code=serializer.validated_data["security_code"],
+        session_token=serializer.validated_data["session_token"],
+    )
+    error = get_verification_error(get_sms_backend(phone_number), verification, status)
+    if error is not None:
+        return JsonResponse({"non_field_errors": [str(error)]}, status=400)
+    return JsonResponse({"message": "Security code is valid."})
+
+
+# Same behavior as DRF's APIView, which exempts its views from CSRF checks.
+register.csrf_exempt = True
+verify.csrf_exempt = True
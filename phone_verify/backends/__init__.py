@@ -1,21 +1,24 @@
 # -*- coding: utf-8 -*-
 
+import threading
+
 # Third party
-from django.conf import settings
-from django.core.exceptions import ImproperlyConfigured
+from django.core.signals import setting_changed
+from django.dispatch import receiver
 from django.utils.module_loading import import_string
 
+from ..constants import get_settings
 
-def get_sms_backend(phone_number):
-    if settings.PHONE_VERIFICATION.get("BACKEND", None):
-        backend_import_path = settings.PHONE_VERIFICATION["BACKEND"]
-    else:
-        raise ImproperlyConfigured(
-            "Please specify BACKEND in PHONE_VERIFICATION within your settings"
-        )
+# The backend instance and the `PhoneVerificationSettings` it was built from.
+# Provider backends hold an SDK client with its own HTTP connection pool, so
+# reusing them keeps TLS connections to the provider open across requests.
+_backend = None
+_backend_lock = threading.Lock()
 
+
+def _import_backend(backend_import_path):
     try:
-        backend_cls = import_string(backend_import_path)
+        return import_string(backend_import_path)
     except ImportError as e:
         if not any(provider in backend_import_path.lower() for provider in ['twilio', 'nexmo']):
             # Error for custom backends
@@ -33,4 +36,41 @@ def get_sms_backend(phone_number):
             f"Please install '{dependency_name}' to use this provider."
         ) from e
 
-    return backend_cls(**settings.PHONE_VERIFICATION["OPTIONS"])
+
+def get_sms_backend(phone_number):
+    """
+    Return the configured SMS backend instance.
+
+    The instance is shared process-wide and rebuilt whenever ``get_settings()``
+    returns new settings, that is after the ``PHONE_VERIFICATION`` setting
+    changes, so the common path is one identity check.
+    """
+    phone_settings = get_settings()
+    cached = _backend
+    if cached is not None and cached[0] is phone_settings:
+        return cached[1]
+    return _build_backend(phone_settings)
+
+
+def _build_backend(phone_settings):
+    global _backend
+
+    with _backend_lock:
+        if _backend is None or _backend[0] is not phone_settings:
+            backend = _import_backend(phone_settings.backend)(**phone_settings.options)
+            _backend = (phone_settings, backend)
+        return _backend[1]
+
+
+def clear_backend_cache():
+    """Drop the cached backend instance."""
+    global _backend
+
+    with _backend_lock:
+        _backend = None
+
+
+@receiver(setting_changed)
+def _clear_backend_cache_on_setting_changed(setting, **kwargs):
+    if setting == "PHONE_VERIFICATION":
+        clear_backend_cache()
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""
+Shared ``aiohttp`` sessions for the backends' ``asend_sms`` implementations.
+
+An ``aiohttp.ClientSession`` is bound to the event loop it was created in, so
+sessions (and their connection pools) are kept per running loop and per
+configuration. Under an ASGI server that is a single long-lived session per
+worker process and backend configuration.
+
+Sessions take the ``HTTP_POOL_SIZE``, ``HTTP_KEEP_ALIVE``,
+``HTTP_CONNECT_TIMEOUT`` and ``HTTP_READ_TIMEOUT`` backend ``OPTIONS`` of the
+``requests`` session (see ``phone_verify.backends.http``), so a stalled
+provider cannot hang async sends either. Sends are not retried.
+"""
+
+import asyncio
+import threading
+import weakref
+
+from .http import DEFAULT_CONNECT_TIMEOUT, DEFAULT_KEEP_ALIVE, DEFAULT_POOL_SIZE, DEFAULT_READ_TIMEOUT
+
+_sessions = weakref.WeakKeyDictionary()
+_sessions_lock = threading.Lock()
+
+
+def aiohttp_available():
+    try:
+        import aiohttp  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def aiohttp_session_options(options):
+    """Return the ``get_aiohttp_session`` arguments from lower-cased backend ``options``."""
+    return {
+        "pool_size": options.get("http_pool_size", DEFAULT_POOL_SIZE),
+        "keep_alive": options.get("http_keep_alive", DEFAULT_KEEP_ALIVE),
+        "connect_timeout": options.get("http_connect_timeout", DEFAULT_CONNECT_TIMEOUT),
+        "read_timeout": options.get("http_read_timeout", DEFAULT_READ_TIMEOUT),
+    }
+
+
+def _build_session(pool_size, keep_alive, connect_timeout, read_timeout):
+    import aiohttp
+
+    # Like `requests` timeouts: per connection attempt and per socket read,
+    # instead of aiohttp's default 300 second total.
+    timeout = aiohttp.ClientTimeout(total=None, sock_connect=connect_timeout, sock_read=read_timeout)
+    connector = aiohttp.TCPConnector(limit=pool_size, force_close=not keep_alive)
+    return aiohttp.ClientSession(timeout=timeout, connector=connector)
+
+
+def get_aiohttp_session(
+    pool_size=DEFAULT_POOL_SIZE,
+    keep_alive=DEFAULT_KEEP_ALIVE,
+    connect_timeout=DEFAULT_CONNECT_TIMEOUT,
+    read_timeout=DEFAULT_READ_TIMEOUT,
+):
+    """Return the ``aiohttp.ClientSession`` for this configuration in the running event loop."""
+    loop = asyncio.get_running_loop()
+    key = (pool_size, keep_alive, connect_timeout, read_timeout)
+    with _sessions_lock:
+        sessions = _sessions.setdefault(loop, {})
+        session = sessions.get(key)
+        if session is None or session.closed:
+            session = _build_session(*key)
+            sessions[key] = session
+    return session
+
+
+async def close_aiohttp_session():
+    """Close the sessions of the running event loop, e.g. on ASGI lifespan shutdown."""
+    loop = asyncio.get_running_loop()
+    with _sessions_lock:
+        sessions = _sessions.pop(loop, {})
+    for session in sessions.values():
+        await session.close()
@@ -1,51 +1,117 @@
 # -*- coding: utf-8 -*-
 
-import random
+import time
 from abc import ABCMeta, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
 
 # Third Party Stuff
-import jwt
-from django.conf import settings as django_settings
-from django.db import models
+from asgiref.sync import sync_to_async
 from django.utils.crypto import get_random_string
 
-from ..constants import (
-    DEFAULT_MAX_FAILED_ATTEMPTS,
-    DEFAULT_TOKEN_LENGTH,
-)
-from ..models import SMSVerification
+from .. import constants, metrics
+from ..constants import get_security_code_expiration, get_settings
+from ..storage import get_verification_store
+from ..tokens import get_session_token_generator
+from .bulk import BulkSMSResult, RateLimiter
 
 
 class BaseBackend(metaclass=ABCMeta):
-    SECURITY_CODE_VALID = 0
-    SECURITY_CODE_INVALID = 1
-    SECURITY_CODE_EXPIRED = 2
-    SECURITY_CODE_VERIFIED = 3
-    SESSION_TOKEN_INVALID = 4
-    SECURITY_CODE_TOO_MANY_ATTEMPTS = 5
+    SECURITY_CODE_VALID = constants.SECURITY_CODE_VALID
+    SECURITY_CODE_INVALID = constants.SECURITY_CODE_INVALID
+    SECURITY_CODE_EXPIRED = constants.SECURITY_CODE_EXPIRED
+    SECURITY_CODE_VERIFIED = constants.SECURITY_CODE_VERIFIED
+    SESSION_TOKEN_INVALID = constants.SESSION_TOKEN_INVALID
+    SECURITY_CODE_TOO_MANY_ATTEMPTS = constants.SECURITY_CODE_TOO_MANY_ATTEMPTS
+
+    # Defaults for `send_bulk_sms`, overridable with the BULK_MAX_WORKERS and
+    # BULK_RATE_LIMIT (messages per second) backend OPTIONS. The base backend
+    # sends sequentially and unthrottled.
+    bulk_max_workers = 1
+    bulk_rate_limit = None
 
     def __init__(self, **settings):
         self.exception_class = None
+        # Lower case it just to be sure
+        options = {key.lower(): value for key, value in settings.items()}
+        self.bulk_max_workers = options.get("bulk_max_workers", self.bulk_max_workers)
+        self.bulk_rate_limit = options.get("bulk_rate_limit", self.bulk_rate_limit)
+
+    @property
+    def store(self):
+        """The verification store configured with ``STORAGE``."""
+        return get_verification_store()
 
     @abstractmethod
     def send_sms(self, number, message):
         raise NotImplementedError()
 
+    async def asend_sms(self, number, message):
+        """
+        Async counterpart of ``send_sms``.
+
+        The default runs ``send_sms`` in a worker thread. Backends with an
+        async HTTP client override it to send without tying up a thread.
+        """
+        return await sync_to_async(self.send_sms, thread_sensitive=False)(number, message)
+
     def send_bulk_sms(self, numbers, message):
-        # Called positionally so backends that rename `send_sms` parameters
-        # still work with the inherited default.
-        for number in numbers:
-            self.send_sms(number, message)
+        """
+        Send ``message`` to every number in ``numbers``.
+
+        Messages are sent from up to ``bulk_max_workers`` threads, and no more
+        than ``bulk_rate_limit`` are started per second. A failure for one
+        number does not stop the others.
+
+        :param numbers: Iterable of recipient phone numbers
+        :param message: Message content
+
+        :return: list of ``BulkSMSResult``, in the order of ``numbers``.
+        """
+        return self.send_bulk_messages((number, message) for number in numbers)
+
+    def send_bulk_messages(self, messages):
+        """
+        Like ``send_bulk_sms``, but with a different message per number.
+
+        :param messages: Iterable of ``(number, message)`` pairs
+
+        :return: list of ``BulkSMSResult``, in the order of ``messages``.
+        """
+        messages = list(messages)
+        limiter = RateLimiter(self.bulk_rate_limit) if self.bulk_rate_limit else None
+
+        def send(number_and_message):
+            number, message = number_and_message
+            if limiter is not None:
+                limiter.wait()
+            try:
+                message_id = self._send_bulk_message(number, message)
+            except Exception as exc:
+                return BulkSMSResult(number, success=False, error=exc)
+            return BulkSMSResult(number, success=True, message_id=message_id)
+
+        max_workers = min(self.bulk_max_workers, len(messages))
+        if max_workers <= 1:
+            return [send(item) for item in messages]
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="phone_verify_bulk") as executor:
+            return list(executor.map(send, messages))
+
+    def _send_bulk_message(self, number, message):
+        """
+        Send one message of a bulk send and return the provider message id.
+
+        Raise to mark the number as failed. Called positionally so backends
+        that rename `send_sms` parameters still work with the default.
+        """
+        with metrics.time_send_sms(self):
+            return self.send_sms(number, message)
 
     @classmethod
     def generate_security_code(cls):
         """
         Returns a unique random `security_code` for given `TOKEN_LENGTH` in the settings.
         """
-        token_length = django_settings.PHONE_VERIFICATION.get(
-            "TOKEN_LENGTH", DEFAULT_TOKEN_LENGTH
-        )
-        return get_random_string(token_length, allowed_chars="0123456789")
+        return get_random_string(get_settings().token_length, allowed_chars="0123456789")
 
     @classmethod
     def generate_session_token(cls, phone_number):
@@ -53,19 +119,26 @@ class BaseBackend(metaclass=ABCMeta):
         Returns a unique session_token for
         identifying a particular device in subsequent calls.
         """
-        data = {"phone_number": phone_number, "nonce": random.random()}
-        session_token = jwt.encode(data, django_settings.SECRET_KEY)
-        try:
-            # PyJWT 2.0 returns a string instead of bytes
-            # Bytes will always need a .decode() method.
-            # We cannot upgrade to PyJWT 2.0.0 for now
-            # since there is a dependency conflict with twilio.
-            # TODO: Just return session_token when the other lib
-            # versions are updated and we can pin PyJWT >= 2.0.0
-            # More info: https://github.com/CuriousLearner/django-phone-verify/pull/57
-            return session_token.decode()
-        except AttributeError:
-            return session_token
+        exp = None
+        if cls._signed_session_tokens_enabled():
+            # Checked by `_check_signed_session_token` before any storage lookup.
+            exp = int(time.time()) + get_security_code_expiration()
+        return get_session_token_generator().generate(phone_number, exp)
+
+    @staticmethod
+    def _signed_session_tokens_enabled():
+        return get_settings().signed_session_tokens
+
+    def _check_signed_session_token(self, session_token, phone_number):
+        """
+        Check a session token's signature, expiry and phone number without
+        any I/O.
+
+        :return: None if the token is acceptable, else the status to reject
+            the attempt with: ``SECURITY_CODE_EXPIRED`` for an expired token,
+            ``SESSION_TOKEN_INVALID`` for anything else.
+        """
+        return get_session_token_generator().check(session_token, phone_number)
 
     def create_security_code_and_session_token(self, number):
         """
@@ -83,16 +156,42 @@ class BaseBackend(metaclass=ABCMeta):
         """
         security_code = self.generate_security_code()
         session_token = self.generate_session_token(number)
+        with metrics.timed(metrics.STORAGE_SECONDS, operation="create_security_code_and_session_token"):
+            self.store.save(number, security_code, session_token)
+        return security_code, session_token
+
+    def create_security_codes_and_session_tokens(self, numbers, batch_size=None):
+        """
+        Bulk version of ``create_security_code_and_session_token``.
+
+        Numbers are written to the verification store in batches of
+        ``batch_size`` (default: ``BULK_BATCH_SIZE`` setting, else 1000). The
+        model store deletes the old rows of each batch with one
+        ``phone_number__in`` statement and inserts the new ones with one
+        ``bulk_create``, inside a transaction.
 
-        # Delete old security_code(s) for phone_number if already exists
-        SMSVerification.objects.filter(phone_number=number).delete()
+        :param numbers: Iterable of phone numbers; duplicates are issued once
+        :param batch_size: Rows per DELETE/INSERT round-trip
 
-        # Default security_code generated of 6 digits
-        SMSVerification.objects.create(
-            phone_number=number,
-            security_code=security_code,
-            session_token=session_token,
-        )
+        :return: list of ``(number, security_code, session_token)`` tuples, in
+            the order the numbers were first given.
+        """
+        if batch_size is None:
+            batch_size = get_settings().bulk_batch_size
+        numbers = list(dict.fromkeys(numbers))
+        issued = [
+            (number, self.generate_security_code(), self.generate_session_token(number))
+            for number in numbers
+        ]
+        self.store.save_many(issued, batch_size=batch_size)
+        return issued
+
+    async def acreate_security_code_and_session_token(self, number):
+        """Async counterpart of ``create_security_code_and_session_token``."""
+        security_code = self.generate_security_code()
+        session_token = self.generate_session_token(number)
+        with metrics.timed(metrics.STORAGE_SECONDS, operation="create_security_code_and_session_token"):
+            await self.store.asave(number, security_code, session_token)
         return security_code, session_token
 
     def _should_bypass_code_check(self, security_code):
@@ -105,29 +204,14 @@ class BaseBackend(metaclass=ABCMeta):
         """
         return False
 
-    def _increment_failed_attempts(self, verification):
-        """Atomically increment failed attempts counter."""
-        verification.failed_attempts = models.F('failed_attempts') + 1
-        verification.save(update_fields=['failed_attempts'])
-        verification.refresh_from_db()
-
-    def _reset_failed_attempts(self, verification):
-        """Reset failed attempts counter to 0."""
-        verification.failed_attempts = 0
-        verification.save(update_fields=['failed_attempts'])
-
-    def _has_exceeded_failed_attempts(self, verification):
-        """Return True if verification has exceeded the failed attempts limit."""
-        max_failed_attempts = django_settings.PHONE_VERIFICATION.get(
-            "MAX_FAILED_ATTEMPTS", DEFAULT_MAX_FAILED_ATTEMPTS
-        )
-        return verification.failed_attempts >= max_failed_attempts
-
     def validate_security_code(self, security_code, phone_number, session_token):
         """
         A utility method to verify if the `security_code` entered is valid for
         a given `phone_number` along with the `session_token` used.
 
+        The attempt is checked and recorded by the configured verification
+        store (see ``phone_verify.storage``).
+
         :param security_code: Security code entered for verification
         :param phone_number: Phone number to be verified
         :param session_token: Session token to identify the device
@@ -142,54 +226,42 @@ class BaseBackend(metaclass=ABCMeta):
             - `BaseBackend.SECURITY_CODE_VERIFIED`
             - `BaseBackend.SESSION_TOKEN_INVALID`
             - `BaseBackend.SECURITY_CODE_TOO_MANY_ATTEMPTS`
+
+        With ``SIGNED_SESSION_TOKENS`` enabled, forged, tampered, expired or
+        mismatched session tokens are rejected before the store is queried,
+        and ``stored_verification`` is None.
         """
-        stored_verification = SMSVerification.objects.filter(
-            phone_number=phone_number, session_token=session_token
-        ).first()
-
-        # Allow sandbox backends to bypass validation (but check brute force first if verification exists)
-        if self._should_bypass_code_check(security_code):
-            if stored_verification is None:
-                return SMSVerification.objects.none(), self.SECURITY_CODE_VALID
-
-            # Even for sandbox, check brute force limit first
-            if self._has_exceeded_failed_attempts(stored_verification):
-                return stored_verification, self.SECURITY_CODE_TOO_MANY_ATTEMPTS
-
-            self._reset_failed_attempts(stored_verification)
-            return SMSVerification.objects.none(), self.SECURITY_CODE_VALID
-
-        # check verification exists
-        if stored_verification is None:
-            return stored_verification, self.SESSION_TOKEN_INVALID
-
-        # check if too many failed attempts
-        if self._has_exceeded_failed_attempts(stored_verification):
-            return stored_verification, self.SECURITY_CODE_TOO_MANY_ATTEMPTS
-
-        # check security_code matches
-        if stored_verification.security_code != security_code:
-            self._increment_failed_attempts(stored_verification)
-            return stored_verification, self.SECURITY_CODE_INVALID
-
-        # check security_code is not expired
-        if stored_verification.is_expired:
-            self._increment_failed_attempts(stored_verification)
-            return stored_verification, self.SECURITY_CODE_EXPIRED
-
-        # check security_code is not verified
-        if stored_verification.is_verified and django_settings.PHONE_VERIFICATION.get(
-            "VERIFY_SECURITY_CODE_ONLY_ONCE"
-        ):
-            self._increment_failed_attempts(stored_verification)
-            return stored_verification, self.SECURITY_CODE_VERIFIED
-
-        # mark security_code as verified
-        stored_verification.is_verified = True
-        stored_verification.failed_attempts = 0
-        stored_verification.save(update_fields=['is_verified', 'failed_attempts'])
-
-        return stored_verification, self.SECURITY_CODE_VALID
+        if self._signed_session_tokens_enabled():
+            status = self._check_signed_session_token(session_token, phone_number)
+            if status is not None:
+                metrics.record_verify_outcome(status)
+                return None, status
+        with metrics.timed(metrics.STORAGE_SECONDS, operation="validate_security_code"):
+            stored_verification, status = self.store.validate(
+                security_code,
+                phone_number,
+                session_token,
+                bypass_code_check=self._should_bypass_code_check(security_code),
+            )
+        metrics.record_verify_outcome(status)
+        return stored_verification, status
+
+    async def avalidate_security_code(self, security_code, phone_number, session_token):
+        """Async counterpart of ``validate_security_code``."""
+        if self._signed_session_tokens_enabled():
+            status = self._check_signed_session_token(session_token, phone_number)
+            if status is not None:
+                metrics.record_verify_outcome(status)
+                return None, status
+        with metrics.timed(metrics.STORAGE_SECONDS, operation="validate_security_code"):
+            stored_verification, status = await self.store.avalidate(
+                security_code,
+                phone_number,
+                session_token,
+                bypass_code_check=self._should_bypass_code_check(security_code),
+            )
+        metrics.record_verify_outcome(status)
+        return stored_verification, status
 
     def generate_message(self, security_code, context=None):
         """
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""
+Helpers for ``BaseBackend.send_bulk_sms``: a per-number result record and a
+thread-safe rate limiter shared by the sender threads of one bulk send.
+"""
+
+import threading
+import time
+
+
+class BulkSMSResult(object):
+    """
+    Outcome of sending one message of a bulk send.
+
+    :ivar number: the recipient phone number.
+    :ivar success: True if the provider accepted the message.
+    :ivar message_id: the provider's message id (Twilio SID, Nexmo message-id), if any.
+    :ivar error: the exception raised while sending, or None.
+    """
+
+    __slots__ = ("number", "success", "message_id", "error")
+
+    def __init__(self, number, success, message_id=None, error=None):
+        self.number = number
+        self.success = success
+        self.message_id = message_id
+        self.error = error
+
+    def __eq__(self, other):
+        if not isinstance(other, BulkSMSResult):
+            return NotImplemented
+        return (self.number, self.success, self.message_id, self.error) == (
+            other.number,
+            other.success,
+            other.message_id,
+            other.error,
+        )
+
+    def __repr__(self):
+        return "BulkSMSResult(number={!r}, success={!r}, message_id={!r}, error={!r})".format(
+            self.number, self.success, self.message_id, self.error
+        )
+
+
+class RateLimiter(object):
+    """
+    Space calls evenly so that at most ``rate`` start per second.
+
+    ``wait()`` reserves the next free slot under a lock and sleeps outside it,
+    so any number of threads can share one limiter.
+    """
+
+    def __init__(self, rate, clock=time.monotonic, sleep=time.sleep):
+        self.interval = 1.0 / rate
+        self._clock = clock
+        self._sleep = sleep
+        self._next_slot = None
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = self._clock()
+            slot = now if self._next_slot is None else max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        if slot > now:
+            self._sleep(slot - now)
@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+"""
+Shared ``requests`` session for the provider SDK clients.
+
+``TwilioBackend`` and ``NexmoBackend`` send through the Twilio and Nexmo SDKs,
+which use ``requests`` without timeouts, so a provider that stops answering
+can hold a worker indefinitely. The backends instead hand their SDK client a
+session from ``get_http_session()``: one per distinct configuration in the
+process, with a sized connection pool, connect and read timeouts applied to
+every request, and retries with jittered exponential backoff.
+
+The settings come from these backend ``OPTIONS``:
+
+- ``HTTP_POOL_SIZE``: connections kept open per host (default: 10)
+- ``HTTP_KEEP_ALIVE``: reuse connections between requests (default: True)
+- ``HTTP_CONNECT_TIMEOUT``: seconds to establish a connection (default: 3.05)
+- ``HTTP_READ_TIMEOUT``: seconds to wait for the response (default: 10)
+- ``HTTP_MAX_RETRIES``: retries of failed connections and of 429 and 503
+  responses (default: 2)
+- ``HTTP_BACKOFF_FACTOR``: base of the exponential backoff in seconds
+  (default: 0.5)
+- ``HTTP_MAX_RETRY_AFTER``: longest ``Retry-After`` wait honored before a
+  retry, in seconds; longer waits are cut to it (default: 5)
+
+The async backends use an ``aiohttp`` session built from the same pool and
+timeout options, see ``phone_verify.backends.aio``.
+
+Requests are not retried once they may have reached the provider (read
+errors and other status codes), so a retry never sends an SMS twice.
+"""
+
+import random
+import threading
+
+# Third Party Stuff
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+DEFAULT_POOL_SIZE = 10
+DEFAULT_KEEP_ALIVE = True
+DEFAULT_CONNECT_TIMEOUT = 3.05
+DEFAULT_READ_TIMEOUT = 10
+DEFAULT_MAX_RETRIES = 2
+DEFAULT_BACKOFF_FACTOR = 0.5
+DEFAULT_MAX_RETRY_AFTER = 5
+RETRY_STATUS_CODES = (429, 503)
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+class JitteredRetry(Retry):
+    """
+    ``Retry`` with "full jitter": each backoff is drawn uniformly from zero to the exponential delay.
+
+    ``Retry-After`` waits are capped at ``max_retry_after`` seconds, so a
+    throttled provider cannot hold a request thread for as long as it asks.
+    """
+
+    def __init__(self, *args, max_retry_after=DEFAULT_MAX_RETRY_AFTER, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.max_retry_after = max_retry_after
+
+    def new(self, **kwargs):
+        retry = super().new(**kwargs)
+        retry.max_retry_after = self.max_retry_after
+        return retry
+
+    def get_backoff_time(self):
+        return random.uniform(0, super().get_backoff_time())
+
+    def get_retry_after(self, response):
+        retry_after = super().get_retry_after(response)
+        if retry_after is None:
+            return None
+        return min(retry_after, self.max_retry_after)
+
+
+class TimeoutSession(requests.Session):
+    """A session applying ``timeout`` to every request that does not set its own."""
+
+    def __init__(self, timeout):
+        super().__init__()
+        self.timeout = timeout
+
+    def send(self, request, **kwargs):
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = self.timeout
+        return super().send(request, **kwargs)
+
+
+def http_session_options(options):
+    """Return the ``get_http_session`` arguments from lower-cased backend ``options``."""
+    return {
+        "pool_size": options.get("http_pool_size", DEFAULT_POOL_SIZE),
+        "keep_alive": options.get("http_keep_alive", DEFAULT_KEEP_ALIVE),
+        "connect_timeout": options.get("http_connect_timeout", DEFAULT_CONNECT_TIMEOUT),
+        "read_timeout": options.get("http_read_timeout", DEFAULT_READ_TIMEOUT),
+        "max_retries": options.get("http_max_retries", DEFAULT_MAX_RETRIES),
+        "backoff_factor": options.get("http_backoff_factor", DEFAULT_BACKOFF_FACTOR),
+        "max_retry_after": options.get("http_max_retry_after", DEFAULT_MAX_RETRY_AFTER),
+    }
+
+
+def _build_session(pool_size, keep_alive, connect_timeout, read_timeout, max_retries, backoff_factor, max_retry_after):
+    session = TimeoutSession(timeout=(connect_timeout, read_timeout))
+    retry = JitteredRetry(
+        total=max_retries,
+        connect=max_retries,
+        read=False,
+        status=max_retries,
+        status_forcelist=RETRY_STATUS_CODES,
+        # SMS sends are POSTs; only failures before the provider handled the
+        # request are retried (see `read` and the status list).
+        allowed_methods=None,
+        backoff_factor=backoff_factor,
+        raise_on_status=False,
+        max_retry_after=max_retry_after,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    if not keep_alive:
+        session.headers["Connection"] = "close"
+    return session
+
+
+def get_http_session(
+    pool_size=DEFAULT_POOL_SIZE,
+    keep_alive=DEFAULT_KEEP_ALIVE,
+    connect_timeout=DEFAULT_CONNECT_TIMEOUT,
+    read_timeout=DEFAULT_READ_TIMEOUT,
+    max_retries=DEFAULT_MAX_RETRIES,
+    backoff_factor=DEFAULT_BACKOFF_FACTOR,
+    max_retry_after=DEFAULT_MAX_RETRY_AFTER,
+):
+    """Return the process-wide session for this configuration, creating it on first use."""
+    key = (pool_size, keep_alive, connect_timeout, read_timeout, max_retries, backoff_factor, max_retry_after)
+    with _sessions_lock:
+        session = _sessions.get(key)
+        if session is None:
+            session = _build_session(*key)
+            _sessions[key] = session
+    return session
+
+
+def close_http_sessions():
+    """Close every shared session and its pooled connections."""
+    with _sessions_lock:
+        sessions = list(_sessions.values())
+        _sessions.clear()
+    for session in sessions:
+        session.close()
@@ -3,13 +3,22 @@ from __future__ import absolute_import
 
 # Third Party Stuff
 import nexmo
-from nexmo.errors import ClientError
+from nexmo.errors import ClientError, ServerError
 
 # Local
+from .. import metrics
+from .aio import aiohttp_available, aiohttp_session_options, get_aiohttp_session
 from .base import BaseBackend
+from .http import get_http_session, http_session_options
 
 
 class NexmoBackend(BaseBackend):
+    # Endpoint used by `asend_sms`; the sync SDK posts to the same URL.
+    sms_url = "https://rest.nexmo.com/sms/json"
+    # The SMS API allows 30 requests per second per API key by default.
+    bulk_max_workers = 10
+    bulk_rate_limit = 30
+
     def __init__(self, **options):
         super().__init__(**options)
 
@@ -20,10 +29,50 @@ class NexmoBackend(BaseBackend):
         self._from = options.get("from", None)
 
         self.client = nexmo.Client(key=self._key, secret=self._secret)
+        self.client.session = get_http_session(**http_session_options(options))
         self.exception_class = ClientError
+        self._aiohttp_options = aiohttp_session_options(options)
 
     def send_sms(self, number, message):
-        self.client.send_message({"from": self._from, "to": number, "text": message})
+        response = self.client.send_message({"from": self._from, "to": number, "text": message})
+        return self._get_message_id(response)
+
+    def _send_bulk_message(self, number, message):
+        with metrics.time_send_sms(self):
+            response = self.client.send_message({"from": self._from, "to": number, "text": message})
+        # The SMS API reports per-message failures, including throttling, with
+        # HTTP 200 and a non-zero status, so check it to get an honest result.
+        sms = response["messages"][0]
+        if sms.get("status") != "0":
+            raise ClientError("Message to {} failed with status {}: {}".format(
+                number, sms.get("status"), sms.get("error-text", "")
+            ))
+        return sms.get("message-id")
+
+    @staticmethod
+    def _get_message_id(response):
+        try:
+            return response["messages"][0].get("message-id")
+        except (KeyError, IndexError, TypeError, AttributeError):
+            return None
+
+    async def asend_sms(self, number, message):
+        if not aiohttp_available():
+            return await super().asend_sms(number, message)
+        params = {
+            "api_key": self._key,
+            "api_secret": self._secret,
+            "from": self._from,
+            "to": number,
+            "text": message,
+        }
+        async with get_aiohttp_session(**self._aiohttp_options).post(self.sms_url, data=params) as response:
+            # Mirror the error handling of the sync nexmo client.
+            if 400 <= response.status < 500:
+                raise ClientError("{} response from {}".format(response.status, self.sms_url))
+            if response.status >= 500:
+                raise ServerError("{} response from {}".format(response.status, self.sms_url))
+            return self._get_message_id(await response.json(content_type=None))
 
 
 class NexmoSandboxBackend(NexmoBackend):
@@ -0,0 +1,262 @@
+# -*- coding: utf-8 -*-
+"""
+A backend that sends through several providers with automatic failover.
+
+``RoutingBackend`` wraps other ``BaseBackend`` subclasses, picks an ordered
+list of providers for each destination (by country calling code, else by
+weighted random split), and tries them in turn. Each provider has a circuit
+breaker fed by a rolling window of recent sends: once its error rate or p95
+latency crosses a threshold it is skipped for a cool-down period, after
+which a single trial send decides whether it is used again.
+"""
+
+import math
+import random
+import threading
+import time
+from collections import deque
+
+# Third Party Stuff
+from django.core.exceptions import ImproperlyConfigured
+from phonenumber_field.phonenumber import PhoneNumber
+
+# Local
+from . import _import_backend
+from .base import BaseBackend
+
+DEFAULT_WEIGHT = 1
+DEFAULT_WINDOW_SIZE = 100
+DEFAULT_MIN_SAMPLES = 10
+DEFAULT_ERROR_RATE_THRESHOLD = 0.5
+DEFAULT_LATENCY_THRESHOLD = 5.0  # seconds, compared with the rolling p95
+DEFAULT_COOLDOWN_SECONDS = 30
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+
+class RoutingError(Exception):
+    """
+    Raised when every provider tried for a message failed.
+
+    :ivar errors: list of ``(provider name, exception)`` in the order tried.
+    """
+
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__(
+            "All providers failed: {}".format("; ".join(f"{name}: {exc}" for name, exc in errors))
+        )
+
+
+class ProviderHealth(object):
+    """
+    Rolling latency and error statistics, and the circuit breaker, of one provider.
+
+    The breaker opens when, over the last ``window_size`` sends (and at least
+    ``min_samples``), the error rate exceeds ``error_rate_threshold`` or the
+    p95 latency exceeds ``latency_threshold``. After ``cooldown_seconds`` it
+    lets one trial send through (half-open): success closes it with fresh
+    statistics, failure opens it again.
+    """
+
+    def __init__(self, clock, window_size, min_samples, error_rate_threshold, latency_threshold, cooldown_seconds):
+        self._clock = clock
+        self.min_samples = min_samples
+        self.error_rate_threshold = error_rate_threshold
+        self.latency_threshold = latency_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self._samples = deque(maxlen=window_size)
+        self._lock = threading.Lock()
+        self.state = CLOSED
+        self._opened_at = None
+        self._trial_in_flight = False
+
+    @property
+    def error_rate(self):
+        with self._lock:
+            return self._error_rate()
+
+    @property
+    def p95_latency(self):
+        with self._lock:
+            return self._p95_latency()
+
+    def _error_rate(self):
+        if not self._samples:
+            return 0.0
+        return sum(1 for _, ok in self._samples if not ok) / len(self._samples)
+
+    def _p95_latency(self):
+        if not self._samples:
+            return 0.0
+        latencies = sorted(latency for latency, _ in self._samples)
+        return latencies[max(0, math.ceil(0.95 * len(latencies)) - 1)]
+
+    def allow_request(self):
+        """Return True if a send may go to this provider now."""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and self._clock() - self._opened_at >= self.cooldown_seconds:
+                self.state = HALF_OPEN
+                self._trial_in_flight = False
+            if self.state == HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def release(self):
+        """Give back a trial slot taken by ``allow_request`` without recording an outcome."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record(self, latency, ok):
+        """Record the outcome of one send."""
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._trial_in_flight = False
+                if ok:
+                    self.state = CLOSED
+                    self._samples.clear()
+                else:
+                    self._open()
+                self._samples.append((latency, ok))
+                return
+
+            self._samples.append((latency, ok))
+            if self.state == CLOSED and len(self._samples) >= self.min_samples and (
+                self._error_rate() > self.error_rate_threshold
+                or self._p95_latency() > self.latency_threshold
+            ):
+                self._open()
+
+    def _open(self):
+        self.state = OPEN
+        self._opened_at = self._clock()
+
+
+class RoutingBackend(BaseBackend):
+    """
+    Send through several provider backends, with routing and failover.
+
+    Options:
+        - ``PROVIDERS``: dict of provider name to ``{"BACKEND": import path,
+          "OPTIONS": {...}, "WEIGHT": int}``
+        - ``ROUTES``: dict of country calling code (e.g. ``"44"``) to the
+          ordered list of provider names to try; ``"*"`` matches every other
+          country. Destinations without a route use all providers, ordered
+          by a random draw weighted by ``WEIGHT``.
+        - ``WINDOW_SIZE``: sends kept per provider for the statistics (default: 100)
+        - ``MIN_SAMPLES``: sends needed before the breaker can open (default: 10)
+        - ``ERROR_RATE_THRESHOLD``: error rate that opens the breaker (default: 0.5)
+        - ``LATENCY_THRESHOLD``: p95 latency in seconds that opens the breaker (default: 5.0)
+        - ``COOLDOWN_SECONDS``: time an open breaker skips the provider (default: 30)
+
+    Providers with an open breaker are skipped; if every candidate is open,
+    they are all tried anyway rather than failing outright.
+    """
+
+    # Used for latencies and cool-downs; replaceable in tests.
+    clock = staticmethod(time.monotonic)
+
+    def __init__(self, **options):
+        super().__init__(**options)
+        options = {key.lower(): value for key, value in options.items()}
+        providers = options.get("providers") or {}
+        if not providers:
+            raise ImproperlyConfigured("RoutingBackend needs at least one provider in OPTIONS['PROVIDERS']")
+
+        self.providers = {}
+        self.weights = {}
+        self.health = {}
+        for name, config in providers.items():
+            config = {key.upper(): value for key, value in config.items()}
+            if not config.get("BACKEND"):
+                raise ImproperlyConfigured(f"Please specify BACKEND for provider '{name}' in RoutingBackend PROVIDERS")
+            backend_cls = _import_backend(config["BACKEND"])
+            self.providers[name] = backend_cls(**config.get("OPTIONS", {}))
+            self.weights[name] = config.get("WEIGHT", DEFAULT_WEIGHT)
+            self.health[name] = ProviderHealth(
+                clock=self.clock,
+                window_size=options.get("window_size", DEFAULT_WINDOW_SIZE),
+                min_samples=options.get("min_samples", DEFAULT_MIN_SAMPLES),
+                error_rate_threshold=options.get("error_rate_threshold", DEFAULT_ERROR_RATE_THRESHOLD),
+                latency_threshold=options.get("latency_threshold", DEFAULT_LATENCY_THRESHOLD),
+                cooldown_seconds=options.get("cooldown_seconds", DEFAULT_COOLDOWN_SECONDS),
+            )
+
+        self.routes = {str(code).lstrip("+"): list(names) for code, names in (options.get("routes") or {}).items()}
+        for names in self.routes.values():
+            unknown = set(names) - set(self.providers)
+            if unknown:
+                raise ImproperlyConfigured(
+                    "Unknown provider(s) in RoutingBackend ROUTES: {}".format(", ".join(sorted(unknown)))
+                )
+        self.exception_class = RoutingError
+
+    def _weighted_order(self, names):
+        # Weighted random order without replacement (Efraimidis-Spirakis).
+        return sorted(names, key=lambda name: random.random() ** (1.0 / self.weights[name]), reverse=True)
+
+    def candidates(self, number):
+        """Return the provider names routed for ``number``, in order, before breakers are checked."""
+        try:
+            country_code = str(PhoneNumber.from_string(str(number)).country_code)
+        except Exception:
+            country_code = None
+        names = self.routes.get(country_code) or self.routes.get("*")
+        if names is None:
+            names = self._weighted_order(self.providers)
+        return list(names)
+
+    def _providers_to_try(self, number):
+        # Breakers are asked lazily, right before each provider is tried, so a
+        # half-open provider's single trial slot is only taken for a real send.
+        names = self.candidates(number)
+        allowed = False
+        for name in names:
+            if self.health[name].allow_request():
+                allowed = True
+                yield name
+        if not allowed:
+            yield from names
+
+    def send_sms(self, number, message):
+        errors = []
+        for name in self._providers_to_try(number):
+            health = self.health[name]
+            started = self.clock()
+            try:
+                result = self.providers[name].send_sms(number, message)
+            except Exception as exc:
+                health.record(self.clock() - started, ok=False)
+                errors.append((name, exc))
+                continue
+            except BaseException:
+                # Cancelled or interrupted: no outcome, but free a trial slot.
+                health.release()
+                raise
+            health.record(self.clock() - started, ok=True)
+            return result
+        raise RoutingError(errors)
+
+    async def asend_sms(self, number, message):
+        errors = []
+        for name in self._providers_to_try(number):
+            health = self.health[name]
+            started = self.clock()
+            try:
+                result = await self.providers[name].asend_sms(number, message)
+            except Exception as exc:
+                health.record(self.clock() - started, ok=False)
+                errors.append((name, exc))
+                continue
+            except BaseException:
+                # Cancelled or interrupted: no outcome, but free a trial slot.
+                health.release()
+                raise
+            health.record(self.clock() - started, ok=True)
+            return result
+        raise RoutingError(errors)
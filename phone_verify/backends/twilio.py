@@ -1,15 +1,25 @@
 # -*- coding: utf-8 -*-
 from __future__ import absolute_import
 
+import weakref
+
 # Third Party Stuff
 from twilio.base.exceptions import TwilioRestException
+from twilio.http.http_client import TwilioHttpClient
 from twilio.rest import Client as TwilioRestClient
 
 # Local
+from .aio import aiohttp_available, aiohttp_session_options, get_aiohttp_session
 from .base import BaseBackend
+from .http import get_http_session, http_session_options
 
 
 class TwilioBackend(BaseBackend):
+    # Twilio accepts up to 100 concurrent API requests per account and queues
+    # messages beyond the sender's throughput.
+    bulk_max_workers = 10
+    bulk_rate_limit = 100
+
     def __init__(self, **options):
         super(TwilioBackend, self).__init__(**options)
         # Lower case it just to be sure
@@ -18,11 +28,36 @@ class TwilioBackend(BaseBackend):
         self._secret = options.get("secret", None)  # auth_token
         self._from = options.get("from", None)
 
-        self.client = TwilioRestClient(self._sid, self._secret)
+        http_client = TwilioHttpClient(pool_connections=False)
+        http_client.session = get_http_session(**http_session_options(options))
+        self.client = TwilioRestClient(self._sid, self._secret, http_client=http_client)
         self.exception_class = TwilioRestException
+        self._aiohttp_options = aiohttp_session_options(options)
+        # Async clients, one per event loop since aiohttp sessions are loop-bound.
+        self._async_clients = weakref.WeakKeyDictionary()
 
     def send_sms(self, number, message):
-        self.client.messages.create(to=number, body=message, from_=self._from)
+        sms = self.client.messages.create(to=number, body=message, from_=self._from)
+        return sms.sid
+
+    async def asend_sms(self, number, message):
+        if not aiohttp_available():
+            return await super().asend_sms(number, message)
+        client = self._get_async_client()
+        sms = await client.messages.create_async(to=number, body=message, from_=self._from)
+        return sms.sid
+
+    def _get_async_client(self):
+        from twilio.http.async_http_client import AsyncTwilioHttpClient
+
+        session = get_aiohttp_session(**self._aiohttp_options)
+        client = self._async_clients.get(session)
+        if client is None:
+            http_client = AsyncTwilioHttpClient(pool_connections=False)
+            http_client.session = session
+            client = TwilioRestClient(self._sid, self._secret, http_client=http_client)
+            self._async_clients[session] = client
+        return client
 
 
 class TwilioSandboxBackend(TwilioBackend):
@@ -1,44 +1,298 @@
 # -*- coding: utf-8 -*-
 """
-Constants and default values for phone_verify.
+Constants, default values and the validated ``PHONE_VERIFICATION`` settings
+for phone_verify.
 """
 
+import re
 import warnings
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Mapping
 
 from django.conf import settings as django_settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
 
 DEFAULT_TOKEN_LENGTH = 6
 DEFAULT_MIN_TOKEN_LENGTH = 6
 DEFAULT_MAX_FAILED_ATTEMPTS = 5
 DEFAULT_SECURITY_CODE_EXPIRATION_SECONDS = 600  # 10 minutes
 DEFAULT_RECORD_RETENTION_DAYS = 30  # Days to retain SMS verification records
+DEFAULT_BULK_BATCH_SIZE = 1000  # Rows per DELETE/INSERT when issuing codes in bulk
+DEFAULT_DISPATCHER = "phone_verify.dispatch.SynchronousDispatcher"
+DEFAULT_STORAGE = "phone_verify.storage.ModelVerificationStore"
+DEFAULT_RATE_LIMIT_CACHE = "default"
+DEFAULT_METRICS_EXPORTER = "phone_verify.metrics.InMemoryExporter"
 
+# Session token formats and their generators, see `phone_verify.tokens`.
+SESSION_TOKEN_FORMAT_JWT = "jwt"
+SESSION_TOKEN_FORMAT_COMPACT = "compact"
+SESSION_TOKEN_GENERATORS = {
+    SESSION_TOKEN_FORMAT_JWT: "phone_verify.tokens.JWTSessionTokenGenerator",
+    SESSION_TOKEN_FORMAT_COMPACT: "phone_verify.tokens.CompactSessionTokenGenerator",
+}
 
-def get_security_code_expiration():
+# Scopes accepted in RATE_LIMITS
+RATE_LIMIT_PHONE_NUMBER = "PHONE_NUMBER"
+RATE_LIMIT_IP = "IP"
+RATE_LIMIT_COUNTRY_CODE = "COUNTRY_CODE"
+RATE_LIMIT_SCOPES = (RATE_LIMIT_PHONE_NUMBER, RATE_LIMIT_IP, RATE_LIMIT_COUNTRY_CODE)
+
+REQUIRED_SETTINGS = frozenset({
+    "BACKEND",
+    "OPTIONS",
+    "TOKEN_LENGTH",
+    "MESSAGE",
+    "APP_NAME",
+    "VERIFY_SECURITY_CODE_ONLY_ONCE",
+})
+
+# Verification statuses, also exposed as `BaseBackend` attributes
+SECURITY_CODE_VALID = 0
+SECURITY_CODE_INVALID = 1
+SECURITY_CODE_EXPIRED = 2
+SECURITY_CODE_VERIFIED = 3
+SESSION_TOKEN_INVALID = 4
+SECURITY_CODE_TOO_MANY_ATTEMPTS = 5
+
+
+def _frozen_mapping(value):
+    return MappingProxyType(dict(value or {}))
+
+
+_RATE = re.compile(r"^\s*(\d+)\s*/\s*(\d*)\s*([a-z]+)\s*$")
+_RATE_UNITS = {
+    "s": 1, "sec": 1, "second": 1,
+    "m": 60, "min": 60, "minute": 60,
+    "h": 3600, "hour": 3600,
+    "d": 86400, "day": 86400,
+}
+
+
+def _parse_rate(name, rate):
+    """Parse a rate such as ``"5/h"`` or ``"3/10min"`` into ``(limit, window_seconds)``."""
+    match = _RATE.match(rate) if isinstance(rate, str) else None
+    unit = match and match.group(3)
+    if unit and unit not in _RATE_UNITS and unit.endswith("s"):
+        unit = unit[:-1]
+    if not match or unit not in _RATE_UNITS or int(match.group(1)) < 1:
+        raise ImproperlyConfigured(
+            f"Invalid rate {rate!r} for {name} in RATE_LIMITS. "
+            "Use '<count>/<period>', e.g. '5/h' or '3/10min'."
+        )
+    return int(match.group(1)), int(match.group(2) or 1) * _RATE_UNITS[unit]
+
+
+def _parse_rate_limits(rate_limits):
     """
-    Get security code expiration time in seconds.
+    Validate ``RATE_LIMITS`` into ``{scope: (limit, window)}``.
 
-    Checks for SECURITY_CODE_EXPIRATION_SECONDS (preferred) first,
-    then falls back to SECURITY_CODE_EXPIRATION_TIME (deprecated).
-    Issues a deprecation warning if the old setting name is used.
+    ``COUNTRY_CODE`` may also be a dict of calling code (without ``+``) to
+    rate, with ``"*"`` for every other country; it becomes
+    ``{code: (limit, window)}``.
+    """
+    parsed = {}
+    for scope, rate in (rate_limits or {}).items():
+        if scope not in RATE_LIMIT_SCOPES:
+            raise ImproperlyConfigured(
+                "Unknown scope {!r} in RATE_LIMITS. Use: {}".format(scope, ", ".join(RATE_LIMIT_SCOPES))
+            )
+        if scope == RATE_LIMIT_COUNTRY_CODE:
+            rates = rate if isinstance(rate, dict) else {"*": rate}
+            parsed[scope] = MappingProxyType({
+                str(code).lstrip("+"): _parse_rate(f"{scope} {code}", value) for code, value in rates.items()
+            })
+        elif rate is not None:
+            parsed[scope] = _parse_rate(scope, rate)
+    return MappingProxyType(parsed)
+
+
+@dataclass(frozen=True)
+class PhoneVerificationSettings:
+    """
+    Validated, read-only view of ``settings.PHONE_VERIFICATION``.
 
-    :return: Expiration time in seconds (default: DEFAULT_SECURITY_CODE_EXPIRATION_SECONDS)
+    Build it with ``get_settings()``, which validates the settings once and
+    memoizes the result until Django sends ``setting_changed`` for
+    ``PHONE_VERIFICATION``. Changing the dict in place is not picked up.
     """
-    phone_settings = getattr(django_settings, 'PHONE_VERIFICATION', {})
 
-    # Check for new setting name first
-    if 'SECURITY_CODE_EXPIRATION_SECONDS' in phone_settings:
-        return phone_settings['SECURITY_CODE_EXPIRATION_SECONDS']
+    backend: str
+    options: Mapping = field(repr=False)
+    token_length: int
+    message: str
+    app_name: str
+    verify_security_code_only_once: bool
+    security_code_expiration_seconds: int
+    min_token_length: int = DEFAULT_MIN_TOKEN_LENGTH
+    max_failed_attempts: int = DEFAULT_MAX_FAILED_ATTEMPTS
+    record_retention_days: int = DEFAULT_RECORD_RETENTION_DAYS
+    bulk_batch_size: int = DEFAULT_BULK_BATCH_SIZE
+    signed_session_tokens: bool = False
+    session_token_format: str = SESSION_TOKEN_FORMAT_JWT
+    session_token_options: Mapping = field(default_factory=dict, repr=False)
+    dispatcher: str = DEFAULT_DISPATCHER
+    dispatcher_options: Mapping = field(default_factory=dict, repr=False)
+    storage: str = DEFAULT_STORAGE
+    storage_options: Mapping = field(default_factory=dict, repr=False)
+    rate_limits: Mapping = field(default_factory=dict)
+    rate_limit_cache: str = DEFAULT_RATE_LIMIT_CACHE
+    metrics_enabled: bool = False
+    metrics_exporter: str = DEFAULT_METRICS_EXPORTER
+    metrics_exporter_options: Mapping = field(default_factory=dict, repr=False)
+
+    @classmethod
+    def from_dict(cls, phone_settings):
+        """
+        Validate ``phone_settings`` and build the settings object.
+
+        :raises ImproperlyConfigured: if a required setting is missing or invalid.
+        """
+        missing_settings = REQUIRED_SETTINGS - set(phone_settings)
+        if missing_settings:
+            raise ImproperlyConfigured(
+                "Please specify following settings in settings.py: {}".format(
+                    ", ".join(sorted(missing_settings))
+                )
+            )
+        if not phone_settings["BACKEND"]:
+            raise ImproperlyConfigured(
+                "Please specify BACKEND in PHONE_VERIFICATION within your settings"
+            )
 
-    # Fall back to old setting name with deprecation warning
-    if 'SECURITY_CODE_EXPIRATION_TIME' in phone_settings:
-        warnings.warn(
-            "SECURITY_CODE_EXPIRATION_TIME is deprecated and will be removed in a future version. "
-            "Please use SECURITY_CODE_EXPIRATION_SECONDS instead.",
-            DeprecationWarning,
-            stacklevel=2
+        # Check for expiration time setting (either old or new name)
+        if "SECURITY_CODE_EXPIRATION_SECONDS" in phone_settings:
+            expiration = phone_settings["SECURITY_CODE_EXPIRATION_SECONDS"]
+        elif "SECURITY_CODE_EXPIRATION_TIME" in phone_settings:
+            warnings.warn(
+                "SECURITY_CODE_EXPIRATION_TIME is deprecated and will be removed in a future version. "
+                "Please use SECURITY_CODE_EXPIRATION_SECONDS instead.",
+                DeprecationWarning,
+                stacklevel=4
+            )
+            expiration = phone_settings["SECURITY_CODE_EXPIRATION_TIME"]
+        else:
+            raise ImproperlyConfigured(
+                "Please specify either SECURITY_CODE_EXPIRATION_SECONDS (recommended) "
+                "or SECURITY_CODE_EXPIRATION_TIME in settings.py"
+            )
+
+        # Validate minimum token length
+        token_length = phone_settings["TOKEN_LENGTH"]
+        min_token_length = phone_settings.get("MIN_TOKEN_LENGTH", DEFAULT_MIN_TOKEN_LENGTH)
+        if token_length < min_token_length:
+            raise ImproperlyConfigured(
+                f"TOKEN_LENGTH ({token_length}) cannot be less than MIN_TOKEN_LENGTH ({min_token_length})"
+            )
+
+        session_token_format = phone_settings.get("SESSION_TOKEN_FORMAT", SESSION_TOKEN_FORMAT_JWT)
+        # Anything else must be the import path of a generator class.
+        if session_token_format not in SESSION_TOKEN_GENERATORS and "." not in session_token_format:
+            raise ImproperlyConfigured(
+                "SESSION_TOKEN_FORMAT must be one of {} or an import path, got {!r}".format(
+                    ", ".join(SESSION_TOKEN_GENERATORS), session_token_format
+                )
+            )
+
+        return cls(
+            backend=phone_settings["BACKEND"],
+            options=_frozen_mapping(phone_settings["OPTIONS"]),
+            token_length=token_length,
+            message=phone_settings["MESSAGE"],
+            app_name=phone_settings["APP_NAME"],
+            verify_security_code_only_once=bool(phone_settings["VERIFY_SECURITY_CODE_ONLY_ONCE"]),
+            security_code_expiration_seconds=expiration,
+            min_token_length=min_token_length,
+            max_failed_attempts=phone_settings.get("MAX_FAILED_ATTEMPTS", DEFAULT_MAX_FAILED_ATTEMPTS),
+            record_retention_days=phone_settings.get("RECORD_RETENTION_DAYS", DEFAULT_RECORD_RETENTION_DAYS),
+            bulk_batch_size=phone_settings.get("BULK_BATCH_SIZE", DEFAULT_BULK_BATCH_SIZE),
+            signed_session_tokens=bool(phone_settings.get("SIGNED_SESSION_TOKENS", False)),
+            session_token_format=session_token_format,
+            session_token_options=_frozen_mapping(phone_settings.get("SESSION_TOKEN_OPTIONS")),
+            dispatcher=phone_settings.get("DISPATCHER", DEFAULT_DISPATCHER),
+            dispatcher_options=_frozen_mapping(phone_settings.get("DISPATCHER_OPTIONS")),
+            storage=phone_settings.get("STORAGE", DEFAULT_STORAGE),
+            storage_options=_frozen_mapping(phone_settings.get("STORAGE_OPTIONS")),
+            rate_limits=_parse_rate_limits(phone_settings.get("RATE_LIMITS")),
+            rate_limit_cache=phone_settings.get("RATE_LIMIT_CACHE", DEFAULT_RATE_LIMIT_CACHE),
+            metrics_enabled=bool(phone_settings.get("METRICS_ENABLED", False)),
+            metrics_exporter=phone_settings.get("METRICS_EXPORTER", DEFAULT_METRICS_EXPORTER),
+            metrics_exporter_options=_frozen_mapping(phone_settings.get("METRICS_EXPORTER_OPTIONS")),
         )
-        return phone_settings['SECURITY_CODE_EXPIRATION_TIME']
 
-    # Default value
-    return DEFAULT_SECURITY_CODE_EXPIRATION_SECONDS
+
+def check_import_paths(phone_settings):
+    """
+    Import every class named in ``phone_settings`` other than the backend.
+
+    ``METRICS_EXPORTER`` is only checked when ``METRICS_ENABLED`` is on.
+
+    :raises ImproperlyConfigured: if a class cannot be imported.
+    """
+    import_paths = {
+        "STORAGE": phone_settings.storage,
+        "DISPATCHER": phone_settings.dispatcher,
+        "SESSION_TOKEN_FORMAT": SESSION_TOKEN_GENERATORS.get(
+            phone_settings.session_token_format, phone_settings.session_token_format
+        ),
+    }
+    if phone_settings.metrics_enabled:
+        import_paths["METRICS_EXPORTER"] = phone_settings.metrics_exporter
+    for name, import_path in import_paths.items():
+        try:
+            import_string(import_path)
+        except ImportError as e:
+            raise ImproperlyConfigured("Could not import {} {!r}: {}".format(name, import_path, e)) from e
+
+
+_settings = None
+
+
+def get_settings():
+    """
+    Return the validated ``PhoneVerificationSettings``.
+
+    :raises ImproperlyConfigured: if ``PHONE_VERIFICATION`` is missing or invalid.
+    """
+    global _settings
+
+    if _settings is None:
+        try:
+            phone_settings = django_settings.PHONE_VERIFICATION
+        except AttributeError as e:
+            raise ImproperlyConfigured("Please define PHONE_VERIFICATION in settings") from e
+        _settings = PhoneVerificationSettings.from_dict(phone_settings)
+    return _settings
+
+
+def clear_settings():
+    """Drop the memoized settings so the next ``get_settings()`` call re-reads them."""
+    global _settings
+    _settings = None
+
+
+@receiver(setting_changed)
+def _clear_settings_on_setting_changed(setting, **kwargs):
+    if setting == "PHONE_VERIFICATION":
+        clear_settings()
+
+
+def get_security_code_expiration():
+    """
+    Get security code expiration time in seconds.
+
+    Reads SECURITY_CODE_EXPIRATION_SECONDS (preferred), falling back to
+    SECURITY_CODE_EXPIRATION_TIME (deprecated). The deprecation warning is
+    issued when the settings are first loaded.
+
+    :return: Expiration time in seconds
+    """
+    return get_settings().security_code_expiration_seconds
+
+
+def get_max_failed_attempts():
+    """Return the ``MAX_FAILED_ATTEMPTS`` setting (default: DEFAULT_MAX_FAILED_ATTEMPTS)."""
+    return get_settings().max_failed_attempts
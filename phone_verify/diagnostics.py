@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+"""
+Record and budget the SQL issued by phone_verify code paths.
+
+``QueryRecorder`` collects every statement run on the selected database
+connections of the current thread through ``connection.execute_wrapper``,
+so it works with ``DEBUG = False`` and adds nothing to code outside it.
+
+``query_budget(name)`` fails with ``QueryBudgetExceeded`` when the block
+runs more statements than ``QUERY_BUDGETS[name]``; the test suite wraps each
+public entry point in it. ``QueryCountMiddleware`` uses the same recorder to
+log the statements of every request when ``DEBUG`` is on::
+
+    MIDDLEWARE = [
+        ...
+        "phone_verify.diagnostics.QueryCountMiddleware",
+    ]
+
+Budgets are for databases with ``INSERT ... ON CONFLICT`` and ``UPDATE ...
+RETURNING`` (PostgreSQL and SQLite 3.35+), outside an outer transaction.
+Under autocommit, SQLite also sends an explicit ``BEGIN`` for some writes,
+which the budgets allow for. On MySQL and MariaDB, verification falls back
+to ``SELECT ... FOR UPDATE`` and an ``UPDATE``, so the outcomes that
+record an attempt (``SECURITY_CODE_VALID``, ``_INVALID``, ``_EXPIRED`` and
+``_VERIFIED``) take two statements; pass ``budget`` to ``query_budget`` there.
+"""
+
+import logging
+import time
+from contextlib import ExitStack, contextmanager
+
+# Third Party Stuff
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+# Maximum statements per entry point.
+QUERY_BUDGETS = {
+    # One upsert (plus SQLite's BEGIN around it).
+    "create_security_code_and_session_token": 2,
+    # One UPDATE ... RETURNING that checks and records the attempt.
+    "validate_security_code.SECURITY_CODE_VALID": 1,
+    "validate_security_code.SECURITY_CODE_INVALID": 1,
+    "validate_security_code.SECURITY_CODE_EXPIRED": 1,
+    "validate_security_code.SECURITY_CODE_VERIFIED": 1,
+    # The UPDATE matched nothing; one SELECT tells the two cases apart.
+    "validate_security_code.SESSION_TOKEN_INVALID": 2,
+    "validate_security_code.SECURITY_CODE_TOO_MANY_ATTEMPTS": 2,
+    # COUNT, then one DELETE (plus SQLite's BEGIN around it).
+    "cleanup_phone_verifications": 3,
+    # One COUNT (or a statistics lookup on large tables), then the page;
+    # `is_valid` is annotated in SQL.
+    "admin_changelist": 2,
+}
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Raised by ``query_budget`` when a block runs more statements than its budget."""
+
+    def __init__(self, name, budget, queries):
+        self.name = name
+        self.budget = budget
+        self.queries = queries
+        statements = "\n".join(
+            "  {}. {}".format(index, query["sql"]) for index, query in enumerate(queries, start=1)
+        )
+        super().__init__(
+            "{} ran {} queries, over its budget of {}:\n{}".format(name, len(queries), budget, statements)
+        )
+
+
+class QueryRecorder(object):
+    """
+    Context manager recording the statements run in the current thread.
+
+    :param using: database alias or list of aliases to record (default: all)
+    :ivar queries: list of ``{"sql", "params", "alias", "time"}`` dicts, in
+        the order the statements ran; ``time`` is in seconds.
+    """
+
+    def __init__(self, using=None):
+        if using is None:
+            using = list(connections)
+        elif isinstance(using, str):
+            using = [using]
+        self.using = using
+        self.queries = []
+        self._stack = None
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    def _wrapper(self, alias):
+        def record(execute, sql, params, many, context):
+            started = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                self.queries.append(
+                    {"sql": sql, "params": params, "alias": alias, "time": time.perf_counter() - started}
+                )
+
+        return record
+
+    def __enter__(self):
+        self.queries = []
+        self._stack = ExitStack()
+        for alias in self.using:
+            self._stack.enter_context(connections[alias].execute_wrapper(self._wrapper(alias)))
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._stack.close()
+        self._stack = None
+        return False
+
+
+@contextmanager
+def query_budget(name, budget=None, using=None):
+    """
+    Record the block's statements and fail if there are more than the budget.
+
+    :param name: key into ``QUERY_BUDGETS``, also used in the error message
+    :param budget: statement limit, overriding ``QUERY_BUDGETS[name]``
+    :raises QueryBudgetExceeded: listing every recorded statement
+    """
+    if budget is None:
+        budget = QUERY_BUDGETS[name]
+    with QueryRecorder(using=using) as recorder:
+        yield recorder
+    if recorder.count > budget:
+        raise QueryBudgetExceeded(name, budget, recorder.queries)
+
+
+class QueryCountMiddleware(object):
+    """
+    Log the number and total time of database statements of each request.
+
+    Only active when ``DEBUG`` is True. The count, then each statement, go
+    to the ``phone_verify.diagnostics`` logger at DEBUG level.
+    """
+
+    def __init__(self, get_response):
+        if not settings.DEBUG:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with QueryRecorder() as recorder:
+            response = self.get_response(request)
+        logger.debug(
+            "%s %s: %d queries in %.2fms",
+            request.method,
+            request.path,
+            recorder.count,
+            sum(query["time"] for query in recorder.queries) * 1000,
+        )
+        for query in recorder.queries:
+            logger.debug("  %s", query["sql"])
+        return response
@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+"""
+SMS dispatchers decide *when* a rendered verification message reaches the
+backend's ``send_sms``.
+
+The default ``SynchronousDispatcher`` sends inline, inside the register
+request. ``ThreadPoolDispatcher`` and ``OutboxDispatcher`` let
+``send_security_code_and_generate_session_token`` return the session token as
+soon as the security code is stored, and send the SMS afterwards.
+
+Select one with ``PHONE_VERIFICATION["DISPATCHER"]``; keyword arguments come
+from ``PHONE_VERIFICATION["DISPATCHER_OPTIONS"]``.
+"""
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Third Party Stuff
+import django
+from asgiref.sync import sync_to_async
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+from . import metrics
+from .constants import get_settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_THREAD_POOL_MAX_WORKERS = 4
+
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+
+
+class BaseDispatcher(object):
+    """
+    Base class for SMS dispatchers.
+
+    Subclass it and implement ``dispatch()`` to hand messages to a task queue
+    such as Celery or RQ.
+    """
+
+    # True if `dispatch` only writes to the default database. The security
+    # code is then stored and the message dispatched in one transaction, so
+    # neither is committed without the other.
+    transactional = False
+
+    def __init__(self, **options):
+        pass
+
+    def dispatch(self, backend, number, message):
+        """
+        Arrange for ``message`` to be sent to ``number``.
+
+        :param backend: the backend instance resolved for this request.
+        :param number: the phone number of recipient.
+        :param message: the fully rendered message text.
+        """
+        raise NotImplementedError()
+
+    async def adispatch(self, backend, number, message):
+        """Async counterpart of ``dispatch``; runs it in a thread by default."""
+        return await sync_to_async(self.dispatch)(backend, number, message)
+
+    def close(self):
+        """Release resources held by the dispatcher."""
+
+
+class SynchronousDispatcher(BaseDispatcher):
+    """Send inline. Provider errors propagate to the caller."""
+
+    def dispatch(self, backend, number, message):
+        with metrics.time_send_sms(backend):
+            return backend.send_sms(number, message)
+
+    async def adispatch(self, backend, number, message):
+        with metrics.time_send_sms(backend):
+            return await backend.asend_sms(number, message)
+
+
+class ThreadPoolDispatcher(BaseDispatcher):
+    """
+    Send from an in-process thread pool.
+
+    Messages queued in memory are lost if the process exits before they are
+    sent; use ``OutboxDispatcher`` when that matters.
+
+    Options:
+        - ``MAX_WORKERS``: number of sender threads (default: 4)
+    """
+
+    def __init__(self, **options):
+        super().__init__(**options)
+        options = {key.lower(): value for key, value in options.items()}
+        self.executor = ThreadPoolExecutor(
+            max_workers=options.get("max_workers", DEFAULT_THREAD_POOL_MAX_WORKERS),
+            thread_name_prefix="phone_verify_sms",
+        )
+
+    def dispatch(self, backend, number, message):
+        return self.executor.submit(self._send, backend, number, message)
+
+    async def adispatch(self, backend, number, message):
+        # Submitting never blocks, so there is no need for a thread hop.
+        return self.dispatch(backend, number, message)
+
+    def _send(self, backend, number, message):
+        try:
+            with metrics.time_send_sms(backend):
+                backend.send_sms(number, message)
+        except Exception as exc:
+            logger.error(
+                "Error in sending verification code to {phone_number}: "
+                "{error}".format(phone_number=number, error=exc)
+            )
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+
+
+class OutboxDispatcher(BaseDispatcher):
+    """
+    Store the message in the ``SMSOutbox`` table.
+
+    The row is written in the same transaction as the security code. A
+    worker running ``python manage.py process_sms_outbox`` sends queued
+    messages with the configured backend; any number of workers can run
+    side by side.
+    """
+
+    transactional = True
+
+    def dispatch(self, backend, number, message):
+        from .models import SMSOutbox
+
+        return SMSOutbox.objects.create(phone_number=number, message=message)
+
+    async def adispatch(self, backend, number, message):
+        # `acreate` needs Django 4.1's async ORM.
+        if django.VERSION < (4, 1):
+            return await super().adispatch(backend, number, message)
+
+        from .models import SMSOutbox
+
+        return await SMSOutbox.objects.acreate(phone_number=number, message=message)
+
+
+def get_dispatcher():
+    """Return the process-wide dispatcher configured in ``PHONE_VERIFICATION``."""
+    global _dispatcher
+
+    if _dispatcher is None:
+        with _dispatcher_lock:
+            if _dispatcher is None:
+                phone_settings = get_settings()
+                dispatcher_cls = import_string(phone_settings.dispatcher)
+                _dispatcher = dispatcher_cls(**phone_settings.dispatcher_options)
+    return _dispatcher
+
+
+def clear_dispatcher():
+    """Close and drop the cached dispatcher."""
+    global _dispatcher
+
+    with _dispatcher_lock:
+        if _dispatcher is not None:
+            _dispatcher.close()
+        _dispatcher = None
+
+
+@receiver(setting_changed)
+def _clear_dispatcher_on_setting_changed(setting, **kwargs):
+    if setting == "PHONE_VERIFICATION":
+        clear_dispatcher()
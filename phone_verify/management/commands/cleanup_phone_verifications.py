@@ -1,12 +1,14 @@
 # -*- coding: utf-8 -*-
+import time
 from datetime import timedelta
 
-from django.conf import settings
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 from django.utils import timezone
 
-from phone_verify.constants import DEFAULT_RECORD_RETENTION_DAYS
+from phone_verify.constants import get_settings
 from phone_verify.models import SMSVerification
+from phone_verify.partitions import get_partition_manager
+from phone_verify.storage import get_verification_store
 
 # Number of records to preview in dry-run mode
 DRY_RUN_PREVIEW_LIMIT = 10
@@ -21,42 +23,85 @@ class Command(BaseCommand):
             type=int,
             help="Number of days to retain records (overrides RECORD_RETENTION_DAYS setting)",
         )
+        parser.add_argument(
+            "--expired",
+            action="store_true",
+            help="Delete every record whose security code has expired, instead of records older than --days",
+        )
         parser.add_argument(
             "--dry-run",
             action="store_true",
             help="Show what would be deleted without actually deleting",
         )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            help="Delete in committed batches of this many rows, walking by primary key",
+        )
+        parser.add_argument(
+            "--sleep-between-batches",
+            type=float,
+            default=0.0,
+            help="Seconds to sleep after each batch in batched mode (default: 0)",
+        )
+        parser.add_argument(
+            "--max-runtime",
+            type=float,
+            help="Stop batched mode after this many seconds; rerun to continue",
+        )
 
     def handle(self, *args, **options):
         days = options.get("days")
         dry_run = options.get("dry_run", False)
 
-        if days is None:
-            days = settings.PHONE_VERIFICATION.get(
-                "RECORD_RETENTION_DAYS", DEFAULT_RECORD_RETENTION_DAYS
-            )
+        if options.get("expired"):
+            if days is not None:
+                raise CommandError("--expired and --days cannot be used together")
+            description = "that have expired"
+            old_verifications = SMSVerification.objects.expired()
+        else:
+            if days is None:
+                days = get_settings().record_retention_days
+            description = f"older than {days} days"
+            cutoff_date = timezone.now() - timedelta(days=days)
+
+            if get_verification_store().partitioned:
+                self._drop_partitions(cutoff_date, days, dry_run)
+                return
+
+            old_verifications = SMSVerification.objects.filter(created_at__lt=cutoff_date)
 
-        cutoff_date = timezone.now() - timedelta(days=days)
+        batch_size = options.get("batch_size")
+        if batch_size is not None and not dry_run:
+            if batch_size < 1:
+                raise CommandError("--batch-size must be a positive integer")
+            self._delete_in_batches(
+                old_verifications,
+                description,
+                batch_size,
+                options.get("sleep_between_batches") or 0.0,
+                options.get("max_runtime"),
+            )
+            return
 
-        old_verifications = SMSVerification.objects.filter(created_at__lt=cutoff_date)
         count = old_verifications.count()
 
         if count == 0:
             self.stdout.write(
-                self.style.SUCCESS(f"No verification records older than {days} days found.")
+                self.style.SUCCESS(f"No verification records {description} found.")
             )
             return
 
         if dry_run:
             self.stdout.write(
                 self.style.WARNING(
-                    f"DRY RUN: Would delete {count} verification record(s) older than {days} days"
+                    f"DRY RUN: Would delete {count} verification record(s) {description}"
                 )
             )
             self.stdout.write("Records that would be deleted:")
             for record in old_verifications[:DRY_RUN_PREVIEW_LIMIT]:
                 self.stdout.write(
-                    f"  - {record.phone_number} (created: {record.created_at})"
+                    f"  - {record.phone_number} (created: {record.created_at}, expires: {record.expires_at})"
                 )
             if count > DRY_RUN_PREVIEW_LIMIT:
                 self.stdout.write(f"  ... and {count - DRY_RUN_PREVIEW_LIMIT} more")
@@ -64,6 +109,85 @@ class Command(BaseCommand):
             deleted_count, _ = old_verifications.delete()
             self.stdout.write(
                 self.style.SUCCESS(
-                    f"Successfully deleted {deleted_count} verification record(s) older than {days} days"
+                    f"Successfully deleted {deleted_count} verification record(s) {description}"
                 )
             )
+
+    def _drop_partitions(self, cutoff_date, days, dry_run):
+        """Drop the daily partitions that only hold records older than ``cutoff_date``."""
+        manager = get_partition_manager()
+        if dry_run:
+            names = [manager.partition_name(day) for day in manager.partitions_before(cutoff_date)]
+        else:
+            names = manager.drop_partitions_before(cutoff_date)
+
+        if not names:
+            self.stdout.write(
+                self.style.SUCCESS(f"No partitions with only records older than {days} days found.")
+            )
+            return
+
+        if dry_run:
+            self.stdout.write(self.style.WARNING(f"DRY RUN: Would drop {len(names)} partition(s):"))
+        for name in names:
+            self.stdout.write(f"  - {name}")
+        if not dry_run:
+            self.stdout.write(
+                self.style.SUCCESS(f"Successfully dropped {len(names)} partition(s) older than {days} days")
+            )
+
+    def _delete_in_batches(self, old_verifications, description, batch_size, sleep_between_batches, max_runtime):
+        """
+        Delete ``old_verifications`` in primary-key order, one committed batch at a time.
+
+        Each batch selects at most ``batch_size`` primary keys above the last
+        one deleted and removes them in its own transaction, so no statement
+        touches more than ``batch_size`` rows and an interrupted run loses at
+        most one batch. Deleted rows are gone, so rerunning the command simply
+        picks up where the previous run stopped.
+        """
+        started = time.monotonic()
+        last_pk = None
+        deleted_total = 0
+        batches = 0
+
+        while True:
+            batch = old_verifications.order_by("pk")
+            if last_pk is not None:
+                batch = batch.filter(pk__gt=last_pk)
+            pks = list(batch.values_list("pk", flat=True)[:batch_size])
+            if not pks:
+                break
+
+            # Outside a transaction each batch's DELETE commits on its own
+            deleted_count, _ = SMSVerification.objects.filter(pk__in=pks).delete()
+            last_pk = pks[-1]
+            deleted_total += deleted_count
+            batches += 1
+            self.stdout.write(f"Batch {batches}: deleted {deleted_count} record(s), {deleted_total} so far")
+
+            if len(pks) < batch_size:
+                break
+            if max_runtime is not None and time.monotonic() - started >= max_runtime:
+                self.stdout.write(
+                    self.style.WARNING(
+                        f"Stopped after reaching --max-runtime of {max_runtime:g}s with {deleted_total} "
+                        "record(s) deleted. Run the command again to continue."
+                    )
+                )
+                return
+            if sleep_between_batches > 0:
+                time.sleep(sleep_between_batches)
+
+        if deleted_total == 0:
+            self.stdout.write(
+                self.style.SUCCESS(f"No verification records {description} found.")
+            )
+            return
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Successfully deleted {deleted_total} verification record(s) {description} "
+                f"in {batches} batch(es)"
+            )
+        )
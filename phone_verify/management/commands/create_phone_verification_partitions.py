@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+from django.core.management.base import BaseCommand, CommandError
+
+from phone_verify.partitions import PostgresPartitionManager, get_partition_manager, today
+from phone_verify.storage import get_verification_store
+
+
+class Command(BaseCommand):
+    help = "Create the daily partitions of the sms_verification table ahead of time"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            help="Number of days of partitions to create, starting today "
+                 "(default: PRECREATE_DAYS storage option, 7)",
+        )
+        parser.add_argument(
+            "--convert",
+            action="store_true",
+            help="First convert sms_verification to a partitioned table (PostgreSQL only; "
+                 "locks the table while existing rows are copied)",
+        )
+
+    def handle(self, *args, **options):
+        store = get_verification_store()
+        if not store.partitioned:
+            raise CommandError(
+                "Set PHONE_VERIFICATION['STORAGE'] to "
+                "'phone_verify.storage.PartitionedModelVerificationStore' to use partitions"
+            )
+
+        days = options.get("days")
+        if days is None:
+            days = store.precreate_days
+        if days < 1:
+            raise CommandError("--days must be a positive integer")
+
+        manager = get_partition_manager()
+        if isinstance(manager, PostgresPartitionManager) and not manager.is_partitioned():
+            if not options.get("convert"):
+                raise CommandError(
+                    f"{manager.table} is not partitioned yet. Run this command with --convert first."
+                )
+            manager.convert(precreate_days=days)
+            self.stdout.write(self.style.SUCCESS(f"Converted {manager.table} to daily partitions"))
+
+        created = manager.create_partitions(today(), days)
+        for name in created:
+            self.stdout.write(f"  - {name}")
+        self.stdout.write(self.style.SUCCESS(f"Created {len(created)} partition(s) for the next {days} day(s)"))
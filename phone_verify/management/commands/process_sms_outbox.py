@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+import time
+import uuid
+from collections import defaultdict
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from phone_verify.backends import get_sms_backend
+from phone_verify.models import SMSDeliveryAttempt, SMSOutbox
+
+DEFAULT_BATCH_SIZE = 100
+DEFAULT_MAX_ATTEMPTS = 5
+DEFAULT_POLL_INTERVAL = 1.0
+DEFAULT_LEASE_SECONDS = 300
+
+
+class Command(BaseCommand):
+    help = "Send verification messages queued by the OutboxDispatcher"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help=f"Number of messages to send per batch (default: {DEFAULT_BATCH_SIZE})",
+        )
+        parser.add_argument(
+            "--max-attempts",
+            type=int,
+            default=DEFAULT_MAX_ATTEMPTS,
+            help=f"Give up on a message after this many failed sends (default: {DEFAULT_MAX_ATTEMPTS})",
+        )
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep polling the outbox instead of exiting once it is empty",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=DEFAULT_POLL_INTERVAL,
+            help=f"Seconds to wait between polls in --loop mode (default: {DEFAULT_POLL_INTERVAL})",
+        )
+        parser.add_argument(
+            "--lease-seconds",
+            type=int,
+            default=DEFAULT_LEASE_SECONDS,
+            help=(
+                "Seconds a claimed message stays reserved for this worker; a message claimed by "
+                f"a worker that died is picked up again after it (default: {DEFAULT_LEASE_SECONDS})"
+            ),
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        max_attempts = options["max_attempts"]
+        lease_seconds = options["lease_seconds"]
+
+        total_sent = total_failed = 0
+        while True:
+            sent, failed = self.process_batch(batch_size, max_attempts, lease_seconds)
+            total_sent += sent
+            total_failed += failed
+            # Stop (or wait) when the outbox is drained or sends start failing,
+            # so failing messages are not retried in a tight loop.
+            if sent + failed < batch_size or failed:
+                if not options["loop"]:
+                    break
+                time.sleep(options["interval"])
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Sent {total_sent} message(s), {total_failed} failed attempt(s)")
+        )
+
+    def claim_batch(self, batch_size, lease_seconds=DEFAULT_LEASE_SECONDS):
+        """
+        Reserve up to ``batch_size`` pending messages for this worker.
+
+        Candidates are read with ``SELECT ... FOR UPDATE SKIP LOCKED``, so
+        concurrent workers pick disjoint rows without waiting on each other,
+        and stamped with a fresh claim token. The stamp only applies to rows
+        that are still unclaimed (or whose lease ran out), so two workers
+        never hold the same message, even on databases without ``SKIP LOCKED``.
+
+        :return: ``(claim token, list of claimed SMSOutbox)``
+        """
+        now = timezone.now()
+        claim_token = uuid.uuid4()
+        claimable = Q(status=SMSOutbox.STATUS_PENDING) & (
+            Q(claimed_at__isnull=True) | Q(claimed_at__lt=now - timedelta(seconds=lease_seconds))
+        )
+        with transaction.atomic():
+            ids = list(
+                SMSOutbox.objects.select_for_update(skip_locked=True)
+                .filter(claimable)
+                .order_by("created_at")
+                .values_list("pk", flat=True)[:batch_size]
+            )
+            if not ids:
+                return claim_token, []
+            SMSOutbox.objects.filter(claimable, pk__in=ids).update(
+                claim_token=claim_token, claimed_at=now, modified_at=now
+            )
+        claimed = SMSOutbox.objects.filter(pk__in=ids, claim_token=claim_token).order_by("created_at")
+        return claim_token, list(claimed)
+
+    def process_batch(self, batch_size, max_attempts, lease_seconds=DEFAULT_LEASE_SECONDS):
+        claim_token, claimed = self.claim_batch(batch_size, lease_seconds)
+
+        # One bulk send per backend, so each provider gets its concurrent,
+        # rate-limited `send_bulk_messages`.
+        outboxes_by_backend = defaultdict(list)
+        for outbox in claimed:
+            outboxes_by_backend[get_sms_backend(outbox.phone_number)].append(outbox)
+
+        delivery_attempts = []
+        sent_ids = []
+        failures = []
+        for backend, outboxes in outboxes_by_backend.items():
+            backend_path = "{}.{}".format(type(backend).__module__, type(backend).__qualname__)
+            results = backend.send_bulk_messages((str(outbox.phone_number), outbox.message) for outbox in outboxes)
+            for outbox, result in zip(outboxes, results):
+                delivery_attempts.append(SMSDeliveryAttempt(
+                    outbox=outbox,
+                    backend=backend_path,
+                    success=result.success,
+                    provider_message_id="" if result.message_id is None else str(result.message_id),
+                    error="" if result.success else str(result.error),
+                ))
+                if result.success:
+                    sent_ids.append(outbox.pk)
+                else:
+                    failures.append((outbox, str(result.error)))
+                    self.stderr.write(f"Error in sending verification code to {outbox.phone_number}: {result.error}")
+
+        # Every update is conditional on our claim token: if our lease ran out
+        # and another worker took a message over, its outcome is left to that worker.
+        # The message holds the plaintext security code, so it is blanked as soon
+        # as it will not be sent again.
+        now = timezone.now()
+        with transaction.atomic():
+            SMSDeliveryAttempt.objects.bulk_create(delivery_attempts)
+            if sent_ids:
+                SMSOutbox.objects.filter(pk__in=sent_ids, claim_token=claim_token).update(
+                    status=SMSOutbox.STATUS_SENT,
+                    message="",
+                    attempts=F("attempts") + 1,
+                    sent_at=now,
+                    claim_token=None,
+                    claimed_at=None,
+                    modified_at=now,
+                )
+            for outbox, error in failures:
+                attempts = outbox.attempts + 1
+                if attempts >= max_attempts:
+                    status, message = SMSOutbox.STATUS_FAILED, ""
+                else:
+                    status, message = SMSOutbox.STATUS_PENDING, outbox.message
+                SMSOutbox.objects.filter(pk=outbox.pk, claim_token=claim_token).update(
+                    status=status,
+                    message=message,
+                    attempts=attempts,
+                    last_error=error,
+                    claim_token=None,
+                    claimed_at=None,
+                    modified_at=now,
+                )
+        return len(sent_ids), len(failures)
@@ -0,0 +1,291 @@
+# -*- coding: utf-8 -*-
+"""
+Latency and outcome metrics for register, verify and send.
+
+Metrics are off unless ``PHONE_VERIFICATION["METRICS_ENABLED"]`` is True;
+then they go to the exporter named by ``METRICS_EXPORTER`` (default:
+``InMemoryExporter``) built with ``METRICS_EXPORTER_OPTIONS``.
+``PrometheusExporter`` publishes them with ``prometheus_client``. When
+metrics are off, ``timed()`` returns a shared no-op context manager and
+nothing else runs.
+
+Metrics:
+    - ``phone_verify_send_sms_seconds``: histogram of ``send_sms`` provider
+      latency, labelled by ``backend`` class name
+    - ``phone_verify_storage_seconds``: histogram of time spent in the
+      verification store (the database with the model stores), labelled by
+      ``operation`` (``create_security_code_and_session_token`` or
+      ``validate_security_code``)
+    - ``phone_verify_verify_total``: counter of verify outcomes, labelled by
+      ``status`` (``SECURITY_CODE_VALID``, ``SECURITY_CODE_INVALID``, ...)
+    - ``phone_verify_outbox_depth``: gauge of pending ``SMSOutbox`` messages
+    - ``phone_verify_live_verifications``: gauge of unexpired
+      ``SMSVerification`` rows
+
+Gauges are computed with one ``COUNT`` query when they are read, never on
+the request path.
+"""
+
+import threading
+import time
+from collections import defaultdict
+from contextlib import nullcontext
+
+# Third Party Stuff
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+from . import constants
+from .constants import get_settings
+
+SEND_SMS_SECONDS = "phone_verify_send_sms_seconds"
+STORAGE_SECONDS = "phone_verify_storage_seconds"
+VERIFY_TOTAL = "phone_verify_verify_total"
+OUTBOX_DEPTH = "phone_verify_outbox_depth"
+LIVE_VERIFICATIONS = "phone_verify_live_verifications"
+
+HISTOGRAM = "histogram"
+COUNTER = "counter"
+GAUGE = "gauge"
+
+# name: (type, description, label names)
+METRICS = {
+    SEND_SMS_SECONDS: (HISTOGRAM, "Provider send_sms latency in seconds", ("backend",)),
+    STORAGE_SECONDS: (HISTOGRAM, "Time spent in the verification store in seconds", ("operation",)),
+    VERIFY_TOTAL: (COUNTER, "Verify attempts by outcome", ("status",)),
+    OUTBOX_DEPTH: (GAUGE, "Messages waiting in the SMS outbox", ()),
+    LIVE_VERIFICATIONS: (GAUGE, "Unexpired SMS verifications", ()),
+}
+
+STATUS_NAMES = {
+    constants.SECURITY_CODE_VALID: "SECURITY_CODE_VALID",
+    constants.SECURITY_CODE_INVALID: "SECURITY_CODE_INVALID",
+    constants.SECURITY_CODE_EXPIRED: "SECURITY_CODE_EXPIRED",
+    constants.SECURITY_CODE_VERIFIED: "SECURITY_CODE_VERIFIED",
+    constants.SESSION_TOKEN_INVALID: "SESSION_TOKEN_INVALID",
+    constants.SECURITY_CODE_TOO_MANY_ATTEMPTS: "SECURITY_CODE_TOO_MANY_ATTEMPTS",
+}
+
+_NOOP = nullcontext()
+_UNSET = object()
+_exporter = _UNSET
+_exporter_lock = threading.Lock()
+
+
+class BaseMetricsExporter(object):
+    """
+    Base class for metrics exporters.
+
+    ``labels`` is a dict of label name to value, with the label names listed
+    for the metric in ``METRICS``.
+    """
+
+    def __init__(self, **options):
+        pass
+
+    def observe(self, name, value, labels):
+        """Record ``value`` in the histogram ``name``."""
+        raise NotImplementedError()
+
+    def increment(self, name, labels, amount=1):
+        """Add ``amount`` to the counter ``name``."""
+        raise NotImplementedError()
+
+    def register_gauge(self, name, callback):
+        """Report the gauge ``name`` as the return value of ``callback()`` whenever it is read."""
+        raise NotImplementedError()
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+class InMemoryExporter(BaseMetricsExporter):
+    """
+    Keep metrics in process memory, e.g. to assert against in tests.
+
+    ``observations(name, **labels)``, ``count(name, **labels)`` and
+    ``gauge(name)`` read them back and ``reset()`` clears them.
+    """
+
+    def __init__(self, **options):
+        super().__init__(**options)
+        self._lock = threading.Lock()
+        self._histograms = defaultdict(list)
+        self._counters = defaultdict(int)
+        self._gauges = {}
+
+    def observe(self, name, value, labels):
+        with self._lock:
+            self._histograms[name, _label_key(labels)].append(value)
+
+    def increment(self, name, labels, amount=1):
+        with self._lock:
+            self._counters[name, _label_key(labels)] += amount
+
+    def register_gauge(self, name, callback):
+        self._gauges[name] = callback
+
+    def observations(self, name, **labels):
+        with self._lock:
+            return list(self._histograms.get((name, _label_key(labels)), []))
+
+    def count(self, name, **labels):
+        with self._lock:
+            return self._counters.get((name, _label_key(labels)), 0)
+
+    def gauge(self, name):
+        return self._gauges[name]()
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+
+class PrometheusExporter(BaseMetricsExporter):
+    """
+    Publish metrics with ``prometheus_client`` (``pip install django-phone-verify[metrics]``).
+
+    Expose them with ``prometheus_client``'s HTTP server or WSGI app, or
+    with a library such as ``django-prometheus`` sharing the same registry.
+
+    Options:
+        - ``REGISTRY``: import path of the ``CollectorRegistry`` to register
+          with (default: ``prometheus_client.REGISTRY``)
+        - ``BUCKETS``: histogram buckets in seconds (default: the
+          ``prometheus_client`` defaults)
+    """
+
+    # One set of collectors per registry: a registry rejects duplicate names,
+    # and the exporter is rebuilt whenever the settings change.
+    _collectors = {}
+    _collectors_lock = threading.Lock()
+
+    def __init__(self, **options):
+        super().__init__(**options)
+        import prometheus_client
+
+        options = {key.lower(): value for key, value in options.items()}
+        registry = options.get("registry")
+        self.registry = import_string(registry) if registry else prometheus_client.REGISTRY
+        buckets = options.get("buckets")
+        with self._collectors_lock:
+            collectors = self._collectors.get(id(self.registry))
+            if collectors is None:
+                collectors = self._build_collectors(prometheus_client, buckets)
+                self._collectors[id(self.registry)] = collectors
+        self.collectors = collectors
+
+    def _build_collectors(self, prometheus_client, buckets):
+        collectors = {}
+        for name, (kind, description, label_names) in METRICS.items():
+            kwargs = {"registry": self.registry}
+            if kind == HISTOGRAM:
+                if buckets:
+                    kwargs["buckets"] = buckets
+                collectors[name] = prometheus_client.Histogram(name, description, label_names, **kwargs)
+            elif kind == COUNTER:
+                # prometheus_client appends the `_total` suffix itself.
+                collectors[name] = prometheus_client.Counter(
+                    name[:-len("_total")], description, label_names, **kwargs
+                )
+            else:
+                collectors[name] = prometheus_client.Gauge(name, description, label_names, **kwargs)
+        return collectors
+
+    def observe(self, name, value, labels):
+        self.collectors[name].labels(**labels).observe(value)
+
+    def increment(self, name, labels, amount=1):
+        self.collectors[name].labels(**labels).inc(amount)
+
+    def register_gauge(self, name, callback):
+        self.collectors[name].set_function(callback)
+
+
+def _outbox_depth():
+    from .models import SMSOutbox
+
+    return SMSOutbox.objects.filter(status=SMSOutbox.STATUS_PENDING).count()
+
+
+def _live_verifications():
+    from .models import SMSVerification
+
+    return SMSVerification.objects.live().count()
+
+
+def get_metrics_exporter():
+    """Return the process-wide metrics exporter, or None when metrics are disabled."""
+    global _exporter
+
+    exporter = _exporter
+    if exporter is not _UNSET:
+        return exporter
+    with _exporter_lock:
+        if _exporter is _UNSET:
+            phone_settings = get_settings()
+            exporter = None
+            if phone_settings.metrics_enabled:
+                exporter_cls = import_string(phone_settings.metrics_exporter)
+                exporter = exporter_cls(**phone_settings.metrics_exporter_options)
+                exporter.register_gauge(OUTBOX_DEPTH, _outbox_depth)
+                exporter.register_gauge(LIVE_VERIFICATIONS, _live_verifications)
+            _exporter = exporter
+        return _exporter
+
+
+def clear_metrics_exporter():
+    """Drop the cached exporter so the next call rebuilds it from settings."""
+    global _exporter
+
+    with _exporter_lock:
+        _exporter = _UNSET
+
+
+@receiver(setting_changed)
+def _clear_metrics_exporter_on_setting_changed(setting, **kwargs):
+    if setting == "PHONE_VERIFICATION":
+        clear_metrics_exporter()
+
+
+class _Timer(object):
+    __slots__ = ("exporter", "name", "labels", "started")
+
+    def __init__(self, exporter, name, labels):
+        self.exporter = exporter
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.exporter.observe(self.name, time.perf_counter() - self.started, self.labels)
+        return False
+
+
+def timed(name, **labels):
+    """Context manager recording its duration in the histogram ``name``."""
+    exporter = get_metrics_exporter()
+    if exporter is None:
+        return _NOOP
+    return _Timer(exporter, name, labels)
+
+
+def time_send_sms(backend):
+    """Context manager recording a provider send of ``backend`` in ``phone_verify_send_sms_seconds``."""
+    exporter = get_metrics_exporter()
+    if exporter is None:
+        return _NOOP
+    return _Timer(exporter, SEND_SMS_SECONDS, {"backend": type(backend).__name__})
+
+
+def record_verify_outcome(status):
+    """Count one verify attempt with ``status`` in ``phone_verify_verify_total``."""
+    exporter = get_metrics_exporter()
+    if exporter is not None:
+        exporter.increment(VERIFY_TOTAL, {"status": STATUS_NAMES.get(status, str(status))})
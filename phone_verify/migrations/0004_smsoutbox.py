@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:08
+
+import uuid
+
+import phonenumber_field.modelfields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('phone_verify', '0003_smsverification_failed_attempts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SMSOutbox',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('modified_at', models.DateTimeField(auto_now=True)),
+                (
+                    'phone_number',
+                    phonenumber_field.modelfields.PhoneNumberField(
+                        max_length=128, region=None, verbose_name='Phone Number'
+                    ),
+                ),
+                ('message', models.TextField(verbose_name='Message')),
+                (
+                    'status',
+                    models.CharField(
+                        choices=[('pending', 'Pending'), ('sent', 'Sent'), ('failed', 'Failed')],
+                        default='pending',
+                        max_length=16,
+                        verbose_name='Status',
+                    ),
+                ),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='Attempts')),
+                ('last_error', models.TextField(blank=True, default='', verbose_name='Last Error')),
+                ('sent_at', models.DateTimeField(blank=True, null=True, verbose_name='Sent At')),
+            ],
+            options={
+                'verbose_name': 'SMS Outbox Message',
+                'verbose_name_plural': 'SMS Outbox Messages',
+                'db_table': 'sms_outbox',
+                'ordering': ('created_at',),
+                'indexes': [models.Index(fields=['status', 'created_at'], name='sms_outbox_status_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:19
+
+import phonenumber_field.modelfields
+from django.db import migrations
+from django.db.models import Count
+
+
+def remove_duplicate_phone_numbers(apps, schema_editor):
+    """Keep only the newest verification per phone number before adding the unique constraint."""
+    SMSVerification = apps.get_model('phone_verify', 'SMSVerification')
+    verifications = SMSVerification.objects.using(schema_editor.connection.alias)
+
+    duplicated_phone_numbers = list(
+        verifications.order_by()
+        .values('phone_number')
+        .annotate(count=Count('id'))
+        .filter(count__gt=1)
+        .values_list('phone_number', flat=True)
+    )
+    for phone_number in duplicated_phone_numbers:
+        rows = verifications.filter(phone_number=phone_number)
+        newest_id = rows.order_by('-created_at').values_list('id', flat=True).first()
+        rows.exclude(id=newest_id).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('phone_verify', '0004_smsoutbox'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_phone_numbers, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='smsverification',
+            unique_together=set(),
+        ),
+        migrations.AlterField(
+            model_name='smsverification',
+            name='phone_number',
+            field=phonenumber_field.modelfields.PhoneNumberField(
+                max_length=128, region=None, unique=True, verbose_name='Phone Number'
+            ),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:37
+
+import uuid
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('phone_verify', '0005_smsverification_unique_phone_number'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='smsoutbox',
+            name='claim_token',
+            field=models.UUIDField(blank=True, editable=False, null=True, verbose_name='Claim Token'),
+        ),
+        migrations.AddField(
+            model_name='smsoutbox',
+            name='claimed_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Claimed At'),
+        ),
+        migrations.CreateModel(
+            name='SMSDeliveryAttempt',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('modified_at', models.DateTimeField(auto_now=True)),
+                ('backend', models.CharField(max_length=255, verbose_name='Backend')),
+                ('success', models.BooleanField(default=False, verbose_name='Success')),
+                ('provider_message_id', models.CharField(
+                    blank=True, default='', max_length=255, verbose_name='Provider Message ID'
+                )),
+                ('error', models.TextField(blank=True, default='', verbose_name='Error')),
+                ('outbox', models.ForeignKey(
+                    on_delete=django.db.models.deletion.CASCADE,
+                    related_name='delivery_attempts',
+                    to='phone_verify.smsoutbox',
+                    verbose_name='Outbox Message',
+                )),
+            ],
+            options={
+                'verbose_name': 'SMS Delivery Attempt',
+                'verbose_name_plural': 'SMS Delivery Attempts',
+                'db_table': 'sms_delivery_attempt',
+                'ordering': ('created_at',),
+            },
+        ),
+    ]
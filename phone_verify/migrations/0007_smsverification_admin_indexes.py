@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('phone_verify', '0006_smsdeliveryattempt'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='smsverification',
+            index=models.Index(fields=['created_at'], name='sms_verif_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='smsverification',
+            index=models.Index(fields=['is_verified', 'created_at'], name='sms_verif_verified_created_idx'),
+        ),
+    ]
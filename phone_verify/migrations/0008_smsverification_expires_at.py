@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('phone_verify', '0007_smsverification_admin_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='smsverification',
+            name='expires_at',
+            field=models.DateTimeField(editable=False, null=True, verbose_name='Expires At'),
+        ),
+        migrations.AddIndex(
+            model_name='smsverification',
+            index=models.Index(fields=['expires_at'], name='sms_verif_expires_idx'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+from datetime import timedelta
+
+from django.db import migrations
+from django.db.models import F
+
+from phone_verify.constants import get_security_code_expiration
+
+BATCH_SIZE = 10000
+
+
+def backfill_expires_at(apps, schema_editor):
+    """Set ``expires_at`` from ``created_at`` for existing rows, one committed batch at a time."""
+    SMSVerification = apps.get_model('phone_verify', 'SMSVerification')
+    verifications = SMSVerification.objects.using(schema_editor.connection.alias)
+    expiration = timedelta(seconds=get_security_code_expiration())
+
+    while True:
+        ids = list(
+            verifications.filter(expires_at__isnull=True).order_by().values_list('id', flat=True)[:BATCH_SIZE]
+        )
+        if not ids:
+            break
+        verifications.filter(id__in=ids).update(expires_at=F('created_at') + expiration)
+
+
+class Migration(migrations.Migration):
+
+    # Commit each batch on its own instead of holding one long transaction.
+    atomic = False
+
+    dependencies = [
+        ('phone_verify', '0008_smsverification_expires_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_expires_at, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('phone_verify', '0009_backfill_smsverification_expires_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='smsverification',
+            name='security_code_digest',
+            field=models.BinaryField(max_length=32, null=True, verbose_name='Security Code Digest'),
+        ),
+    ]
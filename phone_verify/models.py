@@ -39,31 +39,140 @@ class TimeStampedUUIDModel(UUIDModel):
         abstract = True
 
 
+def security_code_expires_at(issued_at=None):
+    """Expiry time of a security code issued at ``issued_at`` (default: now)."""
+    if issued_at is None:
+        issued_at = timezone.now()
+    return issued_at + timedelta(seconds=get_security_code_expiration())
+
+
+class SMSVerificationQuerySet(models.QuerySet):
+    def live(self, now=None):
+        """Verifications whose security code has not expired at ``now``."""
+        return self.filter(expires_at__gte=now or timezone.now())
+
+    def expired(self, now=None):
+        """Verifications whose security code has expired at ``now``."""
+        return self.filter(expires_at__lt=now or timezone.now())
+
+
+SMSVerificationManager = models.Manager.from_queryset(SMSVerificationQuerySet)
+
+
 class SMSVerification(TimeStampedUUIDModel):
     security_code = models.CharField(_("Security Code"), max_length=120)
-    phone_number = PhoneNumberField(_("Phone Number"))
+    # HMAC-SHA256 of the code, stored instead of it with the `HASH_SECURITY_CODES` storage option.
+    security_code_digest = models.BinaryField(_("Security Code Digest"), max_length=32, null=True)
+    # Unique so a new code replaces the previous one with a single upsert.
+    phone_number = PhoneNumberField(_("Phone Number"), unique=True)
     session_token = models.CharField(_("Device Session Token"), max_length=500)
     is_verified = models.BooleanField(_("Security Code Verified"), default=False)
     failed_attempts = models.PositiveIntegerField(_("Failed Attempts"), default=0)
+    # Set when the code is issued. Nullable only for rows issued before the
+    # column existed, until migration 0009 backfills them.
+    expires_at = models.DateTimeField(_("Expires At"), null=True, editable=False)
+
+    objects = SMSVerificationManager()
 
     class Meta:
         db_table = "sms_verification"
         verbose_name = _("SMS Verification")
         verbose_name_plural = _("SMS Verifications")
         ordering = ("-modified_at",)
-        unique_together = ("security_code", "phone_number", "session_token")
+        # The verify lookup (`phone_number` and `session_token`) uses the
+        # unique index on `phone_number`.
+        indexes = [
+            # Match the admin changelist's filters and the cleanup command;
+            # its `phone_number` ordering uses the unique index.
+            models.Index(fields=["created_at"], name="sms_verif_created_idx"),
+            models.Index(fields=["is_verified", "created_at"], name="sms_verif_verified_created_idx"),
+            # Serves `live()` and `expired()`.
+            models.Index(fields=["expires_at"], name="sms_verif_expires_idx"),
+        ]
 
     def __str__(self):
         return "{}: {}".format(str(self.phone_number), self.security_code)
 
+    def save(self, *args, **kwargs):
+        # `created_at` is only set (by auto_now_add) during the insert.
+        if self._state.adding and self.expires_at is None:
+            self.expires_at = security_code_expires_at()
+        super().save(*args, **kwargs)
+
+    def get_expires_at(self):
+        """
+        Return when the security code expires.
+
+        Falls back to ``created_at`` plus SECURITY_CODE_EXPIRATION_SECONDS for
+        rows without ``expires_at``.
+        """
+        if self.expires_at is not None:
+            return self.expires_at
+        return security_code_expires_at(self.created_at)
+
     @property
     def is_expired(self):
-        """Check if the security code has expired.
+        """Check if the security code has expired."""
+        return timezone.now() > self.get_expires_at()
 
-        Uses SECURITY_CODE_EXPIRATION_SECONDS (preferred) or
-        SECURITY_CODE_EXPIRATION_TIME (deprecated) setting.
-        Issues a deprecation warning if the old setting name is used.
-        """
-        expiration_time = get_security_code_expiration()
-        expiration_datetime = self.created_at + timedelta(seconds=expiration_time)
-        return timezone.now() > expiration_datetime
+
+class SMSOutbox(TimeStampedUUIDModel):
+    """
+    A rendered verification message waiting to be sent by ``process_sms_outbox``.
+
+    A worker claims a message by setting ``claim_token`` and ``claimed_at``;
+    other workers skip it until the claim is released or its lease runs out.
+    """
+
+    STATUS_PENDING = "pending"
+    STATUS_SENT = "sent"
+    STATUS_FAILED = "failed"
+    STATUS_CHOICES = (
+        (STATUS_PENDING, _("Pending")),
+        (STATUS_SENT, _("Sent")),
+        (STATUS_FAILED, _("Failed")),
+    )
+
+    phone_number = PhoneNumberField(_("Phone Number"))
+    message = models.TextField(_("Message"))
+    status = models.CharField(
+        _("Status"), max_length=16, choices=STATUS_CHOICES, default=STATUS_PENDING
+    )
+    attempts = models.PositiveIntegerField(_("Attempts"), default=0)
+    last_error = models.TextField(_("Last Error"), blank=True, default="")
+    sent_at = models.DateTimeField(_("Sent At"), null=True, blank=True)
+    claim_token = models.UUIDField(_("Claim Token"), null=True, blank=True, editable=False)
+    claimed_at = models.DateTimeField(_("Claimed At"), null=True, blank=True, editable=False)
+
+    class Meta:
+        db_table = "sms_outbox"
+        verbose_name = _("SMS Outbox Message")
+        verbose_name_plural = _("SMS Outbox Messages")
+        ordering = ("created_at",)
+        indexes = [
+            models.Index(fields=["status", "created_at"], name="sms_outbox_status_idx"),
+        ]
+
+    def __str__(self):
+        return "{}: {}".format(str(self.phone_number), self.status)
+
+
+class SMSDeliveryAttempt(TimeStampedUUIDModel):
+    """One attempt by ``process_sms_outbox`` to hand an ``SMSOutbox`` message to a provider."""
+
+    outbox = models.ForeignKey(
+        SMSOutbox, on_delete=models.CASCADE, related_name="delivery_attempts", verbose_name=_("Outbox Message")
+    )
+    backend = models.CharField(_("Backend"), max_length=255)
+    success = models.BooleanField(_("Success"), default=False)
+    provider_message_id = models.CharField(_("Provider Message ID"), max_length=255, blank=True, default="")
+    error = models.TextField(_("Error"), blank=True, default="")
+
+    class Meta:
+        db_table = "sms_delivery_attempt"
+        verbose_name = _("SMS Delivery Attempt")
+        verbose_name_plural = _("SMS Delivery Attempts")
+        ordering = ("created_at",)
+
+    def __str__(self):
+        return "{}: {}".format(self.backend, "success" if self.success else "failure")
@@ -0,0 +1,292 @@
+# -*- coding: utf-8 -*-
+"""
+Daily partitions of the ``sms_verification`` table.
+
+With ``PartitionedModelVerificationStore`` the table is partitioned by
+``created_at``, one partition per UTC day, so retention drops whole expired
+partitions instead of deleting rows one by one.
+
+On PostgreSQL the table is converted once to declarative range partitioning
+(``create_phone_verification_partitions --convert``) and future partitions
+are created ahead of time by the same command. A ``DEFAULT`` partition
+catches rows for days without a partition, so a missed run of the command
+does not make registers fail; the next run moves those rows into their day's
+partition. Other databases have no
+declarative partitioning: ``FallbackPartitionManager`` treats each day of
+``created_at`` as a logical partition and "drops" it with one range
+``DELETE``, so the same commands work against SQLite in development and
+tests.
+"""
+
+import re
+from datetime import datetime, time, timedelta
+from datetime import timezone as dt_timezone
+
+# Third Party Stuff
+from django.db import connections, models, router, transaction
+
+from .models import SMSVerification
+
+DEFAULT_PRECREATE_DAYS = 7
+
+# Replaces the unique index on `phone_number` for the verify lookup and the
+# `phone_number IN (...)` delete once the table is partitioned.
+LOOKUP_INDEX = models.Index(fields=["phone_number", "session_token"], name="sms_verif_part_lookup_idx")
+
+_PARTITION_SUFFIX = re.compile(r"_p(\d{8})$")
+
+
+def _day_start(day):
+    return datetime.combine(day, time.min, tzinfo=dt_timezone.utc)
+
+
+def today():
+    """Return the current UTC day, the day new rows are written to."""
+    return datetime.now(dt_timezone.utc).date()
+
+
+class BasePartitionManager(object):
+    """
+    Create, list and drop the daily partitions of ``sms_verification``.
+
+    A partition is named after its UTC day, e.g. ``sms_verification_p20250131``,
+    and holds rows with ``day <= created_at < day + 1``.
+    """
+
+    def __init__(self, using):
+        self.using = using
+        self.connection = connections[using]
+        self.table = SMSVerification._meta.db_table
+
+    def partition_name(self, day):
+        return "{}_p{:%Y%m%d}".format(self.table, day)
+
+    def is_partitioned(self):
+        """Return True if the table uses this manager's partition layout."""
+        raise NotImplementedError()
+
+    def partition_days(self):
+        """Return the sorted days that currently have a partition."""
+        raise NotImplementedError()
+
+    def create_partitions(self, start, days):
+        """
+        Create the partitions for ``days`` days from ``start`` that do not exist yet.
+
+        :return: names of the partitions created
+        """
+        raise NotImplementedError()
+
+    def _drop_partition(self, day):
+        raise NotImplementedError()
+
+    def partitions_before(self, cutoff):
+        """Return the days whose whole partition is older than the ``cutoff`` datetime."""
+        return [day for day in self.partition_days() if _day_start(day + timedelta(days=1)) <= cutoff]
+
+    def drop_partitions_before(self, cutoff):
+        """
+        Drop every partition whose rows are all older than ``cutoff``.
+
+        The partition containing ``cutoff`` is kept, so a row may outlive the
+        retention period by up to one day.
+
+        :return: names of the partitions dropped
+        """
+        dropped = []
+        for day in self.partitions_before(cutoff):
+            with transaction.atomic(using=self.using):
+                self._drop_partition(day)
+            dropped.append(self.partition_name(day))
+        return dropped
+
+
+class PostgresPartitionManager(BasePartitionManager):
+    """Native range partitions on PostgreSQL 11+."""
+
+    def _execute(self, sql, params=None):
+        with self.connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            if cursor.description is not None:
+                return cursor.fetchall()
+        return []
+
+    def is_partitioned(self):
+        return bool(self._execute(
+            "SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)", [self.table]
+        ))
+
+    @property
+    def default_partition(self):
+        return "{}_default".format(self.table)
+
+    def _partition_names(self):
+        rows = self._execute(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE pg_inherits.inhparent = to_regclass(%s)",
+            [self.table],
+        )
+        return [name for (name,) in rows]
+
+    def partition_days(self):
+        days = []
+        for name in self._partition_names():
+            match = _PARTITION_SUFFIX.search(name)
+            if name.startswith(self.table) and match:
+                days.append(datetime.strptime(match.group(1), "%Y%m%d").date())
+        return sorted(days)
+
+    def _bounds(self, day):
+        # Bounds come from `date` objects, so they are inlined: DDL cannot
+        # take bound parameters with every driver.
+        return "FROM ('{}') TO ('{}')".format(
+            _day_start(day).isoformat(), _day_start(day + timedelta(days=1)).isoformat()
+        )
+
+    def _create_partition_sql(self, day):
+        quote_name = self.connection.ops.quote_name
+        return "CREATE TABLE IF NOT EXISTS {} PARTITION OF {} FOR VALUES {}".format(
+            quote_name(self.partition_name(day)), quote_name(self.table), self._bounds(day)
+        )
+
+    def _default_partition_has_rows(self, day):
+        return bool(self._execute(
+            "SELECT 1 FROM {} WHERE created_at >= %s AND created_at < %s LIMIT 1".format(
+                self.connection.ops.quote_name(self.default_partition)
+            ),
+            [_day_start(day), _day_start(day + timedelta(days=1))],
+        ))
+
+    def _move_from_default_partition(self, day):
+        # PostgreSQL refuses to create a partition whose range has rows in the
+        # default partition, so the rows are moved into a new table that is
+        # then attached.
+        quote_name = self.connection.ops.quote_name
+        table = quote_name(self.table)
+        partition = quote_name(self.partition_name(day))
+        with transaction.atomic(using=self.using):
+            self._execute("CREATE TABLE {} (LIKE {} INCLUDING DEFAULTS)".format(partition, table))
+            self._execute(
+                "WITH moved AS (DELETE FROM {} WHERE created_at >= %s AND created_at < %s RETURNING *) "
+                "INSERT INTO {} SELECT * FROM moved".format(quote_name(self.default_partition), partition),
+                [_day_start(day), _day_start(day + timedelta(days=1))],
+            )
+            self._execute("ALTER TABLE {} ATTACH PARTITION {} FOR VALUES {}".format(
+                table, partition, self._bounds(day)
+            ))
+
+    def create_partitions(self, start, days):
+        """
+        Also creates the default partition if it is missing, and moves rows
+        that landed in it into the partition of their day.
+        """
+        quote_name = self.connection.ops.quote_name
+        self._execute("CREATE TABLE IF NOT EXISTS {} PARTITION OF {} DEFAULT".format(
+            quote_name(self.default_partition), quote_name(self.table)
+        ))
+        existing = set(self.partition_days())
+        created = []
+        for offset in range(days):
+            day = start + timedelta(days=offset)
+            if day in existing:
+                continue
+            if self._default_partition_has_rows(day):
+                self._move_from_default_partition(day)
+            else:
+                self._execute(self._create_partition_sql(day))
+            created.append(self.partition_name(day))
+        return created
+
+    def drop_partitions_before(self, cutoff):
+        """Also deletes rows older than ``cutoff`` from the default partition."""
+        if self.default_partition in self._partition_names():
+            self._execute(
+                "DELETE FROM {} WHERE created_at < %s".format(self.connection.ops.quote_name(self.default_partition)),
+                [cutoff],
+            )
+        return super().drop_partitions_before(cutoff)
+
+    def _drop_partition(self, day):
+        quote_name = self.connection.ops.quote_name
+        partition = quote_name(self.partition_name(day))
+        # Detaching first keeps the ACCESS EXCLUSIVE lock on the parent short.
+        self._execute("ALTER TABLE {} DETACH PARTITION {}".format(quote_name(self.table), partition))
+        self._execute("DROP TABLE {}".format(partition))
+
+    def convert(self, precreate_days=DEFAULT_PRECREATE_DAYS):
+        """
+        Replace ``sms_verification`` with a table partitioned by ``created_at``.
+
+        Existing rows are copied into daily partitions and partitions are
+        created for the next ``precreate_days`` days, along with the default
+        partition. The table is locked while rows are copied, so run this in
+        a maintenance window.
+
+        PostgreSQL requires every unique constraint to include the partition
+        key, so the partitioned table has a ``(id, created_at)`` primary key
+        and no unique constraint on ``phone_number``.
+        ``PartitionedModelVerificationStore`` serializes writes per number
+        with advisory locks instead, and a non-unique ``(phone_number,
+        session_token)`` index (``LOOKUP_INDEX``) serves the verify lookup in
+        every partition.
+        """
+        quote_name = self.connection.ops.quote_name
+        table = quote_name(self.table)
+        legacy = quote_name("{}_unpartitioned".format(self.table))
+        with transaction.atomic(using=self.using):
+            self._execute("ALTER TABLE {} RENAME TO {}".format(table, legacy))
+            self._execute(
+                "CREATE TABLE {} (LIKE {} INCLUDING DEFAULTS) PARTITION BY RANGE (created_at)".format(table, legacy)
+            )
+            first_day, last_day = self._execute(
+                "SELECT MIN(created_at AT TIME ZONE 'UTC')::date, MAX(created_at AT TIME ZONE 'UTC')::date "
+                "FROM {}".format(legacy)
+            )[0]
+            start = min(first_day or today(), today())
+            end = max(last_day or today(), today() + timedelta(days=precreate_days - 1))
+            self.create_partitions(start, (end - start).days + 1)
+            self._execute("INSERT INTO {} SELECT * FROM {}".format(table, legacy))
+            # The old table's constraint and index names are free once it is dropped.
+            self._execute("DROP TABLE {}".format(legacy))
+            self._execute("ALTER TABLE {} ADD PRIMARY KEY (id, created_at)".format(table))
+            with self.connection.schema_editor() as schema_editor:
+                for index in [LOOKUP_INDEX, *SMSVerification._meta.indexes]:
+                    schema_editor.add_index(SMSVerification, index)
+
+
+class FallbackPartitionManager(BasePartitionManager):
+    """
+    Logical daily partitions for databases without declarative partitioning.
+
+    Every day with rows counts as a partition; creating one is a no-op and
+    dropping one deletes that day's rows with a single range ``DELETE``.
+    """
+
+    def is_partitioned(self):
+        return True
+
+    def partition_days(self):
+        return [
+            moment.date()
+            for moment in SMSVerification.objects.using(self.using).datetimes(
+                "created_at", "day", tzinfo=dt_timezone.utc
+            )
+        ]
+
+    def create_partitions(self, start, days):
+        return []
+
+    def _drop_partition(self, day):
+        SMSVerification.objects.using(self.using).filter(
+            created_at__gte=_day_start(day),
+            created_at__lt=_day_start(day + timedelta(days=1)),
+        ).delete()
+
+
+def get_partition_manager(using=None):
+    """Return the partition manager for the database ``SMSVerification`` is written to."""
+    using = using or router.db_for_write(SMSVerification)
+    if connections[using].vendor == "postgresql":
+        return PostgresPartitionManager(using)
+    return FallbackPartitionManager(using)
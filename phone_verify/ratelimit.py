@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+"""
+Limits on how often verification codes are sent.
+
+``PHONE_VERIFICATION["RATE_LIMITS"]`` caps sends per phone number, per client
+IP address and per country calling code. Each limit is a sliding window
+approximated from two fixed-window counters in the Django cache
+(``RATE_LIMIT_CACHE``): the current window's count plus the previous
+window's count weighted by how much of it still overlaps the sliding window.
+Every check is a few atomic cache operations and never touches the database.
+"""
+
+import math
+import time
+
+# Third Party Stuff
+from django.core.cache import caches
+from phonenumber_field.phonenumber import PhoneNumber
+
+from .constants import (
+    RATE_LIMIT_COUNTRY_CODE,
+    RATE_LIMIT_IP,
+    RATE_LIMIT_PHONE_NUMBER,
+    get_settings,
+)
+
+RATE_LIMIT_KEY_PREFIX = "phone_verify:ratelimit"
+
+
+class RateLimitExceeded(Exception):
+    """
+    Raised when sending a code would exceed a configured rate limit.
+
+    :ivar scope: the limit that was hit (``"PHONE_NUMBER"``, ``"IP"`` or ``"COUNTRY_CODE"``)
+    :ivar retry_after: whole seconds until a send would be allowed again
+    """
+
+    def __init__(self, scope, retry_after):
+        self.scope = scope
+        self.retry_after = retry_after
+        super().__init__(f"{scope} rate limit exceeded, retry after {retry_after} second(s)")
+
+
+class SlidingWindowCounter(object):
+    """Sliding-window hit counter over a Django cache."""
+
+    def __init__(self, cache, key_prefix=RATE_LIMIT_KEY_PREFIX, clock=time.time):
+        self.cache = cache
+        self.key_prefix = key_prefix
+        self._clock = clock
+
+    def _key(self, name, window, index):
+        return "{}:{}:{}:{}".format(self.key_prefix, name, window, index)
+
+    def _incr(self, key, timeout):
+        self.cache.add(key, 0, timeout)
+        try:
+            return self.cache.incr(key)
+        except ValueError:
+            # The key expired between `add` and `incr`.
+            self.cache.add(key, 1, timeout)
+            return 1
+
+    def hit(self, name, limit, window):
+        """
+        Count one hit for ``name`` unless that would exceed ``limit`` per ``window`` seconds.
+
+        The hit is counted before the limit is checked, so concurrent callers
+        cannot overshoot; a rejected hit is taken back.
+
+        :return: ``(key, retry_after)``: the cache key the hit was counted
+            under (pass it to ``release``), and None if the hit is allowed or
+            the seconds to wait otherwise.
+        """
+        index, elapsed = divmod(self._clock(), window)
+        key = self._key(name, window, int(index))
+        # Each counter is still read as the previous window during the next one.
+        current = self._incr(key, 2 * window)
+        previous = self.cache.get(self._key(name, window, int(index) - 1), 0)
+        if previous * (1 - elapsed / window) + current <= limit:
+            return key, None
+
+        self.cache.decr(key)
+        return key, _retry_after(limit, window, elapsed, previous, current - 1)
+
+    def release(self, key):
+        """Take back a hit counted by ``hit``."""
+        try:
+            self.cache.decr(key)
+        except ValueError:
+            pass
+
+
+def _retry_after(limit, window, elapsed, previous, current):
+    """Seconds until one more hit fits, given ``current`` hits in this window."""
+    if current < limit:
+        # Wait until enough of the previous window has slid out.
+        wait = window * (1 - (limit - 1 - current) / previous) - elapsed
+    else:
+        # Wait for the next window, in which this one is the previous window.
+        wait = window - elapsed + window * (1 - (limit - 1) / current)
+    return max(1, math.ceil(wait))
+
+
+def _country_code(phone_number):
+    try:
+        return PhoneNumber.from_string(str(phone_number)).country_code
+    except Exception:
+        return None
+
+
+def _limits_for(rate_limits, phone_number, ip_address):
+    """Yield ``(scope, counter name, limit, window)`` for each limit that applies."""
+    if RATE_LIMIT_PHONE_NUMBER in rate_limits:
+        limit, window = rate_limits[RATE_LIMIT_PHONE_NUMBER]
+        yield RATE_LIMIT_PHONE_NUMBER, "phone:{}".format(phone_number), limit, window
+    if RATE_LIMIT_IP in rate_limits and ip_address:
+        limit, window = rate_limits[RATE_LIMIT_IP]
+        yield RATE_LIMIT_IP, "ip:{}".format(ip_address), limit, window
+    if RATE_LIMIT_COUNTRY_CODE in rate_limits:
+        country_code = _country_code(phone_number)
+        country_rates = rate_limits[RATE_LIMIT_COUNTRY_CODE]
+        rate = country_rates.get(str(country_code)) or country_rates.get("*")
+        if country_code is not None and rate is not None:
+            limit, window = rate
+            yield RATE_LIMIT_COUNTRY_CODE, "country:{}".format(country_code), limit, window
+
+
+def check_send_rate_limit(phone_number, ip_address=None):
+    """
+    Count one send to ``phone_number`` from ``ip_address`` against ``RATE_LIMITS``.
+
+    Does nothing when no limits are configured. If any limit would be
+    exceeded, the hits already counted for this call are taken back, so a
+    rejected request does not use up the other limits.
+
+    :raises RateLimitExceeded: if a limit would be exceeded
+    """
+    phone_settings = get_settings()
+    if not phone_settings.rate_limits:
+        return
+
+    counter = SlidingWindowCounter(caches[phone_settings.rate_limit_cache])
+    counted = []
+    for scope, name, limit, window in _limits_for(phone_settings.rate_limits, phone_number, ip_address):
+        key, retry_after = counter.hit(name, limit, window)
+        if retry_after is not None:
+            for counted_key in counted:
+                counter.release(counted_key)
+            raise RateLimitExceeded(scope, retry_after)
+        counted.append(key)
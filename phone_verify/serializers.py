@@ -21,11 +21,35 @@ class PhoneSerializer(serializers.Serializer):
     phone_number = PhoneNumberField()
 
 
-class SMSVerificationSerializer(serializers.Serializer):
+def get_verification_error(backend, verification, status):
+    """
+    Return the user-facing error for a ``validate_security_code`` result, or
+    None when the security code is valid.
+    """
+    if status == backend.SECURITY_CODE_EXPIRED:
+        return _("Security code has expired")
+    elif verification is None:
+        return _("Security code is not valid")
+    elif status == backend.SESSION_TOKEN_INVALID:
+        return _("Session Token mis-match")
+    elif status == backend.SECURITY_CODE_INVALID:
+        return _("Security code is not valid")
+    elif status == backend.SECURITY_CODE_VERIFIED:
+        return _("Security code is already verified")
+    elif status == backend.SECURITY_CODE_TOO_MANY_ATTEMPTS:
+        return _("Too many failed verification attempts. Please request a new code.")
+    return None
+
+
+class BaseSMSVerificationSerializer(serializers.Serializer):
+    """Field validation only; the security code itself is not checked."""
+
     phone_number = PhoneNumberField(required=True)
     session_token = serializers.CharField(required=True)
     security_code = serializers.CharField(required=True)
 
+
+class SMSVerificationSerializer(BaseSMSVerificationSerializer):
     def validate(self, attrs):
         attrs = super().validate(attrs)
         phone_number = attrs.get("phone_number", None)
@@ -40,17 +64,8 @@ class SMSVerificationSerializer(serializers.Serializer):
             session_token=session_token,
         )
 
-        if verification is None:
-            raise serializers.ValidationError(_("Security code is not valid"))
-        elif token_validatation == backend.SESSION_TOKEN_INVALID:
-            raise serializers.ValidationError(_("Session Token mis-match"))
-        elif token_validatation == backend.SECURITY_CODE_INVALID:
-            raise serializers.ValidationError(_("Security code is not valid"))
-        elif token_validatation == backend.SECURITY_CODE_EXPIRED:
-            raise serializers.ValidationError(_("Security code has expired"))
-        elif token_validatation == backend.SECURITY_CODE_VERIFIED:
-            raise serializers.ValidationError(_("Security code is already verified"))
-        elif token_validatation == backend.SECURITY_CODE_TOO_MANY_ATTEMPTS:
-            raise serializers.ValidationError(_("Too many failed verification attempts. Please request a new code."))
+        error = get_verification_error(backend, verification, token_validatation)
+        if error is not None:
+            raise serializers.ValidationError(error)
 
         return attrs
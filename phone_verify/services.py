@@ -2,15 +2,18 @@
 from __future__ import absolute_import
 
 import logging
+from contextlib import nullcontext
 
 # Third Party Stuff
-from django.conf import settings
-from django.core.exceptions import ImproperlyConfigured
+from asgiref.sync import sync_to_async
+from django.db import transaction
 from django.utils.translation import gettext, override
 
 # phone_verify stuff
 from .backends import get_sms_backend
-from .constants import DEFAULT_MIN_TOKEN_LENGTH, DEFAULT_TOKEN_LENGTH
+from .constants import get_settings
+from .dispatch import get_dispatcher
+from .ratelimit import check_send_rate_limit
 
 logger = logging.getLogger(__name__)
 
@@ -18,29 +21,35 @@ logger = logging.getLogger(__name__)
 class PhoneVerificationService(object):
 
     def __init__(self, phone_number, backend=None, language=None):
-        try:
-            self.phone_settings = settings.PHONE_VERIFICATION
-        except AttributeError as e:
-            raise ImproperlyConfigured("Please define PHONE_VERIFICATION in settings") from e
-        self._check_required_settings()
+        # Raises ImproperlyConfigured for missing or invalid settings
+        self.phone_settings = get_settings()
         if backend is None:
             self.backend = get_sms_backend(phone_number=phone_number)
         else:
             self.backend = backend
+        self.dispatcher = get_dispatcher()
 
-        self.verification_message = self.phone_settings["MESSAGE"]
+        self.verification_message = self.phone_settings.message
         self.language = language
 
     def send_verification(self, number, security_code, context=None):
         """
         Send a verification text to the given number to verify.
 
+        The message is handed to the configured dispatcher, which either sends
+        it right away or queues it for a worker.
+
         :param number: the phone number of recipient.
         :param security_code: generated code to verify
         :param context: optional dictionary for custom message formatting
         """
         message = self._generate_message(security_code, context)
-        self.backend.send_sms(number, message)
+        return self.dispatcher.dispatch(self.backend, number, message)
+
+    async def asend_verification(self, number, security_code, context=None):
+        """Async counterpart of ``send_verification``."""
+        message = self._generate_message(security_code, context)
+        return await self.dispatcher.adispatch(self.backend, number, message)
 
     def _generate_message(self, security_code, context=None):
         # If the backend has its own message generator, prefer it
@@ -51,7 +60,7 @@ class PhoneVerificationService(object):
 
         # Default fallback
         format_context = {
-            "app": settings.PHONE_VERIFICATION["APP_NAME"],
+            "app": self.phone_settings.app_name,
             "security_code": security_code,
         }
         if context:
@@ -65,51 +74,96 @@ class PhoneVerificationService(object):
 
         return verification_message.format(**format_context)
 
-    def _check_required_settings(self):
-        required_settings = {
-            "BACKEND",
-            "OPTIONS",
-            "TOKEN_LENGTH",
-            "MESSAGE",
-            "APP_NAME",
-            "VERIFY_SECURITY_CODE_ONLY_ONCE",
-        }
-        user_settings = set(settings.PHONE_VERIFICATION.keys())
-        if not required_settings.issubset(user_settings):
-            raise ImproperlyConfigured(
-                "Please specify following settings in settings.py: {}".format(
-                    ", ".join(required_settings - user_settings)
-                )
-            )
 
-        # Check for expiration time setting (either old or new name)
-        has_expiration_setting = (
-            "SECURITY_CODE_EXPIRATION_SECONDS" in user_settings
-            or "SECURITY_CODE_EXPIRATION_TIME" in user_settings
+def send_security_code_and_generate_session_token(phone_number, language=None, ip_address=None):
+    """
+    Store a new security code for ``phone_number``, send it and return the session token.
+
+    :param ip_address: client address counted against the ``IP`` rate limit
+    :raises RateLimitExceeded: if a ``RATE_LIMITS`` limit is hit; nothing is
+        stored or sent in that case
+    """
+    check_send_rate_limit(phone_number, ip_address)
+    sms_backend = get_sms_backend(phone_number)
+    service = PhoneVerificationService(
+        phone_number=phone_number, backend=sms_backend, language=language
+    )
+    return _store_and_send(service, phone_number)
+
+
+def _store_and_send(service, phone_number):
+    """
+    Store a new security code with ``service.backend`` and send it.
+
+    With a transactional dispatcher (``OutboxDispatcher``) both writes happen
+    in one transaction: the message is queued if and only if the code is stored.
+    """
+    with transaction.atomic() if service.dispatcher.transactional else nullcontext():
+        security_code, session_token = service.backend.create_security_code_and_session_token(
+            phone_number
         )
-        if not has_expiration_setting:
-            raise ImproperlyConfigured(
-                "Please specify either SECURITY_CODE_EXPIRATION_SECONDS (recommended) "
-                "or SECURITY_CODE_EXPIRATION_TIME in settings.py"
+        try:
+            service.send_verification(phone_number, security_code)
+        except service.backend.exception_class as exc:
+            logger.error(
+                "Error in sending verification code to {phone_number}: "
+                "{error}".format(phone_number=phone_number, error=exc)
             )
+    return session_token
+
 
-        # Validate minimum token length
-        token_length = settings.PHONE_VERIFICATION.get("TOKEN_LENGTH", DEFAULT_TOKEN_LENGTH)
-        min_token_length = settings.PHONE_VERIFICATION.get("MIN_TOKEN_LENGTH", DEFAULT_MIN_TOKEN_LENGTH)
-        if token_length < min_token_length:
-            raise ImproperlyConfigured(
-                f"TOKEN_LENGTH ({token_length}) cannot be less than MIN_TOKEN_LENGTH ({min_token_length})"
+def send_security_codes_and_generate_session_tokens(phone_numbers, language=None, batch_size=None):
+    """
+    Issue security codes to many phone numbers at once.
+
+    Codes are stored with ``create_security_codes_and_session_tokens`` and the
+    messages are sent with the backend's concurrent, rate-limited
+    ``send_bulk_messages``, bypassing the configured dispatcher. Send failures
+    are logged per number and do not stop the others.
+
+    :param phone_numbers: Iterable of phone numbers
+    :param language: Optional language code for the message
+    :param batch_size: Rows per DELETE/INSERT round-trip (default: ``BULK_BATCH_SIZE``)
+
+    :return: dict mapping each phone number to its session token
+    """
+    sms_backend = get_sms_backend(None)
+    issued = sms_backend.create_security_codes_and_session_tokens(phone_numbers, batch_size=batch_size)
+    service = PhoneVerificationService(phone_number=None, backend=sms_backend, language=language)
+
+    results = sms_backend.send_bulk_messages(
+        (number, service._generate_message(security_code)) for number, security_code, _ in issued
+    )
+    for result in results:
+        if not result.success:
+            logger.error(
+                "Error in sending verification code to {phone_number}: "
+                "{error}".format(phone_number=result.number, error=result.error)
             )
+    return {number: session_token for number, _, session_token in issued}
 
 
-def send_security_code_and_generate_session_token(phone_number, language=None):
+async def asend_security_code_and_generate_session_token(phone_number, language=None, ip_address=None):
+    """
+    Async counterpart of ``send_security_code_and_generate_session_token``.
+
+    Stores the code through Django's async ORM and sends through the
+    backend's ``asend_sms``, so no thread is held while the provider responds.
+    """
+    await sync_to_async(check_send_rate_limit)(phone_number, ip_address)
     sms_backend = get_sms_backend(phone_number)
-    security_code, session_token = sms_backend.create_security_code_and_session_token(
+    service = PhoneVerificationService(
+        phone_number=phone_number, backend=sms_backend, language=language
+    )
+    if service.dispatcher.transactional:
+        # Transactions cannot span awaits; store and enqueue in one thread.
+        return await sync_to_async(_store_and_send)(service, phone_number)
+
+    security_code, session_token = await sms_backend.acreate_security_code_and_session_token(
         phone_number
     )
-    service = PhoneVerificationService(phone_number=phone_number, language=language)
     try:
-        service.send_verification(phone_number, security_code)
+        await service.asend_verification(phone_number, security_code)
     except service.backend.exception_class as exc:
         logger.error(
             "Error in sending verification code to {phone_number}: "
@@ -131,3 +185,13 @@ def verify_security_code(phone_number, security_code, session_token):
         phone_number=phone_number,
         session_token=session_token,
     )
+
+
+async def averify_security_code(phone_number, security_code, session_token):
+    """Async counterpart of ``verify_security_code``."""
+    backend = get_sms_backend(phone_number)
+    return await backend.avalidate_security_code(
+        security_code=security_code,
+        phone_number=phone_number,
+        session_token=session_token,
+    )
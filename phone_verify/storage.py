@@ -0,0 +1,674 @@
+# -*- coding: utf-8 -*-
+"""
+Verification stores keep issued security codes and check verify attempts.
+
+``ModelVerificationStore`` (the default) keeps them in the ``SMSVerification``
+table. ``CacheVerificationStore`` keeps them in a Django cache such as Redis
+or Memcached, using the cache's TTLs for expiry and atomic ``incr`` for the
+failed-attempts counter, so OTP traffic never reaches the database.
+``PartitionedModelVerificationStore`` keeps them in the table partitioned by
+day, so retention drops whole partitions.
+
+Select one with ``PHONE_VERIFICATION["STORAGE"]``; keyword arguments come
+from ``PHONE_VERIFICATION["STORAGE_OPTIONS"]``.
+"""
+
+import hashlib
+import hmac
+import threading
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+
+# Third Party Stuff
+import django
+from asgiref.sync import sync_to_async
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.db import connections, router, transaction
+from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare
+from django.utils.module_loading import import_string
+
+from .constants import (
+    DEFAULT_BULK_BATCH_SIZE,
+    SECURITY_CODE_EXPIRED,
+    SECURITY_CODE_INVALID,
+    SECURITY_CODE_TOO_MANY_ATTEMPTS,
+    SECURITY_CODE_VALID,
+    SECURITY_CODE_VERIFIED,
+    SESSION_TOKEN_INVALID,
+    get_max_failed_attempts,
+    get_security_code_expiration,
+    get_settings,
+)
+from .models import SMSVerification, security_code_expires_at
+from .partitions import DEFAULT_PRECREATE_DAYS
+from .tokens import e164, hmac_key
+
+DEFAULT_CACHE_ALIAS = "default"
+DEFAULT_CACHE_KEY_PREFIX = "phone_verify"
+DEFAULT_CACHE_GRACE_SECONDS = 300
+
+SECURITY_CODE_DIGEST_SALT = "phone_verify.security_code"
+# First key of the per-number advisory locks taken on PostgreSQL without upsert.
+ADVISORY_LOCK_NAMESPACE = "phone_verify.sms_verification"
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def _supports_update_returning(connection):
+    """Return True if ``connection`` can run ``UPDATE ... RETURNING``."""
+    if connection.vendor == "postgresql":
+        return True
+    if connection.vendor == "sqlite":
+        return connection.Database.sqlite_version_info >= (3, 35, 0)
+    return False
+
+
+def _verify_only_once():
+    return get_settings().verify_security_code_only_once
+
+
+def security_code_digest(phone_number, security_code):
+    """
+    Return the 32-byte HMAC-SHA256 of ``security_code`` for ``phone_number``.
+
+    Keyed with ``SECRET_KEY``, so the stored digests of six-digit codes
+    cannot be brute-forced without it, and bound to the phone number in
+    E.164, so one digest is no use for another number.
+    """
+    key = hmac_key(SECURITY_CODE_DIGEST_SALT)
+    return hmac.digest(key, "{}:{}".format(e164(phone_number), security_code).encode(), "sha256")
+
+
+class BaseVerificationStore(object):
+    """
+    Base class for verification stores.
+
+    ``validate`` returns a ``(verification, status)`` tuple where
+    ``verification`` is an ``SMSVerification`` instance (saved or not,
+    depending on the store), ``None`` for an unknown session, or an empty
+    ``QuerySet`` when a sandbox backend bypassed the code check.
+    """
+
+    # True if retention drops daily partitions (see `phone_verify.partitions`).
+    partitioned = False
+
+    def __init__(self, **options):
+        pass
+
+    def save(self, phone_number, security_code, session_token):
+        """Store a new code for ``phone_number``, replacing any previous one."""
+        raise NotImplementedError()
+
+    def save_many(self, issued, batch_size=None):
+        """
+        Store many codes at once.
+
+        :param issued: list of ``(phone_number, security_code, session_token)``
+        :param batch_size: numbers written per round-trip
+        """
+        for phone_number, security_code, session_token in issued:
+            self.save(phone_number, security_code, session_token)
+
+    def validate(self, security_code, phone_number, session_token, bypass_code_check=False):
+        """Check one verify attempt and record it. See the class docstring for the result."""
+        raise NotImplementedError()
+
+    async def asave(self, phone_number, security_code, session_token):
+        return await sync_to_async(self.save)(phone_number, security_code, session_token)
+
+    async def avalidate(self, security_code, phone_number, session_token, bypass_code_check=False):
+        return await sync_to_async(self.validate)(
+            security_code, phone_number, session_token, bypass_code_check=bypass_code_check
+        )
+
+    def _code_matches(self, verification, security_code):
+        """Compare ``security_code`` with the one stored in ``verification`` in constant time."""
+        return constant_time_compare(verification.security_code, security_code)
+
+    def _get_status(self, verification, security_code):
+        """Status of a non-locked-out attempt against ``verification``."""
+        if not self._code_matches(verification, security_code):
+            return SECURITY_CODE_INVALID
+        if verification.is_expired:
+            return SECURITY_CODE_EXPIRED
+        if verification.is_verified and _verify_only_once():
+            return SECURITY_CODE_VERIFIED
+        return SECURITY_CODE_VALID
+
+
+class ModelVerificationStore(BaseVerificationStore):
+    """
+    Keep verifications in the ``SMSVerification`` table.
+
+    ``phone_number`` is unique, so issuing a new code overwrites the previous
+    row with a single ``INSERT ... ON CONFLICT DO UPDATE`` (``ON DUPLICATE KEY
+    UPDATE`` on MySQL). Concurrent registers for the same number cannot leave
+    duplicate rows behind.
+
+    Options:
+        - ``HASH_SECURITY_CODES``: store only ``security_code_digest``, an
+          HMAC of the code (see ``security_code_digest``), and leave
+          ``security_code`` empty (default: False). Codes issued before the
+          option was switched stop verifying.
+    """
+
+    # Columns reset when a new code replaces an existing row.
+    upsert_fields = [
+        "security_code",
+        "session_token",
+        "is_verified",
+        "failed_attempts",
+        "security_code_digest",
+        "expires_at",
+        "created_at",
+        "modified_at",
+    ]
+
+    def __init__(self, **options):
+        super().__init__(**options)
+        options = {key.lower(): value for key, value in options.items()}
+        self.hash_security_codes = options.get("hash_security_codes", False)
+
+    def _code_fields(self, phone_number, security_code):
+        """Column values holding ``security_code``, in plain text or as a digest."""
+        if self.hash_security_codes:
+            return {"security_code": "", "security_code_digest": security_code_digest(phone_number, security_code)}
+        return {"security_code": security_code, "security_code_digest": None}
+
+    def _new_verification(self, phone_number, security_code, session_token, expires_at):
+        return SMSVerification(
+            phone_number=phone_number,
+            session_token=session_token,
+            expires_at=expires_at,
+            **self._code_fields(phone_number, security_code),
+        )
+
+    def _code_matches(self, verification, security_code):
+        if not self.hash_security_codes:
+            return super()._code_matches(verification, security_code)
+        if verification.security_code_digest is None:
+            return False
+        return hmac.compare_digest(
+            bytes(verification.security_code_digest),
+            security_code_digest(verification.phone_number, security_code),
+        )
+
+    def _upsert_kwargs(self, connection):
+        """
+        ``bulk_create`` arguments that turn the insert into an upsert on
+        ``phone_number``, or None if the database or Django version cannot.
+        """
+        if django.VERSION < (4, 1) or not connection.features.supports_update_conflicts:
+            return None
+        kwargs = {"update_conflicts": True, "update_fields": self.upsert_fields}
+        if connection.features.supports_update_conflicts_with_target:
+            kwargs["unique_fields"] = ["phone_number"]
+        return kwargs
+
+    def save(self, phone_number, security_code, session_token):
+        alias = router.db_for_write(SMSVerification)
+        upsert_kwargs = self._upsert_kwargs(connections[alias])
+        if upsert_kwargs is None:
+            SMSVerification.objects.using(alias).update_or_create(
+                phone_number=phone_number,
+                defaults={
+                    **self._code_fields(phone_number, security_code),
+                    "session_token": session_token,
+                    "is_verified": False,
+                    "failed_attempts": 0,
+                    "expires_at": security_code_expires_at(),
+                    "created_at": timezone.now(),
+                },
+            )
+            return
+
+        SMSVerification.objects.using(alias).bulk_create(
+            [self._new_verification(phone_number, security_code, session_token, security_code_expires_at())],
+            **upsert_kwargs,
+        )
+
+    def save_many(self, issued, batch_size=None):
+        """
+        Each batch is written with one multi-row upsert. Without upsert
+        support, each batch deletes the old rows with one ``phone_number__in``
+        statement and inserts the new ones with one ``bulk_create``, inside a
+        transaction.
+        """
+        batch_size = batch_size or DEFAULT_BULK_BATCH_SIZE
+        alias = router.db_for_write(SMSVerification)
+        upsert_kwargs = self._upsert_kwargs(connections[alias])
+        for start in range(0, len(issued), batch_size):
+            batch = issued[start:start + batch_size]
+            expires_at = security_code_expires_at()
+            verifications = [
+                self._new_verification(phone_number, security_code, session_token, expires_at)
+                for phone_number, security_code, session_token in batch
+            ]
+            if upsert_kwargs is not None:
+                SMSVerification.objects.using(alias).bulk_create(verifications, **upsert_kwargs)
+                continue
+            with transaction.atomic(using=alias):
+                self._lock_phone_numbers(connections[alias], [phone_number for phone_number, _, _ in batch])
+                SMSVerification.objects.using(alias).filter(
+                    phone_number__in=[phone_number for phone_number, _, _ in batch]
+                ).delete()
+                SMSVerification.objects.using(alias).bulk_create(verifications)
+
+    def _lock_phone_numbers(self, connection, phone_numbers):
+        """
+        Hold a transaction-level lock per phone number on PostgreSQL.
+
+        Without a unique constraint to conflict on, two concurrent
+        ``DELETE`` + ``INSERT`` pairs for one number would both insert under
+        READ COMMITTED. The advisory locks make the second wait for the
+        first to commit. Keys are taken in hash order, so batches sharing
+        numbers cannot deadlock. Other databases either keep the unique
+        constraint or serialize writes themselves.
+        """
+        if connection.vendor != "postgresql":
+            return
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT pg_advisory_xact_lock(hashtext(%s), hashtext(number)) "
+                "FROM unnest(%s::text[]) AS number ORDER BY hashtext(number)",
+                [ADVISORY_LOCK_NAMESPACE, sorted({e164(phone_number) for phone_number in phone_numbers})],
+            )
+
+    async def asave(self, phone_number, security_code, session_token):
+        alias = router.db_for_write(SMSVerification)
+        upsert_kwargs = self._upsert_kwargs(connections[alias])
+        # Also None before Django 4.1, which has no `abulk_create`.
+        if upsert_kwargs is None:
+            return await super().asave(phone_number, security_code, session_token)
+
+        await SMSVerification.objects.using(alias).abulk_create(
+            [self._new_verification(phone_number, security_code, session_token, security_code_expires_at())],
+            **upsert_kwargs,
+        )
+
+    def validate(self, security_code, phone_number, session_token, bypass_code_check=False):
+        # Allow sandbox backends to bypass validation (but check brute force first if verification exists)
+        if bypass_code_check:
+            return self._validate_bypassed(phone_number, session_token)
+
+        connection = connections[router.db_for_write(SMSVerification)]
+        if _supports_update_returning(connection):
+            return self._validate_with_update_returning(
+                connection, security_code, phone_number, session_token
+            )
+        return self._validate_with_row_lock(
+            connection, security_code, phone_number, session_token
+        )
+
+    async def avalidate(self, security_code, phone_number, session_token, bypass_code_check=False):
+        """
+        The single-statement path runs through Django's async ORM (4.1+).
+        Sandbox bypasses and the row-lock fallback need a transaction, which
+        the async ORM does not offer, so they run the sync implementation in a
+        thread, as does everything on older Django versions.
+        """
+        connection = connections[router.db_for_write(SMSVerification)]
+        if django.VERSION < (4, 1) or bypass_code_check or not _supports_update_returning(connection):
+            return await super().avalidate(
+                security_code, phone_number, session_token, bypass_code_check=bypass_code_check
+            )
+
+        sql, params, now = self._build_verify_update(connection, security_code, phone_number, session_token)
+        updated = [row async for row in SMSVerification.objects.db_manager(connection.alias).raw(sql, params)]
+
+        if not updated:
+            stored_verification = await SMSVerification.objects.using(connection.alias).filter(
+                phone_number=phone_number, session_token=session_token
+            ).afirst()
+            return self._status_without_update(stored_verification)
+        return self._status_from_updated(updated[0], security_code, now)
+
+    def _validate_bypassed(self, phone_number, session_token):
+        stored_verification = SMSVerification.objects.filter(
+            phone_number=phone_number, session_token=session_token
+        ).first()
+        if stored_verification is None:
+            return SMSVerification.objects.none(), SECURITY_CODE_VALID
+
+        # Even for sandbox, check brute force limit first
+        if stored_verification.failed_attempts >= get_max_failed_attempts():
+            return stored_verification, SECURITY_CODE_TOO_MANY_ATTEMPTS
+
+        stored_verification.failed_attempts = 0
+        stored_verification.save(update_fields=['failed_attempts'])
+        return SMSVerification.objects.none(), SECURITY_CODE_VALID
+
+    def _validate_with_update_returning(self, connection, security_code, phone_number, session_token):
+        """
+        Check and record a verify attempt with a single conditional
+        ``UPDATE ... RETURNING`` statement.
+
+        The attempt limit, code comparison, expiry check and counter update
+        all happen in one statement, so concurrent wrong guesses cannot all
+        read the counter before any of them increments it.
+        """
+        sql, params, now = self._build_verify_update(connection, security_code, phone_number, session_token)
+        updated = list(SMSVerification.objects.db_manager(connection.alias).raw(sql, params))
+
+        if not updated:
+            stored_verification = SMSVerification.objects.using(connection.alias).filter(
+                phone_number=phone_number, session_token=session_token
+            ).first()
+            return self._status_without_update(stored_verification)
+        return self._status_from_updated(updated[0], security_code, now)
+
+    def _build_verify_update(self, connection, security_code, phone_number, session_token):
+        """Return ``(sql, params, now)`` for the conditional verify ``UPDATE ... RETURNING``."""
+        now = timezone.now()
+        # Rows without `expires_at` (issued before it was backfilled) expire
+        # relative to `created_at`, as in `SMSVerification.get_expires_at`.
+        cutoff = now - timedelta(seconds=get_security_code_expiration())
+
+        opts = SMSVerification._meta
+        qn = connection.ops.quote_name
+
+        def column(name):
+            return qn(opts.get_field(name).column)
+
+        def prep(name, value):
+            return opts.get_field(name).get_db_prep_value(value, connection)
+
+        if self.hash_security_codes:
+            code_field, code = "security_code_digest", security_code_digest(phone_number, security_code)
+        else:
+            code_field, code = "security_code", security_code
+        is_valid_attempt = "{code} = %s AND ({expires} >= %s OR ({expires} IS NULL AND {created} >= %s))".format(
+            code=column(code_field), expires=column("expires_at"), created=column("created_at")
+        )
+        valid_params = [
+            prep(code_field, code),
+            prep("expires_at", now),
+            prep("created_at", cutoff),
+        ]
+        if _verify_only_once():
+            is_valid_attempt += " AND NOT {}".format(column("is_verified"))
+
+        sql = (
+            "UPDATE {table} SET "
+            "{failed} = CASE WHEN {valid} THEN 0 ELSE {failed} + 1 END, "
+            "{verified} = CASE WHEN {valid} THEN %s ELSE {verified} END, "
+            "{modified} = %s "
+            "WHERE {phone} = %s AND {token} = %s AND {failed} < %s "
+            "RETURNING *"
+        ).format(
+            table=qn(opts.db_table),
+            valid=is_valid_attempt,
+            failed=column("failed_attempts"),
+            verified=column("is_verified"),
+            modified=column("modified_at"),
+            phone=column("phone_number"),
+            token=column("session_token"),
+        )
+        params = valid_params + valid_params + [
+            prep("is_verified", True),
+            prep("modified_at", now),
+            prep("phone_number", phone_number),
+            prep("session_token", session_token),
+            get_max_failed_attempts(),
+        ]
+        return sql, params, now
+
+    def _status_without_update(self, stored_verification):
+        """The verify ``UPDATE`` matched no row: unknown session or locked out."""
+        if stored_verification is None:
+            return None, SESSION_TOKEN_INVALID
+        return stored_verification, SECURITY_CODE_TOO_MANY_ATTEMPTS
+
+    def _status_from_updated(self, stored_verification, security_code, now):
+        """
+        Derive the status from the row returned by the verify ``UPDATE``.
+
+        The row holds the *new* values: a code mismatch is
+        ``SECURITY_CODE_INVALID``, a row that expired before ``now`` is
+        ``SECURITY_CODE_EXPIRED``, a still non-zero ``failed_attempts`` means
+        the code was already used (``SECURITY_CODE_VERIFIED``), and anything
+        else is ``SECURITY_CODE_VALID``.
+        """
+        if not self._code_matches(stored_verification, security_code):
+            return stored_verification, SECURITY_CODE_INVALID
+        if stored_verification.get_expires_at() < now:
+            return stored_verification, SECURITY_CODE_EXPIRED
+        if stored_verification.failed_attempts:
+            return stored_verification, SECURITY_CODE_VERIFIED
+        return stored_verification, SECURITY_CODE_VALID
+
+    def _validate_with_row_lock(self, connection, security_code, phone_number, session_token):
+        """
+        Fallback for databases without ``UPDATE ... RETURNING``.
+
+        Locks the row with ``SELECT ... FOR UPDATE`` and records the attempt
+        with a single ``UPDATE`` inside the same transaction.
+        """
+        with transaction.atomic(using=connection.alias):
+            stored_verification = SMSVerification.objects.using(connection.alias).select_for_update().filter(
+                phone_number=phone_number, session_token=session_token
+            ).first()
+
+            # check verification exists
+            if stored_verification is None:
+                return stored_verification, SESSION_TOKEN_INVALID
+
+            # check if too many failed attempts
+            if stored_verification.failed_attempts >= get_max_failed_attempts():
+                return stored_verification, SECURITY_CODE_TOO_MANY_ATTEMPTS
+
+            status = self._get_status(stored_verification, security_code)
+            if status == SECURITY_CODE_VALID:
+                # mark security_code as verified
+                stored_verification.is_verified = True
+                stored_verification.failed_attempts = 0
+            else:
+                stored_verification.failed_attempts += 1
+            stored_verification.modified_at = timezone.now()
+            SMSVerification.objects.using(connection.alias).filter(pk=stored_verification.pk).update(
+                is_verified=stored_verification.is_verified,
+                failed_attempts=stored_verification.failed_attempts,
+                modified_at=stored_verification.modified_at,
+            )
+
+        return stored_verification, status
+
+
+class PartitionedModelVerificationStore(ModelVerificationStore):
+    """
+    Keep verifications in an ``SMSVerification`` table partitioned by day.
+
+    Create the layout and future partitions with the
+    ``create_phone_verification_partitions`` management command;
+    ``cleanup_phone_verifications`` then drops whole expired partitions.
+    See ``phone_verify.partitions``.
+
+    A partitioned table cannot keep the unique constraint on
+    ``phone_number`` (PostgreSQL requires unique constraints to include the
+    partition key), so a new code replaces the previous row with a
+    ``DELETE`` and an ``INSERT`` in one transaction instead of an upsert.
+    On PostgreSQL that transaction first takes an advisory lock per number,
+    so concurrent registers for one number cannot both insert.
+
+    Options:
+        - ``PRECREATE_DAYS``: days of partitions created ahead (default: 7)
+    """
+
+    partitioned = True
+
+    def __init__(self, **options):
+        super().__init__(**options)
+        options = {key.lower(): value for key, value in options.items()}
+        self.precreate_days = options.get("precreate_days", DEFAULT_PRECREATE_DAYS)
+
+    def _upsert_kwargs(self, connection):
+        return None
+
+    def save(self, phone_number, security_code, session_token):
+        self.save_many([(phone_number, security_code, session_token)])
+
+
+class CacheVerificationStore(BaseVerificationStore):
+    """
+    Keep verifications in a Django cache.
+
+    Each phone number has one entry holding its current code and session
+    token, kept for ``SECURITY_CODE_EXPIRATION_SECONDS`` plus a grace period
+    so late attempts report ``SECURITY_CODE_EXPIRED`` rather than
+    ``SESSION_TOKEN_INVALID``. Failed attempts are counted per session token
+    with atomic ``incr``, and a successful verify sets a separate flag per
+    session token, so the entry itself is only written by ``save``: a verify
+    racing a new registration can never restore the old code. Per-token keys
+    hold a SHA-256 digest of the token, not the token. ``validate`` returns
+    unsaved ``SMSVerification`` instances built from the cached values.
+
+    Use a shared cache (Redis, Memcached) when running several processes; the
+    local-memory cache is per process.
+
+    Options:
+        - ``CACHE``: cache alias (default: ``"default"``)
+        - ``KEY_PREFIX``: prefix for cache keys (default: ``"phone_verify"``)
+        - ``GRACE_SECONDS``: extra lifetime after expiry (default: 300)
+    """
+
+    def __init__(self, **options):
+        super().__init__(**options)
+        options = {key.lower(): value for key, value in options.items()}
+        self.cache_alias = options.get("cache", DEFAULT_CACHE_ALIAS)
+        self.key_prefix = options.get("key_prefix", DEFAULT_CACHE_KEY_PREFIX)
+        self.grace_seconds = options.get("grace_seconds", DEFAULT_CACHE_GRACE_SECONDS)
+
+    @property
+    def cache(self):
+        return caches[self.cache_alias]
+
+    def _timeout(self):
+        return get_security_code_expiration() + self.grace_seconds
+
+    def _verification_key(self, phone_number):
+        return "{}:verification:{}".format(self.key_prefix, phone_number)
+
+    def _token_key(self, name, phone_number, session_token):
+        # Tokens can be hundreds of characters, over Memcached's 250 byte key limit.
+        digest = hashlib.sha256(session_token.encode()).hexdigest()
+        return "{}:{}:{}:{}".format(self.key_prefix, name, phone_number, digest)
+
+    def _attempts_key(self, phone_number, session_token):
+        return self._token_key("attempts", phone_number, session_token)
+
+    def _verified_key(self, phone_number, session_token):
+        return self._token_key("verified", phone_number, session_token)
+
+    def _entry(self, phone_number, security_code, session_token):
+        return {
+            "security_code": security_code,
+            "session_token": session_token,
+            "created_at": timezone.now().timestamp(),
+        }
+
+    def save(self, phone_number, security_code, session_token):
+        self.cache.set(
+            self._verification_key(phone_number),
+            self._entry(phone_number, security_code, session_token),
+            self._timeout(),
+        )
+
+    def save_many(self, issued, batch_size=None):
+        batch_size = batch_size or DEFAULT_BULK_BATCH_SIZE
+        for start in range(0, len(issued), batch_size):
+            self.cache.set_many(
+                {
+                    self._verification_key(phone_number): self._entry(phone_number, security_code, session_token)
+                    for phone_number, security_code, session_token in issued[start:start + batch_size]
+                },
+                self._timeout(),
+            )
+
+    def _to_verification(self, phone_number, entry, is_verified, failed_attempts):
+        return SMSVerification(
+            phone_number=phone_number,
+            security_code=entry["security_code"],
+            session_token=entry["session_token"],
+            is_verified=is_verified,
+            failed_attempts=failed_attempts,
+            created_at=datetime.fromtimestamp(entry["created_at"], tz=dt_timezone.utc),
+        )
+
+    def _record_attempt(self, attempts_key):
+        """Atomically count one attempt and return the new count."""
+        self.cache.add(attempts_key, 0, self._timeout())
+        try:
+            return self.cache.incr(attempts_key)
+        except ValueError:
+            # The key expired between `add` and `incr`.
+            self.cache.add(attempts_key, 1, self._timeout())
+            return 1
+
+    def validate(self, security_code, phone_number, session_token, bypass_code_check=False):
+        cache = self.cache
+        verification_key = self._verification_key(phone_number)
+        verified_key = self._verified_key(phone_number, session_token)
+        values = cache.get_many([verification_key, verified_key])
+        entry = values.get(verification_key)
+        is_verified = values.get(verified_key, False)
+        if entry is None or not constant_time_compare(entry["session_token"], session_token):
+            if bypass_code_check:
+                return SMSVerification.objects.none(), SECURITY_CODE_VALID
+            return None, SESSION_TOKEN_INVALID
+
+        max_failed_attempts = get_max_failed_attempts()
+        attempts_key = self._attempts_key(phone_number, session_token)
+
+        # Every attempt takes a slot in the counter before the code is
+        # compared, so concurrent guesses cannot exceed the limit.
+        attempts = self._record_attempt(attempts_key)
+        if attempts > max_failed_attempts:
+            cache.decr(attempts_key)
+            verification = self._to_verification(phone_number, entry, is_verified, max_failed_attempts)
+            return verification, SECURITY_CODE_TOO_MANY_ATTEMPTS
+
+        if bypass_code_check:
+            cache.set(attempts_key, 0, self._timeout())
+            return SMSVerification.objects.none(), SECURITY_CODE_VALID
+
+        verification = self._to_verification(phone_number, entry, is_verified, attempts)
+        status = self._get_status(verification, security_code)
+        if status == SECURITY_CODE_VALID:
+            verification.is_verified = True
+            verification.failed_attempts = 0
+            cache.set(attempts_key, 0, self._timeout())
+            if not is_verified:
+                remaining = entry["created_at"] + self._timeout() - timezone.now().timestamp()
+                cache.set(verified_key, True, max(remaining, 1))
+        return verification, status
+
+
+def get_verification_store():
+    """Return the process-wide store configured in ``PHONE_VERIFICATION``."""
+    global _store
+
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                phone_settings = get_settings()
+                store_cls = import_string(phone_settings.storage)
+                _store = store_cls(**phone_settings.storage_options)
+    return _store
+
+
+def clear_verification_store():
+    """Drop the cached store so the next call rebuilds it from settings."""
+    global _store
+
+    with _store_lock:
+        _store = None
+
+
+@receiver(setting_changed)
+def _clear_verification_store_on_setting_changed(setting, **kwargs):
+    if setting == "PHONE_VERIFICATION":
+        clear_verification_store()
@@ -0,0 +1,258 @@
+# -*- coding: utf-8 -*-
+"""
+Session token generators and the keyed hashing they share with storage.
+
+Select the format with ``PHONE_VERIFICATION["SESSION_TOKEN_FORMAT"]``:
+
+- ``"jwt"`` (the default): ``JWTSessionTokenGenerator``, an HS256 JWT of
+  about 150 characters holding the phone number and a random nonce.
+- ``"compact"``: ``CompactSessionTokenGenerator``, 32 URL-safe characters
+  encoding 24 bytes::
+
+      nonce (8 random bytes) | exp (4 bytes, big-endian) | mac (12 bytes)
+
+  where ``mac`` is HMAC-SHA256, truncated to 96 bits, of the phone number in
+  E.164 and the first 12 bytes, keyed from ``SECRET_KEY``.
+- the import path of a ``BaseSessionTokenGenerator`` subclass.
+
+Keyword arguments come from ``PHONE_VERIFICATION["SESSION_TOKEN_OPTIONS"]``.
+Nonces come from ``secrets``; with ``BUFFER_SIZE`` they are drawn that many
+at a time. Measure the cost per token with ``python -m benchmarks.session_tokens``.
+"""
+
+import base64
+import binascii
+import functools
+import hashlib
+import hmac
+import json
+import os
+import re
+import secrets
+import threading
+import time
+import weakref
+
+# Third Party Stuff
+import jwt
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.crypto import constant_time_compare
+from django.utils.module_loading import import_string
+from phonenumber_field.phonenumber import PhoneNumber, to_python
+
+from .constants import SECURITY_CODE_EXPIRED, SESSION_TOKEN_GENERATORS, SESSION_TOKEN_INVALID, get_settings
+
+E164_RE = re.compile(r"^\+[1-9]\d{1,14}$")
+
+SESSION_TOKEN_ALGORITHM = "HS256"
+COMPACT_TOKEN_LENGTH = 32
+COMPACT_TOKEN_SALT = "phone_verify.session_token"
+
+_generator = None
+_generator_lock = threading.Lock()
+
+
+@functools.lru_cache(maxsize=8)
+def _hmac_key(salt, secret_key):
+    # Derived like `django.utils.crypto.salted_hmac`, once per salt and SECRET_KEY.
+    return hashlib.sha256((salt + secret_key).encode()).digest()
+
+
+def hmac_key(salt):
+    """Return the 32-byte HMAC key for ``salt``, derived from ``SECRET_KEY``."""
+    return _hmac_key(salt, settings.SECRET_KEY)
+
+
+def e164(phone_number):
+    """Return ``phone_number`` in E.164, parsing it only if it is in another format."""
+    if isinstance(phone_number, PhoneNumber):
+        return phone_number.as_e164
+    phone_number = str(phone_number)
+    if E164_RE.match(phone_number):
+        return phone_number
+    return to_python(phone_number).as_e164
+
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b"=")
+
+
+class NonceBuffer(object):
+    """
+    Random nonces from ``secrets``, drawn ``size`` at a time.
+
+    ``take`` pops a pre-generated nonce, which needs no lock: ``list.pop``
+    is atomic, and threads that find the buffer empty at the same time each
+    draw a fresh block. Buffers are emptied in a forked child, so processes
+    forked from a warmed-up parent never share nonces.
+
+    :param nonce_bytes: bytes per nonce
+    :param size: nonces drawn per ``secrets.token_bytes`` call; 0 or 1 draws
+        each nonce on its own
+    """
+
+    def __init__(self, nonce_bytes, size=0):
+        self.nonce_bytes = nonce_bytes
+        self.size = size
+        self._nonces = []
+        _buffers.add(self)
+
+    def take(self):
+        try:
+            return self._nonces.pop()
+        except IndexError:
+            pass
+        if self.size <= 1:
+            return secrets.token_bytes(self.nonce_bytes)
+        block = secrets.token_bytes(self.nonce_bytes * self.size)
+        step = self.nonce_bytes
+        self._nonces = [block[start:start + step] for start in range(step, len(block), step)]
+        return block[:step]
+
+    def discard(self):
+        self._nonces = []
+
+
+_buffers = weakref.WeakSet()
+
+
+def _discard_buffers():
+    for buffer in list(_buffers):
+        buffer.discard()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_discard_buffers)
+
+
+class BaseSessionTokenGenerator(object):
+    """
+    Base class for session token formats.
+
+    ``generate`` is called once per issued code and ``check`` before any
+    storage lookup when ``SIGNED_SESSION_TOKENS`` is on.
+    """
+
+    nonce_bytes = 8
+
+    def __init__(self, **options):
+        options = {key.lower(): value for key, value in options.items()}
+        self.nonces = NonceBuffer(self.nonce_bytes, options.get("buffer_size", 0))
+
+    def generate(self, phone_number, exp=None):
+        """
+        Return a new session token for ``phone_number``.
+
+        :param exp: expiry as a Unix timestamp, or None for no expiry claim
+        """
+        raise NotImplementedError()
+
+    def check(self, session_token, phone_number, now=None):
+        """
+        Check a token's signature, expiry and phone number without any I/O.
+
+        :return: None if the token is acceptable, ``SECURITY_CODE_EXPIRED`` if
+            it expired, ``SESSION_TOKEN_INVALID`` for anything else
+            (including a token without an expiry).
+        """
+        raise NotImplementedError()
+
+
+class JWTSessionTokenGenerator(BaseSessionTokenGenerator):
+    """
+    HS256 JWTs, checked with PyJWT.
+
+    Tokens are encoded directly rather than with ``jwt.encode``: the header
+    never changes and the payload is three flat claims, so only the payload
+    is serialized and signed per token.
+    """
+
+    _header = _b64encode(json.dumps({"alg": SESSION_TOKEN_ALGORITHM, "typ": "JWT"}, separators=(",", ":")).encode())
+
+    def generate(self, phone_number, exp=None):
+        claims = {"phone_number": str(phone_number), "nonce": _b64encode(self.nonces.take()).decode("ascii")}
+        if exp is not None:
+            claims["exp"] = exp
+        signing_input = self._header + b"." + _b64encode(json.dumps(claims, separators=(",", ":")).encode())
+        signature = hmac.digest(settings.SECRET_KEY.encode(), signing_input, "sha256")
+        return (signing_input + b"." + _b64encode(signature)).decode("ascii")
+
+    def check(self, session_token, phone_number, now=None):
+        try:
+            payload = jwt.decode(
+                session_token,
+                settings.SECRET_KEY,
+                algorithms=[SESSION_TOKEN_ALGORITHM],
+                options={"require": ["exp", "phone_number"]},
+            )
+        except jwt.ExpiredSignatureError:
+            return SECURITY_CODE_EXPIRED
+        except jwt.InvalidTokenError:
+            return SESSION_TOKEN_INVALID
+        if not constant_time_compare(str(payload["phone_number"]), str(phone_number)):
+            return SESSION_TOKEN_INVALID
+        return None
+
+
+class CompactSessionTokenGenerator(BaseSessionTokenGenerator):
+    """Fixed-length 32-character tokens: nonce, expiry and a truncated HMAC."""
+
+    exp_bytes = 4
+    mac_bytes = 12
+
+    def _mac(self, phone_number, payload):
+        key = hmac_key(COMPACT_TOKEN_SALT)
+        return hmac.digest(key, e164(phone_number).encode() + b":" + payload, "sha256")[:self.mac_bytes]
+
+    def generate(self, phone_number, exp=None):
+        payload = self.nonces.take() + int(exp or 0).to_bytes(self.exp_bytes, "big")
+        return base64.urlsafe_b64encode(payload + self._mac(phone_number, payload)).decode("ascii")
+
+    def check(self, session_token, phone_number, now=None):
+        if not isinstance(session_token, str) or len(session_token) != COMPACT_TOKEN_LENGTH:
+            return SESSION_TOKEN_INVALID
+        try:
+            raw = base64.urlsafe_b64decode(session_token.encode("ascii"))
+        except (ValueError, binascii.Error):
+            return SESSION_TOKEN_INVALID
+        payload, mac = raw[:-self.mac_bytes], raw[-self.mac_bytes:]
+        if len(payload) != self.nonce_bytes + self.exp_bytes or not hmac.compare_digest(
+            mac, self._mac(phone_number, payload)
+        ):
+            return SESSION_TOKEN_INVALID
+        exp = int.from_bytes(payload[self.nonce_bytes:], "big")
+        if not exp:
+            return SESSION_TOKEN_INVALID
+        if exp <= (time.time() if now is None else now):
+            return SECURITY_CODE_EXPIRED
+        return None
+
+
+def get_session_token_generator():
+    """Return the process-wide generator configured in ``PHONE_VERIFICATION``."""
+    global _generator
+
+    if _generator is None:
+        with _generator_lock:
+            if _generator is None:
+                phone_settings = get_settings()
+                fmt = phone_settings.session_token_format
+                generator_cls = import_string(SESSION_TOKEN_GENERATORS.get(fmt, fmt))
+                _generator = generator_cls(**phone_settings.session_token_options)
+    return _generator
+
+
+def clear_session_token_generator():
+    """Drop the cached generator so the next call rebuilds it from settings."""
+    global _generator
+
+    with _generator_lock:
+        _generator = None
+
+
+@receiver(setting_changed)
+def _clear_session_token_generator_on_setting_changed(setting, **kwargs):
+    if setting == "PHONE_VERIFICATION":
+        clear_session_token_generator()
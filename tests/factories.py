@@ -7,5 +7,7 @@ from django_dynamic_fixture import G
 
 def create_verification(**kwargs):
     SMSVerification = apps.get_model("phone_verify", "SMSVerification")
-    verification = G(SMSVerification, **kwargs)
+    # Leave `expires_at` empty so `SMSVerification.save` derives it from the
+    # expiration setting.
+    verification = G(SMSVerification, fill_nullable_fields=False, **kwargs)
     return verification
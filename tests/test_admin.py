@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+
+from datetime import timedelta
+
+# Third Party Stuff
+import pytest
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.test import RequestFactory
+from django.utils import timezone
+
+# phone_verify Stuff
+from phone_verify.admin import EstimatedCountPaginator, SMSOutboxAdmin, SMSVerificationAdmin
+from phone_verify.models import SMSOutbox, SMSVerification
+
+pytestmark = pytest.mark.django_db
+
+SESSION_TOKEN = "phone-auth-session-token"
+
+
+@pytest.fixture
+def model_admin(phone_settings):
+    with phone_settings(SECURITY_CODE_EXPIRATION_SECONDS=600):
+        yield SMSVerificationAdmin(SMSVerification, admin.site)
+
+
+def _changelist(model_admin, **params):
+    request = RequestFactory().get("/admin/phone_verify/smsverification/", params)
+    request.user = User(username="admin", is_staff=True, is_superuser=True, is_active=True)
+    return model_admin.get_changelist_instance(request)
+
+
+def _create_verifications():
+    for index, age in enumerate((timedelta(0), timedelta(minutes=5), timedelta(hours=1), timedelta(days=2))):
+        SMSVerification.objects.create(
+            phone_number=f"+1347837963{index}", security_code="123456", session_token=SESSION_TOKEN
+        )
+        created_at = timezone.now() - age
+        SMSVerification.objects.filter(phone_number=f"+1347837963{index}").update(
+            created_at=created_at, expires_at=created_at + timedelta(seconds=600)
+        )
+
+
+def test_is_valid_is_annotated_and_sortable(model_admin):
+    _create_verifications()
+
+    changelist = _changelist(model_admin, o="5")  # `is_valid` is the 5th column.
+    rows = list(changelist.result_list)
+
+    assert [row.is_valid for row in rows] == [False, False, True, True]
+    assert all(model_admin.is_valid(row) == (not row.is_expired) for row in rows)
+    assert "ORDER BY" in str(changelist.result_list.query)
+
+
+def test_is_valid_filter_uses_expires_at_range(model_admin):
+    _create_verifications()
+
+    valid = _changelist(model_admin, is_valid="1")
+    expired = _changelist(model_admin, is_valid="0")
+
+    assert sorted(str(row.phone_number) for row in valid.result_list) == ["+13478379630", "+13478379631"]
+    assert sorted(str(row.phone_number) for row in expired.result_list) == ["+13478379632", "+13478379633"]
+    assert '"expires_at" >=' in str(valid.result_list.query)
+
+
+def test_is_valid_falls_back_to_the_model_without_annotation(model_admin):
+    _create_verifications()
+
+    verification = SMSVerification.objects.get(phone_number="+13478379633")
+
+    assert model_admin.is_valid(verification) is False
+
+
+def test_admin_indexes_match_changelist_filters():
+    indexes = {tuple(index.fields) for index in SMSVerification._meta.indexes}
+
+    assert ("created_at",) in indexes
+    assert ("is_verified", "created_at") in indexes
+    assert SMSVerification._meta.get_field("phone_number").unique
+
+
+def test_estimated_count_paginator_uses_estimate_for_unfiltered_large_tables(mocker, django_assert_num_queries):
+    _create_verifications()
+    mocker.patch.object(EstimatedCountPaginator, "_estimate", return_value=5_000_000)
+
+    paginator = EstimatedCountPaginator(SMSVerification.objects.order_by("phone_number"), 100)
+    with django_assert_num_queries(0):
+        assert paginator.count == 5_000_000
+
+    filtered = EstimatedCountPaginator(SMSVerification.objects.filter(is_verified=False).order_by("pk"), 100)
+    assert filtered.count == 4
+
+
+@pytest.mark.parametrize("estimate", [None, 1_000])
+def test_estimated_count_paginator_counts_small_or_unknown_tables(mocker, estimate):
+    _create_verifications()
+    mocker.patch.object(EstimatedCountPaginator, "_estimate", return_value=estimate)
+
+    paginator = EstimatedCountPaginator(SMSVerification.objects.order_by("pk"), 100)
+
+    assert paginator.count == 4
+
+
+def test_estimated_count_paginator_counts_exactly_on_sqlite():
+    _create_verifications()
+
+    paginator = EstimatedCountPaginator(SMSVerification.objects.order_by("pk"), 100)
+
+    assert paginator._estimate(paginator.object_list) is None
+    assert paginator.count == 4
+
+
+def test_changelist_skips_full_result_count(model_admin, django_assert_num_queries):
+    _create_verifications()
+
+    with django_assert_num_queries(2):
+        changelist = _changelist(model_admin, is_verified__exact="0")
+        list(changelist.result_list)
+
+    assert changelist.result_count == 4
+    assert changelist.show_full_result_count is False
+
+
+def test_outbox_admin_hides_the_message():
+    outbox = SMSOutbox.objects.create(phone_number="+13478379634", message="Your code is 123456")
+    outbox_admin = SMSOutboxAdmin(SMSOutbox, admin.site)
+    request = RequestFactory().get("/admin/phone_verify/smsoutbox/")
+    request.user = User(username="admin", is_staff=True, is_superuser=True, is_active=True)
+
+    assert "message" not in outbox_admin.get_list_display(request)
+    assert "message" not in outbox_admin.get_fields(request, outbox)
@@ -219,9 +219,10 @@ def test_verified_security_code(client, backend):
 
         backend_cls = _get_backend_cls(backend)
 
-        # Security code verification is restricted to one time
-        backend["VERIFY_SECURITY_CODE_ONLY_ONCE"] = True
-        response = client.json.post(url, data=data)
+        # Security code verification is restricted to one time.
+        # Settings are memoized, so change them through override_settings.
+        with override_settings(PHONE_VERIFICATION={**backend, "VERIFY_SECURITY_CODE_ONLY_ONCE": True}):
+            response = client.json.post(url, data=data)
         response_data = json.loads(json.dumps(response.data))
         if backend_cls in backends:
             assert response.status_code == 400
@@ -234,8 +235,8 @@ def test_verified_security_code(client, backend):
             assert response.status_code == 200
 
         # Security code verification is not restricted to one time
-        backend["VERIFY_SECURITY_CODE_ONLY_ONCE"] = False
-        response = client.json.post(url, data=data)
+        with override_settings(PHONE_VERIFICATION={**backend, "VERIFY_SECURITY_CODE_ONLY_ONCE": False}):
+            response = client.json.post(url, data=data)
         response_data = json.loads(json.dumps(response.data))
         assert response.status_code == 200
         assert response.data["message"] == "Security code is valid."
@@ -0,0 +1,233 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+import time
+from unittest.mock import AsyncMock, MagicMock
+
+# Third Party Stuff
+import pytest
+from aiohttp import web
+from asgiref.sync import async_to_sync
+from django.test import AsyncClient, override_settings
+from nexmo.errors import ClientError
+
+# phone_verify Stuff
+from phone_verify.backends import get_sms_backend
+from phone_verify.backends.base import BaseBackend
+from phone_verify.dispatch import OutboxDispatcher
+from phone_verify.models import SMSOutbox, SMSVerification
+from phone_verify.services import (
+    asend_security_code_and_generate_session_token,
+    averify_security_code,
+)
+from phone_verify.storage import get_verification_store
+
+pytestmark = pytest.mark.django_db
+
+PHONE_NUMBER = "+13478379634"
+
+
+def test_asend_security_code_and_averify_security_code(backend, mocker):
+    with override_settings(PHONE_VERIFICATION=backend):
+        mock_asend_sms = mocker.patch(f"{backend['BACKEND']}.asend_sms", new_callable=AsyncMock)
+
+        session_token = async_to_sync(asend_security_code_and_generate_session_token)(PHONE_NUMBER)
+
+        verification = SMSVerification.objects.get(session_token=session_token)
+        mock_asend_sms.assert_awaited_once_with(
+            PHONE_NUMBER,
+            f"Welcome to Phone Verify! Please use security code {verification.security_code} to proceed.",
+        )
+
+        _, status = async_to_sync(averify_security_code)(PHONE_NUMBER, "000000", session_token)
+        assert status == BaseBackend.SECURITY_CODE_INVALID
+
+        verification_result, status = async_to_sync(averify_security_code)(
+            PHONE_NUMBER, verification.security_code, session_token
+        )
+        assert status == BaseBackend.SECURITY_CODE_VALID
+        assert verification_result is not None
+
+
+def test_averify_security_code_unknown_session(backend):
+    with override_settings(PHONE_VERIFICATION=backend):
+        verification, status = async_to_sync(averify_security_code)(PHONE_NUMBER, "000000", "unknown")
+
+    assert verification is None
+    assert status == BaseBackend.SESSION_TOKEN_INVALID
+
+
+def test_async_store_and_outbox_run_sync_code_before_django_4_1(backend, mocker):
+    mocker.patch("django.VERSION", (4, 0, 10, "final", 0))
+    async_orm = [mocker.patch(f"django.db.models.QuerySet.{name}") for name in ("abulk_create", "acreate", "afirst")]
+    with override_settings(PHONE_VERIFICATION=backend):
+        store = get_verification_store()
+        save = mocker.spy(store, "save")
+        validate = mocker.spy(store, "validate")
+        dispatcher = OutboxDispatcher()
+        dispatch = mocker.spy(dispatcher, "dispatch")
+
+        async_to_sync(store.asave)(PHONE_NUMBER, "123456", "session-token")
+        _, status = async_to_sync(store.avalidate)("123456", PHONE_NUMBER, "session-token")
+        async_to_sync(dispatcher.adispatch)(None, PHONE_NUMBER, "Your code is 123456")
+
+    assert status == BaseBackend.SECURITY_CODE_VALID
+    assert save.call_count == validate.call_count == dispatch.call_count == 1
+    assert SMSOutbox.objects.filter(phone_number=PHONE_NUMBER).exists()
+    for method in async_orm:
+        method.assert_not_called()
+
+
+def test_asend_security_code_logs_provider_errors(backend, mocker):
+    with override_settings(PHONE_VERIFICATION=backend):
+        exception_class = get_sms_backend(PHONE_NUMBER).exception_class
+        exc = exception_class() if exception_class is ClientError else exception_class(status=500, uri="/")
+        mocker.patch(f"{backend['BACKEND']}.asend_sms", new_callable=AsyncMock, side_effect=exc)
+        mock_logger = mocker.patch("phone_verify.services.logger")
+
+        async_to_sync(asend_security_code_and_generate_session_token)(PHONE_NUMBER)
+
+    mock_logger.error.assert_called_once_with(f"Error in sending verification code to {PHONE_NUMBER}: {exc}")
+
+
+@override_settings(ROOT_URLCONF="phone_verify.async_urls")
+def test_async_views_register_and_verify(backend, mocker):
+    client = AsyncClient()
+    with override_settings(PHONE_VERIFICATION=backend):
+        mocker.patch(f"{backend['BACKEND']}.asend_sms", new_callable=AsyncMock)
+
+        response = async_to_sync(client.post)("/phone/register", {"phone_number": PHONE_NUMBER})
+        assert response.status_code == 200
+        session_token = response.json()["session_token"]
+        security_code = SMSVerification.objects.get(session_token=session_token).security_code
+
+        response = async_to_sync(client.post)(
+            "/phone/verify",
+            {"phone_number": PHONE_NUMBER, "session_token": session_token, "security_code": "000000"},
+            content_type="application/json",
+        )
+        assert response.status_code == 400
+        assert response.json() == {"non_field_errors": ["Security code is not valid"]}
+
+        response = async_to_sync(client.post)(
+            "/phone/verify",
+            {"phone_number": PHONE_NUMBER, "session_token": session_token, "security_code": security_code},
+            content_type="application/json",
+        )
+        assert response.status_code == 200
+        assert response.json() == {"message": "Security code is valid."}
+
+
+@override_settings(ROOT_URLCONF="phone_verify.async_urls")
+def test_async_views_reject_invalid_payloads(backend):
+    client = AsyncClient()
+    with override_settings(PHONE_VERIFICATION=backend):
+        response = async_to_sync(client.get)("/phone/register")
+        assert response.status_code == 405
+
+        response = async_to_sync(client.post)("/phone/verify", {"phone_number": PHONE_NUMBER})
+        assert response.status_code == 400
+        assert response.json()["session_token"] == ["This field is required."]
+
+
+def test_base_backend_asend_sms_runs_send_sms_in_thread():
+    class SyncOnlyBackend(BaseBackend):
+        def send_sms(self, number, message):
+            self.sent = (number, message)
+
+    backend = SyncOnlyBackend()
+    async_to_sync(backend.asend_sms)(PHONE_NUMBER, "Hello")
+
+    assert backend.sent == (PHONE_NUMBER, "Hello")
+
+
+def test_twilio_asend_sms_uses_async_client(phone_settings, mocker):
+    with phone_settings(BACKEND="phone_verify.backends.twilio.TwilioBackend"):
+        sms_backend = get_sms_backend(PHONE_NUMBER)
+        client = MagicMock()
+        client.messages.create_async = AsyncMock()
+        mocker.patch.object(sms_backend, "_get_async_client", return_value=client)
+
+        async_to_sync(sms_backend.asend_sms)(PHONE_NUMBER, "Hello")
+
+    client.messages.create_async.assert_awaited_once_with(to=PHONE_NUMBER, body="Hello", from_="+14755292729")
+
+
+def test_nexmo_asend_sms_posts_to_sms_api(phone_settings):
+    received = []
+
+    async def sms_json(request):
+        received.append(dict(await request.post()))
+        status = 401 if request.query.get("fail") else 200
+        body = {"message-count": "1", "messages": [{"status": "0", "message-id": "abc123"}]}
+        return web.json_response(body, status=status)
+
+    async def run(sms_backend):
+        app = web.Application()
+        app.router.add_post("/sms/json", sms_json)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        try:
+            sms_backend.sms_url = f"http://127.0.0.1:{port}/sms/json"
+            result = await sms_backend.asend_sms(PHONE_NUMBER, "Hello")
+            sms_backend.sms_url += "?fail=1"
+            with pytest.raises(ClientError):
+                await sms_backend.asend_sms(PHONE_NUMBER, "Hello")
+        finally:
+            from phone_verify.backends.aio import close_aiohttp_session
+
+            await close_aiohttp_session()
+            await runner.cleanup()
+        return result
+
+    with phone_settings(BACKEND="phone_verify.backends.nexmo.NexmoBackend", OPTIONS={"KEY": "fake"}):
+        result = async_to_sync(run)(get_sms_backend(PHONE_NUMBER))
+
+    assert result == "abc123"
+    assert received[0] == {
+        "api_key": "fake",
+        "api_secret": "fake",
+        "from": "+14755292729",
+        "to": PHONE_NUMBER,
+        "text": "Hello",
+    }
+
+
+def test_async_sends_use_the_http_timeout_and_pool_options(phone_settings):
+    async def stalled(request):
+        await asyncio.sleep(5)
+        return web.json_response({})
+
+    async def run(sms_backend):
+        app = web.Application()
+        app.router.add_post("/sms/json", stalled)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        try:
+            from phone_verify.backends.aio import get_aiohttp_session
+
+            session = get_aiohttp_session(**sms_backend._aiohttp_options)
+            assert session.connector.limit == 3
+            assert session.timeout.total is None
+            sms_backend.sms_url = f"http://127.0.0.1:{port}/sms/json"
+            started = time.monotonic()
+            with pytest.raises(asyncio.TimeoutError):
+                await sms_backend.asend_sms(PHONE_NUMBER, "Hello")
+            return time.monotonic() - started
+        finally:
+            from phone_verify.backends.aio import close_aiohttp_session
+
+            await close_aiohttp_session()
+            await runner.cleanup()
+
+    options = {"KEY": "fake", "HTTP_READ_TIMEOUT": 0.2, "HTTP_POOL_SIZE": 3}
+    with phone_settings(BACKEND="phone_verify.backends.nexmo.NexmoBackend", OPTIONS=options):
+        elapsed = async_to_sync(run)(get_sms_backend(PHONE_NUMBER))
+
+    assert elapsed < 2
@@ -1,17 +1,30 @@
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
 from unittest.mock import patch
 
+import jwt
 import pytest
+from asgiref.sync import async_to_sync
 from django.conf import settings
 from django.core.exceptions import ImproperlyConfigured
 from django.test import override_settings
 from django.urls import reverse
+from django.utils import timezone
 from django.utils.module_loading import import_string
+from freezegun import freeze_time
 
+import phone_verify.backends
 from conftest import sandbox_backends
 from phone_verify.backends import get_sms_backend
 from phone_verify.backends.base import BaseBackend
+from phone_verify.backends.bulk import BulkSMSResult, RateLimiter
+from phone_verify.constants import clear_settings
 from phone_verify.models import SMSVerification
-from phone_verify.services import PhoneVerificationService
+from phone_verify.services import PhoneVerificationService, send_security_code_and_generate_session_token
+from tests import test_settings
 
 PHONE_NUMBER = "+13478379634"
 SECURITY_CODE = "123456"
@@ -90,8 +103,7 @@ def test_backends(client, mocker, backend):
 
 
 def test_error_raised_when_no_backend_specified(client, backend):
-    with override_settings(PHONE_VERIFICATION=backend):
-        settings.PHONE_VERIFICATION["BACKEND"] = None
+    with override_settings(PHONE_VERIFICATION={**backend, "BACKEND": None}):
         url = reverse("phone-register")
         phone_number = PHONE_NUMBER
         data = {"phone_number": phone_number}
@@ -109,20 +121,39 @@ def test_send_bulk_sms(client, mocker, backend):
         backend_cls = import_string(backend_import)
         cls_obj = backend_cls(**settings.PHONE_VERIFICATION["OPTIONS"])
 
-        mock_send_sms = mocker.patch(f"{backend_import}.send_sms")
+        mock_send_sms = mocker.patch(f"{backend_import}._send_bulk_message", side_effect=lambda n, m: f"id-{n}")
         numbers = ["+13478379634", "+13478379633", "+13478379632"]
         message = "Fake message"
 
-        cls_obj.send_bulk_sms(numbers, message)
-        assert mock_send_sms.called
+        results = cls_obj.send_bulk_sms(numbers, message)
         assert mock_send_sms.call_count == 3
         mock_send_sms.assert_has_calls(
             [
                 mocker.call(numbers[0], message),
                 mocker.call(numbers[1], message),
                 mocker.call(numbers[2], message),
-            ]
+            ],
+            any_order=True,
         )
+        assert results == [BulkSMSResult(number, success=True, message_id=f"id-{number}") for number in numbers]
+
+
+def test_create_security_codes_and_session_tokens_in_batches(backend, django_assert_num_queries):
+    numbers = ["+13478379634", "+13478379633", "+13478379632"]
+    with override_settings(PHONE_VERIFICATION=backend):
+        SMSVerification.objects.create(phone_number=numbers[0], security_code="111111", session_token="old")
+        sms_backend = get_sms_backend(None)
+
+        # Two batches, one multi-row upsert each.
+        with django_assert_num_queries(2):
+            issued = sms_backend.create_security_codes_and_session_tokens(numbers, batch_size=2)
+
+    assert [number for number, _, _ in issued] == numbers
+    assert SMSVerification.objects.count() == 3
+    for number, security_code, session_token in issued:
+        verification = SMSVerification.objects.get(phone_number=number)
+        assert verification.security_code == security_code
+        assert verification.session_token == session_token
 
 
 def test_send_bulk_sms_with_renamed_send_sms_params():
@@ -142,6 +173,93 @@ def test_send_bulk_sms_with_renamed_send_sms_params():
     assert cls_obj.sent == [(numbers[0], "Fake message"), (numbers[1], "Fake message")]
 
 
+class FlakyBulkBackend(BaseBackend):
+    bulk_max_workers = 4
+
+    def send_sms(self, number, message):
+        if number.endswith("3"):
+            raise ValueError("provider rejected {}".format(number))
+        return "id-{}".format(number)
+
+
+def test_send_bulk_sms_reports_failures_per_number():
+    numbers = ["+13478379634", "+13478379633", "+13478379632"]
+    results = FlakyBulkBackend().send_bulk_sms(numbers, "Fake message")
+
+    assert [result.number for result in results] == numbers
+    assert [result.success for result in results] == [True, False, True]
+    assert [result.message_id for result in results] == ["id-+13478379634", None, "id-+13478379632"]
+    assert isinstance(results[1].error, ValueError)
+    assert results[0].error is None
+
+
+def test_send_bulk_sms_uses_worker_pool_and_options():
+    cls_obj = FlakyBulkBackend(BULK_MAX_WORKERS=3, BULK_RATE_LIMIT=1000)
+    assert cls_obj.bulk_max_workers == 3
+    assert cls_obj.bulk_rate_limit == 1000
+
+    seen_threads = set()
+    barrier = threading.Barrier(3, timeout=5)
+
+    def send_sms(number, message):
+        seen_threads.add(threading.current_thread().name)
+        barrier.wait()
+        return number
+
+    cls_obj.send_sms = send_sms
+    results = cls_obj.send_bulk_sms(["+13478379634", "+13478379632", "+13478379631"], "Fake message")
+
+    assert all(result.success for result in results)
+    assert len(seen_threads) == 3
+
+
+def test_rate_limiter_spaces_calls():
+    now = [0.0]
+    sleeps = []
+
+    def sleep(seconds):
+        sleeps.append(seconds)
+
+    limiter = RateLimiter(4, clock=lambda: now[0], sleep=sleep)
+    for _ in range(3):
+        limiter.wait()
+    assert sleeps == [0.25, 0.5]
+
+    now[0] = 10.0
+    limiter.wait()
+    assert sleeps == [0.25, 0.5]
+
+
+def test_nexmo_send_bulk_sms_treats_non_zero_status_as_failure(mocker):
+    from phone_verify.backends.nexmo import NexmoBackend
+
+    responses = {
+        "+13478379634": {"messages": [{"status": "0", "message-id": "abc"}]},
+        "+13478379633": {"messages": [{"status": "1", "error-text": "Throttled"}]},
+    }
+    mocker.patch(
+        "phone_verify.backends.nexmo.nexmo.Client.send_message",
+        side_effect=lambda params: responses[params["to"]],
+    )
+    cls_obj = NexmoBackend(KEY="fake", SECRET="fake", FROM="+14755292729", BULK_RATE_LIMIT=None)
+
+    results = cls_obj.send_bulk_sms(list(responses), "Fake message")
+
+    assert results[0] == BulkSMSResult("+13478379634", success=True, message_id="abc")
+    assert results[1].success is False
+    assert "Throttled" in str(results[1].error)
+
+
+def test_twilio_send_sms_returns_message_sid(mocker):
+    from phone_verify.backends.twilio import TwilioBackend
+
+    cls_obj = TwilioBackend(SID="fake", SECRET="fake", FROM="+14755292729")
+    mock_create = mocker.patch("phone_verify.backends.twilio.TwilioRestClient.messages")
+    mock_create.create.return_value.sid = "SM123"
+
+    assert cls_obj.send_sms("+13478379634", "Fake message") == "SM123"
+
+
 class TestBaseBackend(BaseBackend):
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
@@ -163,11 +281,8 @@ def test_base_backend_abstract_methods(mocker):
     ("phone_verify.backends.twilio.SMSBackend", "Twilio"),
     ("phone_verify.backends.nexmo.SMSBackend", "Nexmo"),
 ])
-def test_missing_sms_provider_dependency_raises_runtime_error(backend_path, provider):
-    with override_settings(PHONE_VERIFICATION={
-        "BACKEND": backend_path,
-        "OPTIONS": {}
-    }):
+def test_missing_sms_provider_dependency_raises_runtime_error(phone_settings, backend_path, provider):
+    with phone_settings(BACKEND=backend_path):
         with patch("phone_verify.backends.import_string", side_effect=ImportError("No module named")):
             with pytest.raises(RuntimeError) as exc_info:
                 get_sms_backend("+1234567890")
@@ -177,19 +292,14 @@ def test_missing_sms_provider_dependency_raises_runtime_error(backend_path, prov
             )
 
 
-def test_custom_backend_import_error(monkeypatch):
-    settings.PHONE_VERIFICATION = {
-        "BACKEND": "myproject.fake.CustomBackend",
-        "OPTIONS": {}
-    }
-
+def test_custom_backend_import_error(phone_settings, monkeypatch):
     # Ensure import_string fails
     monkeypatch.setattr(
         "phone_verify.backends.import_string",
         lambda path: (_ for _ in ()
     ).throw(ImportError("Mocked ImportError")))
 
-    with pytest.raises(RuntimeError) as excinfo:
+    with phone_settings(BACKEND="myproject.fake.CustomBackend"), pytest.raises(RuntimeError) as excinfo:
         get_sms_backend("+1234567890")
 
     assert "Failed to import the specified backend" in str(excinfo.value)
@@ -198,8 +308,7 @@ def test_custom_backend_import_error(monkeypatch):
 
 def test_brute_force_protection_max_attempts(client, mocker, backend):
     """Test that verification is blocked after MAX_FAILED_ATTEMPTS."""
-    with override_settings(PHONE_VERIFICATION=backend):
-        settings.PHONE_VERIFICATION["MAX_FAILED_ATTEMPTS"] = 3
+    with override_settings(PHONE_VERIFICATION={**backend, "MAX_FAILED_ATTEMPTS": 3}):
         mocker.patch(f"{backend['BACKEND']}.send_sms")
 
         # Register phone number
@@ -239,8 +348,7 @@ def test_brute_force_protection_max_attempts(client, mocker, backend):
 
 def test_brute_force_protection_reset_on_success(client, mocker, backend):
     """Test that failed_attempts resets to 0 on successful verification."""
-    with override_settings(PHONE_VERIFICATION=backend):
-        settings.PHONE_VERIFICATION["MAX_FAILED_ATTEMPTS"] = 5
+    with override_settings(PHONE_VERIFICATION={**backend, "MAX_FAILED_ATTEMPTS": 5}):
         mocker.patch(f"{backend['BACKEND']}.send_sms")
 
         # Register phone number
@@ -285,3 +393,274 @@ def test_min_token_length_validation(backend):
             PhoneVerificationService(phone_number=PHONE_NUMBER)
         assert "TOKEN_LENGTH (4) cannot be less than MIN_TOKEN_LENGTH (6)" in str(exc.value)
 
+
+
+@pytest.fixture(params=["update_returning", "row_lock"])
+def verify_engine(request, mocker, phone_settings):
+    """Run a test against both the ``UPDATE ... RETURNING`` path and the row-lock fallback."""
+    if request.param == "row_lock":
+        mocker.patch("phone_verify.storage._supports_update_returning", return_value=False)
+    with phone_settings(MAX_FAILED_ATTEMPTS=2):
+        yield request.param
+
+
+def test_validate_security_code_statuses(verify_engine):
+    backend = get_sms_backend(PHONE_NUMBER)
+    security_code, session_token = backend.create_security_code_and_session_token(PHONE_NUMBER)
+
+    verification, status = backend.validate_security_code("000000", PHONE_NUMBER, "unknown-token")
+    assert (verification, status) == (None, BaseBackend.SESSION_TOKEN_INVALID)
+
+    verification, status = backend.validate_security_code("000000", PHONE_NUMBER, session_token)
+    assert status == BaseBackend.SECURITY_CODE_INVALID
+    assert verification.failed_attempts == 1
+
+    verification, status = backend.validate_security_code(security_code, PHONE_NUMBER, session_token)
+    assert status == BaseBackend.SECURITY_CODE_VALID
+    assert verification.is_verified is True
+    assert verification.failed_attempts == 0
+
+    with override_settings(PHONE_VERIFICATION={**settings.PHONE_VERIFICATION, "VERIFY_SECURITY_CODE_ONLY_ONCE": True}):
+        verification, status = backend.validate_security_code(security_code, PHONE_NUMBER, session_token)
+        assert status == BaseBackend.SECURITY_CODE_VERIFIED
+        assert verification.failed_attempts == 1
+
+    backend.validate_security_code("000000", PHONE_NUMBER, session_token)
+    verification, status = backend.validate_security_code(security_code, PHONE_NUMBER, session_token)
+    assert status == BaseBackend.SECURITY_CODE_TOO_MANY_ATTEMPTS
+    assert SMSVerification.objects.get(session_token=session_token).failed_attempts == 2
+
+
+def test_validate_security_code_expired(verify_engine):
+    backend = get_sms_backend(PHONE_NUMBER)
+    security_code, session_token = backend.create_security_code_and_session_token(PHONE_NUMBER)
+    SMSVerification.objects.filter(session_token=session_token).update(
+        created_at=timezone.now() - timedelta(seconds=2), expires_at=timezone.now() - timedelta(seconds=1)
+    )
+
+    verification, status = backend.validate_security_code(security_code, PHONE_NUMBER, session_token)
+
+    assert status == BaseBackend.SECURITY_CODE_EXPIRED
+    assert verification.failed_attempts == 1
+    assert verification.is_verified is False
+
+
+def test_validate_security_code_without_expires_at(verify_engine):
+    backend = get_sms_backend(PHONE_NUMBER)
+    with freeze_time(timezone.now()):
+        security_code, session_token = backend.create_security_code_and_session_token(PHONE_NUMBER)
+    verification = SMSVerification.objects.get(session_token=session_token)
+    assert verification.expires_at == verification.created_at + timedelta(seconds=1)
+
+    # Rows issued before `expires_at` was backfilled expire from `created_at`.
+    SMSVerification.objects.filter(session_token=session_token).update(expires_at=None)
+    _, status = backend.validate_security_code(security_code, PHONE_NUMBER, session_token)
+    assert status == BaseBackend.SECURITY_CODE_VALID
+
+    SMSVerification.objects.filter(session_token=session_token).update(
+        is_verified=False, created_at=timezone.now() - timedelta(seconds=2)
+    )
+    _, status = backend.validate_security_code(security_code, PHONE_NUMBER, session_token)
+    assert status == BaseBackend.SECURITY_CODE_EXPIRED
+
+
+def test_failed_verification_uses_single_query(verify_engine, django_assert_num_queries):
+    if verify_engine == "row_lock":
+        pytest.skip("The row-lock fallback needs a SELECT and an UPDATE")
+    backend = get_sms_backend(PHONE_NUMBER)
+    _, session_token = backend.create_security_code_and_session_token(PHONE_NUMBER)
+
+    with django_assert_num_queries(1):
+        _, status = backend.validate_security_code("000000", PHONE_NUMBER, session_token)
+    assert status == BaseBackend.SECURITY_CODE_INVALID
+
+
+def test_get_sms_backend_reuses_instance(backend):
+    with override_settings(PHONE_VERIFICATION=backend):
+        first = get_sms_backend(PHONE_NUMBER)
+        assert get_sms_backend("+13478379633") is first
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            instances = set(map(id, executor.map(get_sms_backend, [PHONE_NUMBER] * 32)))
+        assert instances == {id(first)}
+
+
+def test_get_sms_backend_cache_cleared_on_setting_changed(backend):
+    with override_settings(PHONE_VERIFICATION=backend):
+        first = get_sms_backend(PHONE_NUMBER)
+
+    with override_settings(PHONE_VERIFICATION=backend):
+        assert get_sms_backend(PHONE_NUMBER) is not first
+
+
+def test_get_sms_backend_cache_keyed_by_settings(backend):
+    with override_settings(PHONE_VERIFICATION=backend):
+        first = get_sms_backend(PHONE_NUMBER)
+        # Mutating settings in place does not fire `setting_changed`
+        settings.PHONE_VERIFICATION["OPTIONS"] = {**backend["OPTIONS"], "FROM": "+14755292730"}
+        assert get_sms_backend(PHONE_NUMBER) is first
+        clear_settings()
+        second = get_sms_backend(PHONE_NUMBER)
+
+    assert second is not first
+    assert second._from == "+14755292730"
+
+
+def test_send_security_code_builds_backend_once(backend, mocker):
+    with override_settings(PHONE_VERIFICATION=backend):
+        mocker.patch(f"{backend['BACKEND']}.send_sms")
+        import_backend = mocker.patch(
+            "phone_verify.backends._import_backend", wraps=phone_verify.backends._import_backend
+        )
+        send_security_code_and_generate_session_token(PHONE_NUMBER)
+        send_security_code_and_generate_session_token(PHONE_NUMBER)
+
+    assert import_backend.call_count == 1
+
+
+SECRET_KEY = test_settings.DJANGO_SETTINGS["SECRET_KEY"]
+
+
+@pytest.fixture
+def signed_tokens(phone_settings):
+    with phone_settings(SIGNED_SESSION_TOKENS=True, SECURITY_CODE_EXPIRATION_SECONDS=60):
+        yield
+
+
+def test_signed_session_token_carries_expiry_and_phone_number(signed_tokens):
+    session_token = BaseBackend.generate_session_token(PHONE_NUMBER)
+    payload = jwt.decode(session_token, settings.SECRET_KEY, algorithms=["HS256"])
+
+    assert payload["phone_number"] == PHONE_NUMBER
+    assert payload["exp"] == pytest.approx(time.time() + 60, abs=2)
+
+
+@pytest.mark.parametrize(
+    "session_token",
+    [
+        "garbage",
+        jwt.encode({"phone_number": PHONE_NUMBER, "exp": int(time.time()) + 60}, "wrong-secret-key-" * 2),
+        jwt.encode({"phone_number": "+13478379633", "exp": int(time.time()) + 60}, SECRET_KEY),
+        jwt.encode({"phone_number": PHONE_NUMBER}, SECRET_KEY),
+    ],
+    ids=["garbage", "bad-signature", "other-phone-number", "no-expiry"],
+)
+def test_signed_session_token_rejected_without_queries(signed_tokens, session_token, django_assert_num_queries):
+    backend = get_sms_backend(PHONE_NUMBER)
+    with django_assert_num_queries(0):
+        result = backend.validate_security_code(SECURITY_CODE, PHONE_NUMBER, session_token)
+
+    assert result == (None, BaseBackend.SESSION_TOKEN_INVALID)
+
+
+def test_expired_signed_session_token_rejected_without_queries(signed_tokens, django_assert_num_queries):
+    backend = get_sms_backend(PHONE_NUMBER)
+    security_code, session_token = backend.create_security_code_and_session_token(PHONE_NUMBER)
+
+    with freeze_time(timezone.now() + timedelta(seconds=61)), django_assert_num_queries(0):
+        result = backend.validate_security_code(security_code, PHONE_NUMBER, session_token)
+
+    assert result == (None, BaseBackend.SECURITY_CODE_EXPIRED)
+    assert SMSVerification.objects.get(session_token=session_token).failed_attempts == 0
+
+
+def test_valid_signed_session_token_is_checked_against_the_store(signed_tokens):
+    backend = get_sms_backend(PHONE_NUMBER)
+    security_code, session_token = backend.create_security_code_and_session_token(PHONE_NUMBER)
+
+    _, status = backend.validate_security_code("000000", PHONE_NUMBER, session_token)
+    assert status == BaseBackend.SECURITY_CODE_INVALID
+    _, status = async_to_sync(backend.avalidate_security_code)(security_code, PHONE_NUMBER, session_token)
+    assert status == BaseBackend.SECURITY_CODE_VALID
+
+
+def test_verify_view_reports_expired_signed_session_token(client, signed_tokens):
+    backend = get_sms_backend(PHONE_NUMBER)
+    security_code, session_token = backend.create_security_code_and_session_token(PHONE_NUMBER)
+    data = {"phone_number": PHONE_NUMBER, "security_code": security_code, "session_token": session_token}
+
+    with freeze_time(timezone.now() + timedelta(seconds=61)):
+        response = client.json.post(reverse("phone-verify"), data=data)
+
+    assert response.status_code == 400
+    assert response.json() == {"non_field_errors": ["Security code has expired"]}
+
+
+@pytest.fixture
+def compact_tokens(phone_settings):
+    with phone_settings(SESSION_TOKEN_FORMAT="compact", SECURITY_CODE_EXPIRATION_SECONDS=60):
+        yield
+
+
+def test_compact_session_token_is_fixed_length_and_url_safe(compact_tokens):
+    session_tokens = {BaseBackend.generate_session_token(PHONE_NUMBER) for _ in range(100)}
+
+    assert len(session_tokens) == 100
+    assert all(re.fullmatch(r"[A-Za-z0-9_-]{32}", session_token) for session_token in session_tokens)
+
+
+def test_compact_session_token_is_validated_against_the_store(compact_tokens):
+    backend = get_sms_backend(PHONE_NUMBER)
+    security_code, session_token = backend.create_security_code_and_session_token(PHONE_NUMBER)
+
+    _, status = backend.validate_security_code(security_code, PHONE_NUMBER, "A" * 32)
+    assert status == BaseBackend.SESSION_TOKEN_INVALID
+    _, status = backend.validate_security_code(security_code, PHONE_NUMBER, session_token)
+    assert status == BaseBackend.SECURITY_CODE_VALID
+
+
+@pytest.fixture
+def signed_compact_tokens(phone_settings):
+    with phone_settings(
+        SESSION_TOKEN_FORMAT="compact", SECURITY_CODE_EXPIRATION_SECONDS=60, SIGNED_SESSION_TOKENS=True
+    ):
+        yield
+
+
+def _tamper(session_token):
+    # Flip one bit of the 8-byte nonce, which the MAC covers.
+    return ("B" if session_token[0] == "A" else "A") + session_token[1:]
+
+
+@pytest.mark.parametrize(
+    "session_token",
+    [
+        lambda: "garbage",
+        lambda: "!" * 32,
+        lambda: _tamper(BaseBackend.generate_session_token(PHONE_NUMBER)),
+        lambda: BaseBackend.generate_session_token("+13478379633"),
+        lambda: jwt.encode({"phone_number": PHONE_NUMBER, "exp": int(time.time()) + 60}, SECRET_KEY),
+    ],
+    ids=["garbage", "not-base64", "tampered", "other-phone-number", "jwt"],
+)
+def test_signed_compact_session_token_rejected_without_queries(
+    signed_compact_tokens, session_token, django_assert_num_queries
+):
+    session_token = session_token()
+    backend = get_sms_backend(PHONE_NUMBER)
+    with django_assert_num_queries(0):
+        result = backend.validate_security_code(SECURITY_CODE, PHONE_NUMBER, session_token)
+
+    assert result == (None, BaseBackend.SESSION_TOKEN_INVALID)
+
+
+def test_unsigned_compact_session_token_rejected_when_signing_is_on(compact_tokens):
+    session_token = BaseBackend.generate_session_token(PHONE_NUMBER)
+    with override_settings(PHONE_VERIFICATION={**settings.PHONE_VERIFICATION, "SIGNED_SESSION_TOKENS": True}):
+        result = get_sms_backend(PHONE_NUMBER).validate_security_code(SECURITY_CODE, PHONE_NUMBER, session_token)
+
+    assert result == (None, BaseBackend.SESSION_TOKEN_INVALID)
+
+
+def test_expired_signed_compact_session_token_rejected_without_queries(
+    signed_compact_tokens, django_assert_num_queries
+):
+    backend = get_sms_backend(PHONE_NUMBER)
+    security_code, session_token = backend.create_security_code_and_session_token(PHONE_NUMBER)
+    _, status = backend.validate_security_code("000000", PHONE_NUMBER, session_token)
+    assert status == BaseBackend.SECURITY_CODE_INVALID
+
+    with freeze_time(timezone.now() + timedelta(seconds=61)), django_assert_num_queries(0):
+        result = backend.validate_security_code(security_code, PHONE_NUMBER, session_token)
+
+    assert result == (None, BaseBackend.SECURITY_CODE_EXPIRED)
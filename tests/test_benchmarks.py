@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+
+# Third Party Stuff
+import pytest
+
+# phone_verify Stuff
+from benchmarks.code_hashing import measure_code_checks, measure_verify
+from benchmarks.endpoints import SCENARIOS, find_regressions, run_scenario
+from benchmarks.session_tokens import measure_session_tokens
+from benchmarks.verify_lookup import _phone_number, grow_table, measure
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def benchmark_settings(phone_settings):
+    with phone_settings(BACKEND="benchmarks.backends.NullBackend", VERIFY_SECURITY_CODE_ONLY_ONCE=False):
+        yield
+
+
+# Counted inside the test transaction; standalone runs on SQLite also count
+# the BEGIN around the register upsert.
+@pytest.mark.parametrize("scenario, queries", [("register", 1), ("verify", 1), ("send", 1), ("verify_code", 1)])
+def test_endpoint_benchmark_smoke(benchmark_settings, scenario, queries):
+    assert scenario in SCENARIOS
+    result = run_scenario(scenario, requests=5, concurrency=1)
+
+    assert result["throughput"] > 0
+    assert 0 < result["p50"] <= result["p95"] <= result["p99"]
+    assert result["queries"] == queries
+
+
+def test_find_regressions():
+    baseline = {
+        "register@1": {"p95": 2.0, "throughput": 500.0, "queries": 2.0},
+        "verify@1": {"p95": 1.0, "throughput": 900.0, "queries": 1.0},
+    }
+    results = {
+        "register@1": {"p95": 2.3, "throughput": 450.0, "queries": 2.0},
+        "verify@1": {"p95": 1.5, "throughput": 600.0, "queries": 2.0},
+        "send@1": {"p95": 9.0, "throughput": 1.0, "queries": 9.0},
+    }
+
+    assert find_regressions(results, baseline, max_regression=0.2) == [
+        "verify@1: p95 1.500ms is more than 20% above the baseline 1.000ms",
+        "verify@1: throughput 600.0/s is more than 20% below the baseline 900.0/s",
+        "verify@1: 2.00 queries per request, the baseline ran 1.00",
+    ]
+
+
+def test_code_hashing_benchmark_smoke(benchmark_settings):
+    checks = measure_code_checks(iterations=10, password_hasher_iterations=0)
+
+    assert set(checks) == {"plain", "hmac"}
+    assert checks["hmac"]["bytes"] == 32
+    # Microseconds, not the milliseconds of a password hasher.
+    assert 0 < checks["hmac"]["us"] < 1000
+
+    verify = measure_verify(requests=3)
+    assert set(verify) == {"plain", "hmac"}
+    assert all(result["queries"] == 1 for result in verify.values())
+
+
+def test_session_tokens_benchmark_smoke():
+    results = measure_session_tokens(iterations=10, buffer_size=4)
+
+    assert set(results) == {"legacy", "jwt", "compact"}
+    assert results["compact"]["length"] == 32
+    assert all(result["generate"] > 0 for result in results.values())
+
+
+def test_verify_lookup_benchmark_smoke(benchmark_settings):
+    assert grow_table(20) == 20
+    assert measure(20, samples=5)["p50"] > 0
+
+    # 10-digit national numbers at every default table size.
+    numbers = [_phone_number(index) for index in (0, 7_999_999, 8_000_000, 9_999_999)]
+    assert len(set(numbers)) == 4
+    assert all(len(number) == 12 for number in numbers)
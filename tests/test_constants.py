@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+
+import dataclasses
+
+# Third Party Stuff
+import pytest
+from django.apps import apps
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.test import override_settings
+
+# phone_verify Stuff
+from phone_verify.constants import (
+    DEFAULT_DISPATCHER,
+    DEFAULT_MAX_FAILED_ATTEMPTS,
+    get_security_code_expiration,
+    get_settings,
+)
+
+
+def test_get_settings_is_memoized_and_frozen(phone_settings):
+    with phone_settings(MAX_FAILED_ATTEMPTS=3):
+        validated = get_settings()
+
+        assert get_settings() is validated
+        assert validated.max_failed_attempts == 3
+        assert validated.token_length == 6
+        assert validated.dispatcher == DEFAULT_DISPATCHER
+        assert validated.options["FROM"] == "+14755292729"
+        with pytest.raises(dataclasses.FrozenInstanceError):
+            validated.token_length = 4
+        with pytest.raises(TypeError):
+            validated.options["FROM"] = "+14755292730"
+
+
+def test_get_settings_is_cleared_on_setting_changed(phone_settings):
+    with phone_settings():
+        validated = get_settings()
+        assert validated.max_failed_attempts == DEFAULT_MAX_FAILED_ATTEMPTS
+
+        with phone_settings(MAX_FAILED_ATTEMPTS=2):
+            assert get_settings().max_failed_attempts == 2
+
+        assert get_settings().max_failed_attempts == DEFAULT_MAX_FAILED_ATTEMPTS
+        assert get_settings() is not validated
+
+
+def test_in_place_changes_are_not_picked_up(phone_settings):
+    with phone_settings():
+        get_settings()
+        settings.PHONE_VERIFICATION["SECURITY_CODE_EXPIRATION_SECONDS"] = 30
+
+        assert get_security_code_expiration() == 1
+
+
+@pytest.mark.parametrize(
+    "overrides, message",
+    [
+        (
+            dict(BACKEND=None),
+            "Please specify BACKEND in PHONE_VERIFICATION within your settings",
+        ),
+        (
+            dict(TOKEN_LENGTH=4),
+            "TOKEN_LENGTH (4) cannot be less than MIN_TOKEN_LENGTH (6)",
+        ),
+        (
+            dict(SESSION_TOKEN_FORMAT="uuid"),
+            "SESSION_TOKEN_FORMAT must be one of jwt, compact or an import path, got 'uuid'",
+        ),
+        (
+            dict(STORAGE="phone_verify.storage.RedisVerificationStore"),
+            "Could not import STORAGE 'phone_verify.storage.RedisVerificationStore': "
+            'Module "phone_verify.storage" does not define a "RedisVerificationStore" attribute/class',
+        ),
+        (
+            dict(DISPATCHER="myproject.tasks.CeleryDispatcher"),
+            "Could not import DISPATCHER 'myproject.tasks.CeleryDispatcher': No module named 'myproject'",
+        ),
+        (
+            dict(SESSION_TOKEN_FORMAT="myproject.tokens.UUIDGenerator"),
+            "Could not import SESSION_TOKEN_FORMAT 'myproject.tokens.UUIDGenerator': No module named 'myproject'",
+        ),
+        (
+            dict(METRICS_ENABLED=True, METRICS_EXPORTER="phone_verify.metrics.Statsd"),
+            "Could not import METRICS_EXPORTER 'phone_verify.metrics.Statsd': "
+            'Module "phone_verify.metrics" does not define a "Statsd" attribute/class',
+        ),
+    ],
+    ids=[
+        "empty-backend",
+        "short-token",
+        "unknown-session-token-format",
+        "unknown-storage",
+        "unknown-dispatcher",
+        "unknown-session-token-generator",
+        "unknown-metrics-exporter",
+    ],
+)
+def test_app_ready_fails_on_invalid_settings(phone_settings, overrides, message):
+    with phone_settings(**overrides):
+        with pytest.raises(ImproperlyConfigured) as exc:
+            apps.get_app_config("phone_verify").ready()
+
+    assert str(exc.value) == message
+
+
+def test_app_ready_fails_on_missing_settings():
+    phone_verification_settings = {"BACKEND": "phone_verify.backends.twilio.TwilioBackend", "OPTIONS": {}}
+    with override_settings(PHONE_VERIFICATION=phone_verification_settings):
+        with pytest.raises(ImproperlyConfigured) as exc:
+            apps.get_app_config("phone_verify").ready()
+
+    assert str(exc.value) == (
+        "Please specify following settings in settings.py: APP_NAME, MESSAGE, "
+        "TOKEN_LENGTH, VERIFY_SECURITY_CODE_ONLY_ONCE"
+    )
+
+
+def test_app_ready_skips_metrics_exporter_when_metrics_are_disabled(phone_settings):
+    with phone_settings(METRICS_EXPORTER="phone_verify.metrics.Statsd"):
+        apps.get_app_config("phone_verify").ready()
+
+
+def test_app_ready_fails_without_settings():
+    with override_settings():
+        del settings.PHONE_VERIFICATION
+        with pytest.raises(ImproperlyConfigured) as exc:
+            apps.get_app_config("phone_verify").ready()
+
+    assert str(exc.value) == "Please define PHONE_VERIFICATION in settings"
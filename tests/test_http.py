@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Third Party Stuff
+import pytest
+import requests
+
+# phone_verify Stuff
+from phone_verify.backends import http
+from phone_verify.backends.nexmo import NexmoBackend
+from phone_verify.backends.twilio import TwilioBackend
+
+
+class FakeProviderHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        server = self.server
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        server.requests.append(self.client_address)
+        status = server.statuses.pop(0) if server.statuses else 200
+        time.sleep(server.delay)
+        body = b'{"sid": "SM123"}'
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        if status == 429:
+            self.send_header("Retry-After", server.retry_after)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def provider():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeProviderHandler)
+    server.daemon_threads = True
+    server.requests = []
+    server.statuses = []
+    server.delay = 0
+    server.retry_after = "0"
+    server.url = "http://127.0.0.1:{}/messages".format(server.server_address[1])
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(autouse=True)
+def close_sessions():
+    yield
+    http.close_http_sessions()
+
+
+def test_backends_share_one_session():
+    options = {"SID": "fake", "SECRET": "fake", "KEY": "fake", "FROM": "+15551234567"}
+
+    twilio_session = TwilioBackend(**options).client.http_client.session
+    assert TwilioBackend(**options).client.http_client.session is twilio_session
+    assert NexmoBackend(**options).client.session is twilio_session
+    assert twilio_session.timeout == (http.DEFAULT_CONNECT_TIMEOUT, http.DEFAULT_READ_TIMEOUT)
+
+    tuned = NexmoBackend(**options, HTTP_READ_TIMEOUT=2, HTTP_POOL_SIZE=4).client.session
+    assert tuned is not twilio_session
+    assert tuned.timeout == (http.DEFAULT_CONNECT_TIMEOUT, 2)
+    assert tuned.get_adapter("https://rest.nexmo.com")._pool_maxsize == 4
+
+
+def test_connections_are_reused(provider):
+    session = http.get_http_session()
+    for _ in range(3):
+        assert session.post(provider.url, data={"To": "+13478379634"}).status_code == 200
+
+    assert len(provider.requests) == 3
+    assert len(set(provider.requests)) == 1
+
+
+def test_keep_alive_can_be_disabled(provider):
+    session = http.get_http_session(keep_alive=False)
+    for _ in range(3):
+        session.post(provider.url, data={"To": "+13478379634"})
+
+    assert len(set(provider.requests)) == 3
+
+
+def test_read_timeout_is_applied_and_not_retried(provider):
+    provider.delay = 0.5
+    session = http.get_http_session(read_timeout=0.1)
+
+    started = time.monotonic()
+    with pytest.raises(requests.exceptions.ReadTimeout):
+        session.post(provider.url, data={"To": "+13478379634"})
+
+    assert time.monotonic() - started < 0.5
+    # The request may have been handled, so it is not sent again.
+    assert len(provider.requests) == 1
+
+
+def test_throttled_and_unavailable_responses_are_retried(provider, mocker):
+    mock_sleep = mocker.patch("urllib3.util.retry.time.sleep")
+    provider.statuses = [503, 503]
+    session = http.get_http_session(max_retries=2, backoff_factor=0.01)
+
+    assert session.post(provider.url, data={"To": "+13478379634"}).status_code == 200
+    assert len(provider.requests) == 3
+    assert mock_sleep.called
+
+    provider.requests.clear()
+    provider.statuses = [500]
+    assert session.post(provider.url, data={"To": "+13478379634"}).status_code == 500
+    assert len(provider.requests) == 1
+
+
+def test_retry_after_wait_is_capped(provider, mocker):
+    mock_sleep = mocker.patch("urllib3.util.retry.time.sleep")
+    provider.statuses = [429]
+    provider.retry_after = "3600"
+    session = http.get_http_session(max_retries=1, max_retry_after=2)
+
+    assert session.post(provider.url, data={"To": "+13478379634"}).status_code == 200
+    mock_sleep.assert_any_call(2)
+    assert max(call.args[0] for call in mock_sleep.call_args_list) == 2
+
+
+def test_backoff_is_jittered(mocker):
+    mock_uniform = mocker.patch("phone_verify.backends.http.random.uniform", return_value=0.3)
+    retry = http.JitteredRetry(total=5, backoff_factor=0.5).increment().increment().increment()
+
+    assert retry.get_backoff_time() == 0.3
+    mock_uniform.assert_called_once_with(0, 2.0)
@@ -2,11 +2,13 @@ from datetime import timedelta
 from io import StringIO
 
 import pytest
-from django.core.management import call_command
+from django.core.management import CommandError, call_command
 from django.test import override_settings
 from django.utils import timezone
+from django.utils.module_loading import import_string
 
-from phone_verify.models import SMSVerification
+from phone_verify.management.commands.process_sms_outbox import Command as ProcessSMSOutboxCommand
+from phone_verify.models import SMSDeliveryAttempt, SMSOutbox, SMSVerification
 from tests import factories as f
 
 pytestmark = pytest.mark.django_db
@@ -108,3 +110,203 @@ def test_cleanup_phone_verifications_dry_run(backend):
         assert "DRY RUN" in output
         assert "Would delete 1 verification record(s)" in output
         assert SMSVerification.objects.count() == 1
+
+
+
+def _create_old_verifications(count, days=31):
+    old_date = timezone.now() - timedelta(days=days)
+    verifications = [
+        f.create_verification(
+            security_code=SECURITY_CODE,
+            phone_number=f"+1347837{index:04d}",
+            session_token=f"old-session-token-{index}",
+        )
+        for index in range(count)
+    ]
+    SMSVerification.objects.filter(id__in=[v.id for v in verifications]).update(created_at=old_date)
+    return verifications
+
+
+def test_cleanup_phone_verifications_in_batches(backend, mocker, django_assert_num_queries):
+    mock_sleep = mocker.patch("phone_verify.management.commands.cleanup_phone_verifications.time.sleep")
+    with override_settings(PHONE_VERIFICATION=backend):
+        recent_verification = f.create_verification(
+            security_code=SECURITY_CODE,
+            phone_number=PHONE_NUMBER,
+            session_token=SESSION_TOKEN,
+        )
+        _create_old_verifications(5)
+
+        out = StringIO()
+        # Three batches: select + delete each, and no up-front COUNT(*)
+        with django_assert_num_queries(6):
+            call_command("cleanup_phone_verifications", batch_size=2, sleep_between_batches=0.5, stdout=out)
+
+    output = out.getvalue()
+    assert "Batch 1: deleted 2 record(s), 2 so far" in output
+    assert "Batch 3: deleted 1 record(s), 5 so far" in output
+    assert "Successfully deleted 5 verification record(s) older than 30 days in 3 batch(es)" in output
+    assert mock_sleep.call_args_list == [mocker.call(0.5), mocker.call(0.5)]
+    assert list(SMSVerification.objects.values_list("id", flat=True)) == [recent_verification.id]
+
+
+def test_cleanup_phone_verifications_stops_at_max_runtime_and_resumes(backend, mocker):
+    mocker.patch(
+        "phone_verify.management.commands.cleanup_phone_verifications.time.monotonic",
+        side_effect=[0.0, 5.0, 11.0],
+    )
+    with override_settings(PHONE_VERIFICATION=backend):
+        _create_old_verifications(5)
+
+        out = StringIO()
+        call_command("cleanup_phone_verifications", batch_size=2, max_runtime=10, stdout=out)
+
+        assert "Stopped after reaching --max-runtime of 10s with 4 record(s) deleted" in out.getvalue()
+        assert SMSVerification.objects.count() == 1
+
+        mocker.patch("phone_verify.management.commands.cleanup_phone_verifications.time.monotonic", return_value=0.0)
+        out = StringIO()
+        call_command("cleanup_phone_verifications", batch_size=2, max_runtime=10, stdout=out)
+
+        assert "Successfully deleted 1 verification record(s) older than 30 days in 1 batch(es)" in out.getvalue()
+        assert SMSVerification.objects.count() == 0
+
+
+def test_cleanup_phone_verifications_rejects_invalid_batch_size(backend):
+    with override_settings(PHONE_VERIFICATION=backend):
+        with pytest.raises(CommandError, match="--batch-size must be a positive integer"):
+            call_command("cleanup_phone_verifications", batch_size=0, stdout=StringIO())
+
+
+def test_cleanup_phone_verifications_expired(backend):
+    with override_settings(PHONE_VERIFICATION=backend):
+        live_verification = f.create_verification(
+            security_code=SECURITY_CODE,
+            phone_number=PHONE_NUMBER,
+            session_token=SESSION_TOKEN,
+        )
+        SMSVerification.objects.filter(id=live_verification.id).update(
+            expires_at=timezone.now() + timedelta(minutes=10)
+        )
+        expired_verification = f.create_verification(
+            security_code=SECURITY_CODE,
+            phone_number="+13478379633",
+            session_token=SESSION_TOKEN,
+        )
+        SMSVerification.objects.filter(id=expired_verification.id).update(
+            expires_at=timezone.now() - timedelta(seconds=1)
+        )
+
+        out = StringIO()
+        call_command("cleanup_phone_verifications", expired=True, dry_run=True, stdout=out)
+        assert "DRY RUN: Would delete 1 verification record(s) that have expired" in out.getvalue()
+
+        out = StringIO()
+        call_command("cleanup_phone_verifications", expired=True, stdout=out)
+
+    assert "Successfully deleted 1 verification record(s) that have expired" in out.getvalue()
+    assert list(SMSVerification.objects.values_list("id", flat=True)) == [live_verification.id]
+
+
+def test_cleanup_phone_verifications_expired_rejects_days(backend):
+    with override_settings(PHONE_VERIFICATION=backend):
+        with pytest.raises(CommandError, match="--expired and --days cannot be used together"):
+            call_command("cleanup_phone_verifications", expired=True, days=30, stdout=StringIO())
+
+def test_process_sms_outbox_sends_pending_messages(backend, mocker):
+    with override_settings(PHONE_VERIFICATION=backend):
+        mock_send_sms = mocker.patch(f"{backend['BACKEND']}._send_bulk_message")
+        outbox = SMSOutbox.objects.create(phone_number=PHONE_NUMBER, message="Your code is 123456")
+        already_sent = SMSOutbox.objects.create(
+            phone_number="+13478379633", message="Your code is 654321", status=SMSOutbox.STATUS_SENT
+        )
+
+        out = StringIO()
+        call_command("process_sms_outbox", stdout=out)
+
+    assert "Sent 1 message(s), 0 failed attempt(s)" in out.getvalue()
+    mock_send_sms.assert_called_once_with(PHONE_NUMBER, "Your code is 123456")
+    outbox.refresh_from_db()
+    assert outbox.status == SMSOutbox.STATUS_SENT
+    assert outbox.attempts == 1
+    assert outbox.sent_at is not None
+    assert outbox.message == ""
+    already_sent.refresh_from_db()
+    assert already_sent.attempts == 0
+
+
+def test_process_sms_outbox_records_failures(backend, mocker):
+    with override_settings(PHONE_VERIFICATION=backend):
+        mocker.patch(f"{backend['BACKEND']}._send_bulk_message", side_effect=RuntimeError("provider down"))
+        outbox = SMSOutbox.objects.create(phone_number=PHONE_NUMBER, message="Your code is 123456")
+
+        call_command("process_sms_outbox", stdout=StringIO(), stderr=StringIO())
+        outbox.refresh_from_db()
+        assert outbox.status == SMSOutbox.STATUS_PENDING
+        assert outbox.attempts == 1
+        assert outbox.last_error == "provider down"
+        assert outbox.message == "Your code is 123456"
+
+        call_command("process_sms_outbox", max_attempts=2, stdout=StringIO(), stderr=StringIO())
+        outbox.refresh_from_db()
+        assert outbox.status == SMSOutbox.STATUS_FAILED
+        assert outbox.attempts == 2
+        assert outbox.message == ""
+
+
+def test_process_sms_outbox_claims_are_exclusive(backend):
+    with override_settings(PHONE_VERIFICATION=backend):
+        outboxes = [
+            SMSOutbox.objects.create(phone_number=f"+1347837963{index}", message="Your code is 123456")
+            for index in range(3)
+        ]
+        worker, other_worker = ProcessSMSOutboxCommand(), ProcessSMSOutboxCommand()
+
+        token, claimed = worker.claim_batch(2)
+        other_token, other_claimed = other_worker.claim_batch(10)
+        assert token != other_token
+        assert [outbox.pk for outbox in claimed] == [outboxes[0].pk, outboxes[1].pk]
+        assert [outbox.pk for outbox in other_claimed] == [outboxes[2].pk]
+        assert other_worker.claim_batch(10)[1] == []
+
+        # Claims of a worker that died are taken over once the lease runs out.
+        SMSOutbox.objects.filter(claim_token=token).update(claimed_at=timezone.now() - timedelta(seconds=301))
+        retaken = other_worker.claim_batch(10, lease_seconds=300)[1]
+        assert {outbox.pk for outbox in retaken} == {outboxes[0].pk, outboxes[1].pk}
+
+
+def test_process_sms_outbox_batches_sends_and_records_attempts(backend, mocker, django_assert_num_queries):
+    with override_settings(PHONE_VERIFICATION=backend):
+        backend_cls = import_string(backend["BACKEND"])
+
+        def send(number, message):
+            if number.endswith("1"):
+                raise RuntimeError("provider down")
+            return f"SM{number[-1]}"
+
+        mocker.patch.object(backend_cls, "_send_bulk_message", side_effect=send)
+        mock_send_bulk_messages = mocker.spy(backend_cls, "send_bulk_messages")
+        outboxes = [
+            SMSOutbox.objects.create(phone_number=f"+1347837963{index}", message="Your code is 123456")
+            for index in range(3)
+        ]
+        # Claim (select + update), read the claimed rows, then store the
+        # attempts and outcomes (insert + 2 updates); plus 2 savepoints.
+        with django_assert_num_queries(10):
+            sent, failed = ProcessSMSOutboxCommand(stderr=StringIO()).process_batch(10, max_attempts=5)
+
+    assert (sent, failed) == (2, 1)
+    assert mock_send_bulk_messages.call_count == 1
+    statuses = {outbox.pk: outbox.status for outbox in SMSOutbox.objects.all()}
+    assert statuses == {
+        outboxes[0].pk: SMSOutbox.STATUS_SENT,
+        outboxes[1].pk: SMSOutbox.STATUS_PENDING,
+        outboxes[2].pk: SMSOutbox.STATUS_SENT,
+    }
+    assert not SMSOutbox.objects.filter(claim_token__isnull=False).exists()
+    attempts = {attempt.outbox_id: attempt for attempt in SMSDeliveryAttempt.objects.all()}
+    assert attempts[outboxes[0].pk].success
+    assert attempts[outboxes[0].pk].provider_message_id == "SM0"
+    assert attempts[outboxes[0].pk].backend == backend["BACKEND"]
+    assert not attempts[outboxes[1].pk].success
+    assert attempts[outboxes[1].pk].error == "provider down"
@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+
+from datetime import timedelta
+from unittest.mock import AsyncMock
+
+# Third Party Stuff
+import pytest
+from asgiref.sync import async_to_sync
+from django.utils import timezone
+
+# phone_verify Stuff
+from phone_verify import metrics
+from phone_verify.backends import get_sms_backend
+from phone_verify.models import SMSOutbox, SMSVerification
+from phone_verify.services import (
+    asend_security_code_and_generate_session_token,
+    send_security_code_and_generate_session_token,
+    verify_security_code,
+)
+from tests import factories as f
+
+pytestmark = pytest.mark.django_db
+
+PHONE_NUMBER = "+13478379634"
+BACKEND = "phone_verify.backends.twilio.TwilioBackend"
+
+
+@pytest.fixture
+def exporter(phone_settings):
+    with phone_settings(METRICS_ENABLED=True):
+        yield metrics.get_metrics_exporter()
+
+
+def test_metrics_are_disabled_by_default(phone_settings, mocker):
+    mock_perf_counter = mocker.patch("phone_verify.metrics.time.perf_counter")
+
+    with phone_settings():
+        assert metrics.get_metrics_exporter() is None
+        assert metrics.timed(metrics.STORAGE_SECONDS, operation="validate_security_code") is metrics._NOOP
+        with metrics.time_send_sms(object()):
+            pass
+        metrics.record_verify_outcome(metrics.constants.SECURITY_CODE_VALID)
+
+    assert not mock_perf_counter.called
+
+
+def test_register_and_verify_are_instrumented(exporter, mocker):
+    assert isinstance(exporter, metrics.InMemoryExporter)
+    mocker.patch(f"{BACKEND}.send_sms", return_value="SM123")
+
+    session_token = send_security_code_and_generate_session_token(PHONE_NUMBER)
+    security_code = SMSVerification.objects.get().security_code
+    verify_security_code(PHONE_NUMBER, "000000", session_token)
+    verify_security_code(PHONE_NUMBER, security_code, session_token)
+    verify_security_code(PHONE_NUMBER, security_code, "unknown-token")
+
+    assert len(exporter.observations(metrics.SEND_SMS_SECONDS, backend="TwilioBackend")) == 1
+    create_seconds = exporter.observations(
+        metrics.STORAGE_SECONDS, operation="create_security_code_and_session_token"
+    )
+    assert len(create_seconds) == 1
+    assert create_seconds[0] > 0
+    assert len(exporter.observations(metrics.STORAGE_SECONDS, operation="validate_security_code")) == 3
+    assert exporter.count(metrics.VERIFY_TOTAL, status="SECURITY_CODE_INVALID") == 1
+    assert exporter.count(metrics.VERIFY_TOTAL, status="SECURITY_CODE_VALID") == 1
+    assert exporter.count(metrics.VERIFY_TOTAL, status="SESSION_TOKEN_INVALID") == 1
+    assert exporter.count(metrics.VERIFY_TOTAL, status="SECURITY_CODE_EXPIRED") == 0
+
+
+def test_async_register_and_bulk_sends_are_instrumented(exporter, mocker):
+    mocker.patch(f"{BACKEND}.asend_sms", new_callable=AsyncMock)
+    mocker.patch(f"{BACKEND}.send_sms")
+
+    async_to_sync(asend_security_code_and_generate_session_token)(PHONE_NUMBER)
+    get_sms_backend(PHONE_NUMBER).send_bulk_sms(["+13478379633", "+13478379632"], "Hello")
+
+    assert len(exporter.observations(metrics.SEND_SMS_SECONDS, backend="TwilioBackend")) == 3
+    assert len(exporter.observations(
+        metrics.STORAGE_SECONDS, operation="create_security_code_and_session_token"
+    )) == 1
+
+
+def test_gauges_are_computed_when_read(exporter, django_assert_num_queries):
+    SMSOutbox.objects.create(phone_number=PHONE_NUMBER, message="Your code is 123456")
+    SMSOutbox.objects.create(phone_number=PHONE_NUMBER, message="Your code is 654321", status=SMSOutbox.STATUS_SENT)
+    f.create_verification(security_code="123456", phone_number=PHONE_NUMBER, session_token="live")
+    expired = f.create_verification(security_code="123456", phone_number="+13478379633", session_token="expired")
+    SMSVerification.objects.filter(id=expired.id).update(expires_at=timezone.now() - timedelta(hours=1))
+
+    with django_assert_num_queries(2):
+        assert exporter.gauge(metrics.OUTBOX_DEPTH) == 1
+        assert exporter.gauge(metrics.LIVE_VERIFICATIONS) == 1
+
+
+class RecordingExporter(metrics.BaseMetricsExporter):
+    def __init__(self, **options):
+        super().__init__(**options)
+        self.options = options
+        self.events = []
+
+    def observe(self, name, value, labels):
+        self.events.append(("observe", name, labels))
+
+    def increment(self, name, labels, amount=1):
+        self.events.append(("increment", name, labels))
+
+    def register_gauge(self, name, callback):
+        self.events.append(("gauge", name, {}))
+
+
+def test_custom_exporter(phone_settings):
+    with phone_settings(
+        METRICS_ENABLED=True,
+        METRICS_EXPORTER="tests.test_metrics.RecordingExporter",
+        METRICS_EXPORTER_OPTIONS={"PREFIX": "otp"},
+    ):
+        exporter = metrics.get_metrics_exporter()
+        metrics.record_verify_outcome(metrics.constants.SECURITY_CODE_EXPIRED)
+
+    assert exporter.options == {"PREFIX": "otp"}
+    assert exporter.events == [
+        ("gauge", metrics.OUTBOX_DEPTH, {}),
+        ("gauge", metrics.LIVE_VERIFICATIONS, {}),
+        ("increment", metrics.VERIFY_TOTAL, {"status": "SECURITY_CODE_EXPIRED"}),
+    ]
+
+
+def test_prometheus_exporter(phone_settings, mocker):
+    prometheus_client = pytest.importorskip("prometheus_client")
+    registry = prometheus_client.CollectorRegistry()
+    mocker.patch("tests.test_metrics.REGISTRY", registry, create=True)
+
+    options = {"REGISTRY": "tests.test_metrics.REGISTRY", "BUCKETS": [0.1, 1.0]}
+    with phone_settings(
+        METRICS_ENABLED=True,
+        METRICS_EXPORTER="phone_verify.metrics.PrometheusExporter",
+        METRICS_EXPORTER_OPTIONS=options,
+    ):
+        metrics.record_verify_outcome(metrics.constants.SECURITY_CODE_VALID)
+        with metrics.timed(metrics.STORAGE_SECONDS, operation="validate_security_code"):
+            pass
+
+    assert registry.get_sample_value("phone_verify_verify_total", {"status": "SECURITY_CODE_VALID"}) == 1
+    assert registry.get_sample_value(
+        "phone_verify_storage_seconds_count", {"operation": "validate_security_code"}
+    ) == 1
+    assert registry.get_sample_value("phone_verify_outbox_depth") == 0
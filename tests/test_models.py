@@ -1,10 +1,14 @@
 from datetime import timedelta
+from importlib import import_module
 
 import pytest
+from django.apps import apps as django_apps
+from django.db import connection
 from django.test import override_settings
 from django.utils import timezone
 from freezegun import freeze_time
 
+from phone_verify.models import SMSVerification
 from tests import factories as f
 
 pytestmark = pytest.mark.django_db
@@ -113,3 +117,63 @@ def test_sms_verification_new_setting_takes_precedence(backend):
         with freeze_time(future_time):
             # Should use the new setting (1 second), so should be expired
             assert sms_verification.is_expired is True
+
+
+@freeze_time("2026-01-01 12:00:00")
+def test_sms_verification_stores_expires_at(backend):
+    backend_copy = backend.copy()
+    backend_copy["SECURITY_CODE_EXPIRATION_SECONDS"] = 300
+
+    with override_settings(PHONE_VERIFICATION=backend_copy):
+        sms_verification = f.create_verification(
+            security_code=SECURITY_CODE,
+            phone_number=PHONE_NUMBER,
+            session_token=SESSION_TOKEN,
+        )
+
+    assert sms_verification.expires_at == sms_verification.created_at + timedelta(seconds=300)
+
+
+def test_sms_verification_live_and_expired_querysets(backend):
+    with override_settings(PHONE_VERIFICATION=backend):
+        live = f.create_verification(security_code=SECURITY_CODE, phone_number=PHONE_NUMBER, session_token="live")
+        expired = f.create_verification(
+            security_code=SECURITY_CODE, phone_number="+13478379633", session_token="expired"
+        )
+    SMSVerification.objects.filter(id=live.id).update(expires_at=timezone.now() + timedelta(minutes=5))
+    SMSVerification.objects.filter(id=expired.id).update(expires_at=timezone.now() - timedelta(minutes=5))
+
+    assert list(SMSVerification.objects.live()) == [live]
+    assert list(SMSVerification.objects.expired()) == [expired]
+    assert list(SMSVerification.objects.live(now=timezone.now() + timedelta(minutes=10))) == []
+    assert '"expires_at" >=' in str(SMSVerification.objects.live().query)
+
+
+def test_sms_verification_without_expires_at_expires_from_created_at(backend):
+    with override_settings(PHONE_VERIFICATION=backend):
+        sms_verification = f.create_verification(
+            security_code=SECURITY_CODE,
+            phone_number=PHONE_NUMBER,
+            session_token=SESSION_TOKEN,
+        )
+        sms_verification.expires_at = None
+
+        assert sms_verification.get_expires_at() == sms_verification.created_at + timedelta(seconds=1)
+        with freeze_time(sms_verification.created_at + timedelta(seconds=2)):
+            assert sms_verification.is_expired is True
+
+
+def test_backfill_expires_at_migration(backend, mocker):
+    backfill = import_module("phone_verify.migrations.0009_backfill_smsverification_expires_at")
+    mocker.patch.object(backfill, "BATCH_SIZE", 2)
+    with override_settings(PHONE_VERIFICATION=backend):
+        for index in range(5):
+            f.create_verification(
+                security_code=SECURITY_CODE, phone_number=f"+1347837963{index}", session_token=SESSION_TOKEN
+            )
+        SMSVerification.objects.update(expires_at=None)
+
+        backfill.backfill_expires_at(django_apps, connection.schema_editor())
+
+    for sms_verification in SMSVerification.objects.all():
+        assert sms_verification.expires_at == sms_verification.created_at + timedelta(seconds=1)
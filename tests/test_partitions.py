@@ -0,0 +1,278 @@
+# -*- coding: utf-8 -*-
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from datetime import timezone as dt_timezone
+from io import StringIO
+
+# Third Party Stuff
+import pytest
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import override_settings
+from freezegun import freeze_time
+
+# phone_verify Stuff
+from phone_verify.backends import get_sms_backend
+from phone_verify.backends.base import BaseBackend
+from phone_verify.models import SMSVerification
+from phone_verify.partitions import (
+    LOOKUP_INDEX,
+    FallbackPartitionManager,
+    PostgresPartitionManager,
+    get_partition_manager,
+)
+from phone_verify.storage import ADVISORY_LOCK_NAMESPACE, get_verification_store
+from tests import factories as f
+
+pytestmark = pytest.mark.django_db
+
+PHONE_NUMBER = "+13478379634"
+NOW = datetime(2026, 3, 10, 12, 0, tzinfo=dt_timezone.utc)
+
+
+@pytest.fixture
+def partitioned_store(phone_settings):
+    with phone_settings(
+        STORAGE="phone_verify.storage.PartitionedModelVerificationStore",
+        STORAGE_OPTIONS={"PRECREATE_DAYS": 3},
+        RECORD_RETENTION_DAYS=2,
+    ):
+        yield get_verification_store()
+
+
+def _create_verification(index, created_at):
+    verification = f.create_verification(
+        security_code="123456",
+        phone_number=f"+1347837{index:04d}",
+        session_token=f"session-token-{index}",
+    )
+    SMSVerification.objects.filter(id=verification.id).update(created_at=created_at)
+    return verification
+
+
+def test_partitioned_store_replaces_previous_code_without_upsert(partitioned_store, django_assert_num_queries):
+    assert partitioned_store.partitioned is True
+    assert partitioned_store.precreate_days == 3
+    backend = get_sms_backend(PHONE_NUMBER)
+    backend.create_security_code_and_session_token(PHONE_NUMBER)
+
+    # SAVEPOINT, DELETE, INSERT, RELEASE
+    with django_assert_num_queries(4):
+        security_code, session_token = backend.create_security_code_and_session_token(PHONE_NUMBER)
+
+    assert SMSVerification.objects.get().session_token == session_token
+    _, status = backend.validate_security_code(security_code, PHONE_NUMBER, session_token)
+    assert status == BaseBackend.SECURITY_CODE_VALID
+
+
+def test_fallback_manager_drops_whole_days(partitioned_store):
+    manager = get_partition_manager()
+    assert isinstance(manager, FallbackPartitionManager)
+    _create_verification(1, NOW - timedelta(days=3, hours=1))
+    older_on_cutoff_day = _create_verification(2, NOW - timedelta(days=2, hours=11))
+    newer_on_cutoff_day = _create_verification(3, NOW - timedelta(days=2, hours=1))
+    recent = _create_verification(4, NOW)
+
+    assert manager.partition_days() == [date(2026, 3, 7), date(2026, 3, 8), date(2026, 3, 10)]
+    assert manager.create_partitions(NOW.date(), 3) == []
+
+    # The cutoff (2026-03-08 12:00) falls inside the 8th, so that day is kept.
+    dropped = manager.drop_partitions_before(NOW - timedelta(days=2))
+
+    assert dropped == ["sms_verification_p20260307"]
+    assert set(SMSVerification.objects.values_list("id", flat=True)) == {
+        older_on_cutoff_day.id,
+        newer_on_cutoff_day.id,
+        recent.id,
+    }
+
+
+def test_cleanup_drops_partitions(partitioned_store):
+    _create_verification(1, NOW - timedelta(days=4))
+    _create_verification(2, NOW - timedelta(days=3))
+    _create_verification(3, NOW)
+
+    with freeze_time(NOW):
+        out = StringIO()
+        call_command("cleanup_phone_verifications", dry_run=True, stdout=out)
+        assert "DRY RUN: Would drop 2 partition(s)" in out.getvalue()
+        assert SMSVerification.objects.count() == 3
+
+        out = StringIO()
+        call_command("cleanup_phone_verifications", stdout=out)
+        output = out.getvalue()
+        assert "  - sms_verification_p20260306\n  - sms_verification_p20260307\n" in output
+        assert "Successfully dropped 2 partition(s) older than 2 days" in output
+        assert SMSVerification.objects.count() == 1
+
+        out = StringIO()
+        call_command("cleanup_phone_verifications", stdout=out)
+        assert "No partitions with only records older than 2 days found" in out.getvalue()
+
+
+def test_create_partitions_command(partitioned_store):
+    out = StringIO()
+    call_command("create_phone_verification_partitions", stdout=out)
+
+    assert "Created 0 partition(s) for the next 3 day(s)" in out.getvalue()
+
+    with pytest.raises(CommandError, match="--days must be a positive integer"):
+        call_command("create_phone_verification_partitions", days=0, stdout=StringIO())
+
+
+def test_create_partitions_command_requires_partitioned_store(backend):
+    with override_settings(PHONE_VERIFICATION=backend):
+        with pytest.raises(CommandError, match="PartitionedModelVerificationStore"):
+            call_command("create_phone_verification_partitions", stdout=StringIO())
+
+
+@pytest.fixture
+def postgres_manager(mocker):
+    manager = PostgresPartitionManager("default")
+    executed = []
+    manager.partitions = ["sms_verification_p20260307", "sms_verification_p20260310", "other_p20260308"]
+    manager.default_rows = []
+
+    def execute(sql, params=None):
+        executed.append(sql)
+        if "pg_inherits" in sql:
+            return [(name,) for name in manager.partitions]
+        if sql.startswith('SELECT 1 FROM "sms_verification_default"'):
+            return manager.default_rows
+        return []
+
+    mocker.patch.object(manager, "_execute", side_effect=execute)
+    manager.executed = executed
+    return manager
+
+
+def test_postgres_manager_creates_missing_partitions(postgres_manager):
+    assert postgres_manager.partition_days() == [date(2026, 3, 7), date(2026, 3, 10)]
+
+    created = postgres_manager.create_partitions(date(2026, 3, 10), 2)
+
+    assert created == ["sms_verification_p20260311"]
+    assert (
+        'CREATE TABLE IF NOT EXISTS "sms_verification_default" PARTITION OF "sms_verification" DEFAULT'
+        in postgres_manager.executed
+    )
+    assert postgres_manager.executed[-1] == (
+        'CREATE TABLE IF NOT EXISTS "sms_verification_p20260311" PARTITION OF "sms_verification" '
+        "FOR VALUES FROM ('2026-03-11T00:00:00+00:00') TO ('2026-03-12T00:00:00+00:00')"
+    )
+
+
+def test_postgres_manager_detaches_and_drops_expired_partitions(postgres_manager):
+    dropped = postgres_manager.drop_partitions_before(datetime(2026, 3, 9, 6, 0, tzinfo=dt_timezone.utc))
+
+    assert dropped == ["sms_verification_p20260307"]
+    assert postgres_manager.executed[-2:] == [
+        'ALTER TABLE "sms_verification" DETACH PARTITION "sms_verification_p20260307"',
+        'DROP TABLE "sms_verification_p20260307"',
+    ]
+
+
+def test_postgres_manager_moves_rows_out_of_the_default_partition(postgres_manager):
+    postgres_manager.default_rows = [(1,)]
+
+    created = postgres_manager.create_partitions(date(2026, 3, 11), 1)
+
+    assert created == ["sms_verification_p20260311"]
+    assert postgres_manager.executed[-3:] == [
+        'CREATE TABLE "sms_verification_p20260311" (LIKE "sms_verification" INCLUDING DEFAULTS)',
+        'WITH moved AS (DELETE FROM "sms_verification_default" WHERE created_at >= %s AND created_at < %s '
+        'RETURNING *) INSERT INTO "sms_verification_p20260311" SELECT * FROM moved',
+        'ALTER TABLE "sms_verification" ATTACH PARTITION "sms_verification_p20260311" '
+        "FOR VALUES FROM ('2026-03-11T00:00:00+00:00') TO ('2026-03-12T00:00:00+00:00')",
+    ]
+
+
+def test_postgres_manager_cleans_up_the_default_partition(postgres_manager):
+    postgres_manager.partitions.append("sms_verification_default")
+
+    dropped = postgres_manager.drop_partitions_before(datetime(2026, 3, 9, 6, 0, tzinfo=dt_timezone.utc))
+
+    assert dropped == ["sms_verification_p20260307"]
+    assert 'DELETE FROM "sms_verification_default" WHERE created_at < %s' in postgres_manager.executed
+
+
+requires_postgresql = pytest.mark.skipif(
+    connection.vendor != "postgresql",
+    reason="needs PostgreSQL: set PHONE_VERIFY_TEST_DATABASE=postgresql",
+)
+
+
+@pytest.fixture
+def converted_table(partitioned_store):
+    # DDL is transactional on PostgreSQL, so the conversion is rolled back with the test.
+    manager = get_partition_manager()
+    with freeze_time(NOW):
+        manager.convert(precreate_days=2)
+    return manager
+
+
+def _partition_of(verification):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT tableoid::regclass::text FROM sms_verification WHERE id = %s", [verification.id])
+        return cursor.fetchone()[0]
+
+
+@requires_postgresql
+def test_postgres_convert_and_default_partition(converted_table):
+    assert converted_table.is_partitioned()
+    assert converted_table.partition_days() == [date(2026, 3, 10), date(2026, 3, 11)]
+
+    # No partition for the 14th yet: the row lands in the default partition...
+    with freeze_time(NOW + timedelta(days=4)):
+        backend = get_sms_backend(PHONE_NUMBER)
+        security_code, session_token = backend.create_security_code_and_session_token(PHONE_NUMBER)
+    verification = SMSVerification.objects.get()
+    assert _partition_of(verification) == "sms_verification_default"
+
+    # ...until the partition is created, which moves it there.
+    assert converted_table.create_partitions(date(2026, 3, 14), 1) == ["sms_verification_p20260314"]
+    assert _partition_of(verification) == "sms_verification_p20260314"
+
+    converted_table.drop_partitions_before(NOW + timedelta(days=5))
+    assert not SMSVerification.objects.exists()
+
+
+@requires_postgresql
+def test_postgres_convert_indexes_the_verify_lookup(converted_table):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT indexdef FROM pg_indexes WHERE tablename = %s AND indexname = %s",
+            ["sms_verification", LOOKUP_INDEX.name],
+        )
+        (indexdef,) = cursor.fetchone()
+        assert "(phone_number, session_token)" in indexdef
+
+        # Partitions created later inherit the index.
+        converted_table.create_partitions(date(2026, 3, 14), 1)
+        cursor.execute(
+            "SELECT COUNT(*) FROM pg_indexes WHERE tablename = %s AND indexdef LIKE %s",
+            ["sms_verification_p20260314", "%(phone_number, session_token)%"],
+        )
+        assert cursor.fetchone()[0] == 1
+
+
+@requires_postgresql
+def test_postgres_partitioned_save_locks_the_phone_number(converted_table, partitioned_store):
+    partitioned_store.save(PHONE_NUMBER, "123456", "session-token")
+
+    def try_lock():
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT pg_try_advisory_lock(hashtext(%s), hashtext(%s))",
+                    [ADVISORY_LOCK_NAMESPACE, PHONE_NUMBER],
+                )
+                return cursor.fetchone()[0]
+        finally:
+            connection.close()
+
+    # Held by this test's transaction until it ends, so a concurrent save would wait.
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        assert executor.submit(try_lock).result() is False
+    assert SMSVerification.objects.filter(phone_number=PHONE_NUMBER).count() == 1
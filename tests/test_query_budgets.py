@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+
+import logging
+from datetime import timedelta
+from io import StringIO
+
+# Third Party Stuff
+import pytest
+from django.contrib import admin
+from django.contrib.admin.templatetags.admin_list import result_list
+from django.contrib.auth.models import User
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.management import call_command
+from django.http import HttpResponse
+from django.test import RequestFactory, override_settings
+from django.utils import timezone
+
+# phone_verify Stuff
+from phone_verify.admin import SMSVerificationAdmin
+from phone_verify.backends import get_sms_backend
+from phone_verify.diagnostics import (
+    QUERY_BUDGETS,
+    QueryBudgetExceeded,
+    QueryCountMiddleware,
+    QueryRecorder,
+    query_budget,
+)
+from phone_verify.models import SMSVerification
+
+pytestmark = pytest.mark.django_db
+
+PHONE_NUMBER = "+13478379634"
+SESSION_TOKEN = "phone-auth-session-token"
+
+
+@pytest.fixture
+def sms_backend(phone_settings):
+    with phone_settings(
+        SECURITY_CODE_EXPIRATION_SECONDS=600, VERIFY_SECURITY_CODE_ONLY_ONCE=True, MAX_FAILED_ATTEMPTS=2
+    ):
+        yield get_sms_backend(PHONE_NUMBER)
+
+
+def _create_verification(security_code="123456", **fields):
+    return SMSVerification.objects.create(
+        phone_number=PHONE_NUMBER, security_code=security_code, session_token=SESSION_TOKEN, **fields
+    )
+
+
+def _validate(sms_backend, status_name, security_code="123456", session_token=SESSION_TOKEN):
+    name = f"validate_security_code.{status_name}"
+    with query_budget(name) as recorder:
+        _, status = sms_backend.validate_security_code(security_code, PHONE_NUMBER, session_token)
+    assert status == getattr(sms_backend, status_name)
+    return recorder
+
+
+def test_create_security_code_and_session_token_budget(sms_backend):
+    _create_verification()
+
+    with query_budget("create_security_code_and_session_token") as recorder:
+        sms_backend.create_security_code_and_session_token(PHONE_NUMBER)
+
+    statements = [query["sql"] for query in recorder.queries if query["sql"] != "BEGIN"]
+    assert len(statements) == 1
+    assert statements[0].startswith('INSERT INTO "sms_verification"')
+    assert "ON CONFLICT" in statements[0]
+
+
+def test_validate_security_code_budgets(sms_backend):
+    _create_verification()
+    recorder = _validate(sms_backend, "SECURITY_CODE_INVALID", security_code="000000")
+    assert recorder.queries[0]["sql"].startswith('UPDATE "sms_verification"')
+    assert "RETURNING" in recorder.queries[0]["sql"]
+
+    _validate(sms_backend, "SECURITY_CODE_VALID")
+    _validate(sms_backend, "SECURITY_CODE_VERIFIED")
+    _validate(sms_backend, "SESSION_TOKEN_INVALID", session_token="unknown-token")
+
+    SMSVerification.objects.update(is_verified=False, expires_at=timezone.now() - timedelta(hours=1))
+    _validate(sms_backend, "SECURITY_CODE_EXPIRED")
+
+    SMSVerification.objects.update(failed_attempts=2)
+    recorder = _validate(sms_backend, "SECURITY_CODE_TOO_MANY_ATTEMPTS")
+    assert recorder.queries[1]["sql"].startswith("SELECT")
+
+
+def test_cleanup_phone_verifications_budget(sms_backend):
+    for index in range(3):
+        SMSVerification.objects.create(
+            phone_number=f"+1347837963{index}", security_code="123456", session_token=SESSION_TOKEN
+        )
+    SMSVerification.objects.update(created_at=timezone.now() - timedelta(days=60))
+
+    with query_budget("cleanup_phone_verifications") as recorder:
+        call_command("cleanup_phone_verifications", days=30, stdout=StringIO())
+
+    statements = [query["sql"] for query in recorder.queries if query["sql"] != "BEGIN"]
+    assert statements[0].startswith("SELECT COUNT(*)")
+    assert statements[1].startswith('DELETE FROM "sms_verification"')
+    assert not SMSVerification.objects.exists()
+
+
+def test_admin_changelist_budget(sms_backend):
+    for index in range(5):
+        SMSVerification.objects.create(
+            phone_number=f"+1347837963{index}", security_code="123456", session_token=SESSION_TOKEN
+        )
+    request = RequestFactory().get("/admin/phone_verify/smsverification/")
+    request.user = User(username="admin", is_staff=True, is_superuser=True, is_active=True)
+    model_admin = SMSVerificationAdmin(SMSVerification, admin.site)
+
+    with query_budget("admin_changelist") as recorder:
+        changelist = model_admin.get_changelist_instance(request)
+        changelist.formset = None
+        rows = [list(row) for row in result_list(changelist)["results"]]
+
+    assert len(rows) == 5
+    # The page itself is one query, however many rows it shows.
+    assert sum(1 for query in recorder.queries if "COUNT(" not in query["sql"]) == 1
+
+
+def test_query_budget_reports_every_statement():
+    with pytest.raises(QueryBudgetExceeded) as exc:
+        with query_budget("two lookups", budget=1):
+            SMSVerification.objects.filter(phone_number=PHONE_NUMBER).exists()
+            SMSVerification.objects.count()
+
+    assert exc.value.budget == 1
+    assert len(exc.value.queries) == 2
+    message = str(exc.value)
+    assert message.startswith("two lookups ran 2 queries, over its budget of 1:\n  1. SELECT %s AS")
+    assert "\n  2. SELECT COUNT(*)" in message
+
+
+def test_every_budget_is_declared():
+    assert set(QUERY_BUDGETS) >= {
+        "create_security_code_and_session_token",
+        "cleanup_phone_verifications",
+        "admin_changelist",
+    } | {f"validate_security_code.{name}" for name in (
+        "SECURITY_CODE_VALID",
+        "SECURITY_CODE_INVALID",
+        "SECURITY_CODE_EXPIRED",
+        "SECURITY_CODE_VERIFIED",
+        "SESSION_TOKEN_INVALID",
+        "SECURITY_CODE_TOO_MANY_ATTEMPTS",
+    )}
+
+
+def test_query_recorder_only_records_inside_the_block():
+    with QueryRecorder() as recorder:
+        SMSVerification.objects.count()
+    SMSVerification.objects.count()
+
+    assert recorder.count == 1
+    assert recorder.queries[0]["alias"] == "default"
+    assert recorder.queries[0]["time"] >= 0
+
+
+def test_query_count_middleware_logs_requests(caplog):
+    def view(request):
+        SMSVerification.objects.count()
+        SMSVerification.objects.count()
+        return HttpResponse()
+
+    with override_settings(DEBUG=False):
+        with pytest.raises(MiddlewareNotUsed):
+            QueryCountMiddleware(view)
+
+    with override_settings(DEBUG=True):
+        middleware = QueryCountMiddleware(view)
+    with caplog.at_level(logging.DEBUG, logger="phone_verify.diagnostics"):
+        middleware(RequestFactory().post("/phone/verify"))
+
+    assert caplog.messages[0].startswith("POST /phone/verify: 2 queries in ")
+    assert caplog.messages[1].strip().startswith("SELECT COUNT(*)")
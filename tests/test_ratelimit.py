@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+
+from unittest.mock import AsyncMock
+
+# Third Party Stuff
+import pytest
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.test import AsyncClient, override_settings
+from django.urls import reverse
+
+# phone_verify Stuff
+from phone_verify.constants import get_settings
+from phone_verify.models import SMSVerification
+from phone_verify.ratelimit import RateLimitExceeded, SlidingWindowCounter, check_send_rate_limit
+from phone_verify.services import send_security_code_and_generate_session_token
+
+pytestmark = pytest.mark.django_db
+
+PHONE_NUMBER = "+13478379634"
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+    yield
+    cache.clear()
+
+
+class FakeClock(object):
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_rate_limits_setting_is_parsed(phone_settings):
+    rate_limits = {"PHONE_NUMBER": "3/10min", "IP": "20/hours", "COUNTRY_CODE": {"*": "100/d", "+234": "5/h"}}
+    with phone_settings(RATE_LIMITS=rate_limits):
+        rate_limits = get_settings().rate_limits
+
+    assert rate_limits["PHONE_NUMBER"] == (3, 600)
+    assert rate_limits["IP"] == (20, 3600)
+    assert dict(rate_limits["COUNTRY_CODE"]) == {"*": (100, 86400), "234": (5, 3600)}
+
+
+@pytest.mark.parametrize(
+    "rate_limits, message",
+    [
+        ({"PHONE_NUMBER": "3 per hour"}, "Invalid rate '3 per hour' for PHONE_NUMBER in RATE_LIMITS"),
+        ({"IP": "0/h"}, "Invalid rate '0/h' for IP in RATE_LIMITS"),
+        ({"EMAIL": "1/h"}, "Unknown scope 'EMAIL' in RATE_LIMITS"),
+    ],
+)
+def test_invalid_rate_limits_are_rejected(phone_settings, rate_limits, message):
+    with phone_settings(RATE_LIMITS=rate_limits):
+        with pytest.raises(ImproperlyConfigured, match=message):
+            get_settings()
+
+
+def test_sliding_window_counter():
+    clock = FakeClock(now=1000.0)  # 40s into the window starting at 960
+    counter = SlidingWindowCounter(cache, clock=clock)
+
+    assert counter.hit("phone", 2, 60)[1] is None
+    assert counter.hit("phone", 2, 60)[1] is None
+    # The window is full; once it becomes the previous window, half of it
+    # has slid out 30s into the next one: 20s + 30s.
+    assert counter.hit("phone", 2, 60)[1] == 50
+
+    clock.now = 1030.0  # 10s into the next window, 2 * 50/60 hits still count
+    assert counter.hit("phone", 2, 60)[1] == 20
+
+    clock.now = 1050.0  # 30s into the next window
+    key, retry_after = counter.hit("phone", 2, 60)
+    assert retry_after is None
+    assert cache.get(key) == 1
+
+    counter.release(key)
+    assert cache.get(key) == 0
+
+
+def test_rejected_send_releases_other_limits(phone_settings):
+    with phone_settings(RATE_LIMITS={"PHONE_NUMBER": "1/h", "IP": "5/h"}):
+        check_send_rate_limit(PHONE_NUMBER, "10.0.0.1")
+
+        with pytest.raises(RateLimitExceeded) as exc:
+            check_send_rate_limit(PHONE_NUMBER, "10.0.0.1")
+        assert exc.value.scope == "PHONE_NUMBER"
+        assert exc.value.retry_after > 0
+
+        for index in range(4):
+            check_send_rate_limit(f"+1347837963{index}", "10.0.0.1")
+        with pytest.raises(RateLimitExceeded) as exc:
+            check_send_rate_limit("+13478379639", "10.0.0.1")
+        assert exc.value.scope == "IP"
+
+        # Other addresses are counted separately.
+        check_send_rate_limit("+13478379639", "10.0.0.2")
+
+
+def test_country_code_limits(phone_settings):
+    with phone_settings(RATE_LIMITS={"COUNTRY_CODE": {"*": "2/h", "44": "1/h"}}):
+        check_send_rate_limit("+447911123456")
+        with pytest.raises(RateLimitExceeded) as exc:
+            check_send_rate_limit("+447911123457")
+        assert exc.value.scope == "COUNTRY_CODE"
+
+        check_send_rate_limit("+13478379631")
+        check_send_rate_limit("+13478379632")
+        with pytest.raises(RateLimitExceeded):
+            check_send_rate_limit("+13478379633")
+
+
+def test_no_rate_limits_by_default(phone_settings, mocker):
+    mock_hit = mocker.patch.object(SlidingWindowCounter, "hit")
+    with phone_settings():
+        for _ in range(10):
+            check_send_rate_limit(PHONE_NUMBER, "10.0.0.1")
+
+    assert not mock_hit.called
+
+
+def test_service_checks_limits_before_storing_or_sending(phone_settings, mocker):
+    with phone_settings(RATE_LIMITS={"PHONE_NUMBER": "1/h"}):
+        mock_send_verification = mocker.patch("phone_verify.services.PhoneVerificationService.send_verification")
+        send_security_code_and_generate_session_token(PHONE_NUMBER)
+
+        with pytest.raises(RateLimitExceeded):
+            send_security_code_and_generate_session_token(PHONE_NUMBER)
+
+    assert mock_send_verification.call_count == 1
+    assert SMSVerification.objects.count() == 1
+
+
+def test_register_returns_429_with_retry_after(phone_settings, client, mocker, django_assert_num_queries):
+    url = reverse("phone-register")
+    with phone_settings(RATE_LIMITS={"IP": "1/min"}):
+        mock_send_verification = mocker.patch("phone_verify.services.PhoneVerificationService.send_verification")
+        assert client.post(url, {"phone_number": PHONE_NUMBER}).status_code == 200
+
+        with django_assert_num_queries(0):
+            response = client.post(url, {"phone_number": "+13478379633"})
+
+    assert response.status_code == 429
+    assert 0 < int(response["Retry-After"]) <= 120
+    assert mock_send_verification.call_count == 1
+    assert not SMSVerification.objects.filter(phone_number="+13478379633").exists()
+
+
+def test_rotating_x_forwarded_for_does_not_bypass_ip_limit(phone_settings, client, mocker):
+    url = reverse("phone-register")
+    with phone_settings(RATE_LIMITS={"IP": "1/min"}):
+        mocker.patch("phone_verify.services.PhoneVerificationService.send_verification")
+        response = client.post(url, {"phone_number": PHONE_NUMBER}, HTTP_X_FORWARDED_FOR="198.51.100.1")
+        assert response.status_code == 200
+
+        response = client.post(url, {"phone_number": "+13478379633"}, HTTP_X_FORWARDED_FOR="198.51.100.2")
+
+    assert response.status_code == 429
+
+
+def test_ip_limit_reads_x_forwarded_for_behind_configured_proxies(phone_settings, client, mocker):
+    url = reverse("phone-register")
+    rest_framework = {"NUM_PROXIES": 1}
+    with phone_settings(RATE_LIMITS={"IP": "1/min"}), override_settings(REST_FRAMEWORK=rest_framework):
+        mocker.patch("phone_verify.services.PhoneVerificationService.send_verification")
+        response = client.post(url, {"phone_number": PHONE_NUMBER}, HTTP_X_FORWARDED_FOR="198.51.100.1")
+        assert response.status_code == 200
+
+        response = client.post(url, {"phone_number": "+13478379633"}, HTTP_X_FORWARDED_FOR="198.51.100.2")
+
+    assert response.status_code == 200
+
+
+@override_settings(ROOT_URLCONF="phone_verify.async_urls")
+def test_async_register_returns_429_with_retry_after(phone_settings, mocker):
+    client = AsyncClient()
+    with phone_settings(RATE_LIMITS={"PHONE_NUMBER": "1/h"}):
+        mock_asend_verification = mocker.patch(
+            "phone_verify.services.PhoneVerificationService.asend_verification", new_callable=AsyncMock
+        )
+        response = async_to_sync(client.post)("/phone/register", {"phone_number": PHONE_NUMBER})
+        assert response.status_code == 200
+
+        response = async_to_sync(client.post)("/phone/register", {"phone_number": PHONE_NUMBER})
+
+    assert response.status_code == 429
+    assert int(response["Retry-After"]) > 0
+    assert response.json()["detail"].startswith("Request was throttled.")
+    assert mock_asend_verification.await_count == 1
@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+
+import logging
+
+# Third Party Stuff
+import pytest
+from asgiref.sync import async_to_sync
+from django.core.exceptions import ImproperlyConfigured
+
+# phone_verify Stuff
+from phone_verify.backends import get_sms_backend
+from phone_verify.backends.base import BaseBackend
+from phone_verify.backends.routing import CLOSED, HALF_OPEN, OPEN, RoutingBackend, RoutingError
+from phone_verify.services import send_security_code_and_generate_session_token
+
+pytestmark = pytest.mark.django_db
+
+US_NUMBER = "+13478379634"
+UK_NUMBER = "+447911123456"
+STUB_BACKEND = "tests.test_routing.StubBackend"
+
+
+class FakeClock(object):
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class StubError(Exception):
+    pass
+
+
+class StubBackend(BaseBackend):
+    """Provider stand-in that takes ``DELAY`` seconds and fails when ``FAIL`` is set."""
+
+    clock = None
+
+    def __init__(self, **options):
+        super().__init__(**options)
+        options = {key.lower(): value for key, value in options.items()}
+        self.name = options["name"]
+        self.delay = options.get("delay", 0.1)
+        self.fail = options.get("fail", False)
+        self.sent = []
+
+    def send_sms(self, number, message):
+        self.clock.now += self.delay
+        if self.fail:
+            raise StubError(f"{self.name} is down")
+        self.sent.append(number)
+        return f"{self.name}-{len(self.sent)}"
+
+
+@pytest.fixture
+def clock(mocker):
+    clock = FakeClock()
+    mocker.patch.object(RoutingBackend, "clock", clock)
+    mocker.patch.object(StubBackend, "clock", clock)
+    return clock
+
+
+def _routing_settings(routes=None, weights=None, **options):
+    weights = weights or {}
+    return {
+        "BACKEND": "phone_verify.backends.routing.RoutingBackend",
+        "OPTIONS": {
+            "PROVIDERS": {
+                name: {"BACKEND": STUB_BACKEND, "OPTIONS": {"NAME": name}, "WEIGHT": weights.get(name, 1)}
+                for name in ("twilio", "nexmo")
+            },
+            "ROUTES": routes or {},
+            "MIN_SAMPLES": 4,
+            "WINDOW_SIZE": 10,
+            "COOLDOWN_SECONDS": 30,
+            **options,
+        },
+    }
+
+
+def test_routes_by_country_code(phone_settings, clock):
+    with phone_settings(**_routing_settings(routes={"+44": ["nexmo", "twilio"], "*": ["twilio"]})):
+        backend = get_sms_backend(US_NUMBER)
+        assert backend.send_sms(UK_NUMBER, "Hello") == "nexmo-1"
+        assert backend.send_sms(US_NUMBER, "Hello") == "twilio-1"
+
+    assert backend.providers["nexmo"].sent == [UK_NUMBER]
+    assert backend.providers["twilio"].sent == [US_NUMBER]
+
+
+def test_weighted_split(phone_settings, clock):
+    with phone_settings(**_routing_settings(weights={"twilio": 9, "nexmo": 1})):
+        backend = get_sms_backend(US_NUMBER)
+        for _ in range(500):
+            backend.send_sms(US_NUMBER, "Hello")
+
+    assert 400 < len(backend.providers["twilio"].sent) < 490
+    assert len(backend.providers["twilio"].sent) + len(backend.providers["nexmo"].sent) == 500
+
+
+def test_fails_over_and_opens_breaker_on_errors(phone_settings, clock):
+    with phone_settings(**_routing_settings(routes={"*": ["twilio", "nexmo"]})):
+        backend = get_sms_backend(US_NUMBER)
+        twilio, nexmo = backend.providers["twilio"], backend.providers["nexmo"]
+        twilio.fail = True
+
+        for index in range(1, 5):
+            assert backend.send_sms(US_NUMBER, "Hello") == f"nexmo-{index}"
+        assert backend.health["twilio"].state == OPEN
+        assert backend.health["twilio"].error_rate == 1.0
+
+        # While open, twilio is skipped without being tried.
+        twilio.fail = False
+        backend.send_sms(US_NUMBER, "Hello")
+        assert twilio.sent == []
+        assert len(nexmo.sent) == 5
+
+        # After the cool-down one trial send goes through and closes the breaker.
+        clock.now += 30
+        assert backend.send_sms(US_NUMBER, "Hello") == "twilio-1"
+        assert backend.health["twilio"].state == CLOSED
+        assert backend.health["twilio"].error_rate == 0.0
+
+
+def test_recovering_provider_later_in_the_list_keeps_its_trial(phone_settings, clock):
+    routes = {"+44": ["nexmo", "twilio"], "*": ["twilio", "nexmo"]}
+    with phone_settings(**_routing_settings(routes=routes)):
+        backend = get_sms_backend(US_NUMBER)
+        twilio = backend.providers["twilio"]
+        twilio.fail = True
+        for _ in range(4):
+            backend.send_sms(US_NUMBER, "Hello")
+        assert backend.health["twilio"].state == OPEN
+
+        twilio.fail = False
+        clock.now += 30
+        # Sent by nexmo, first for the UK, without using up twilio's trial.
+        for _ in range(3):
+            assert backend.send_sms(UK_NUMBER, "Hello").startswith("nexmo-")
+        assert twilio.sent == []
+
+        assert backend.send_sms(US_NUMBER, "Hello") == "twilio-1"
+        assert backend.health["twilio"].state == CLOSED
+
+
+def test_failed_trial_reopens_breaker(phone_settings, clock):
+    with phone_settings(**_routing_settings(routes={"*": ["twilio", "nexmo"]})):
+        backend = get_sms_backend(US_NUMBER)
+        health = backend.health["twilio"]
+        backend.providers["twilio"].fail = True
+        for _ in range(4):
+            backend.send_sms(US_NUMBER, "Hello")
+        assert health.state == OPEN
+
+        clock.now += 30
+        assert health.allow_request()
+        assert health.state == HALF_OPEN
+        # Only one trial at a time.
+        assert not health.allow_request()
+        health.record(0.1, ok=False)
+        assert health.state == OPEN
+        assert not health.allow_request()
+
+
+def test_opens_breaker_on_p95_latency(phone_settings, clock):
+    with phone_settings(**_routing_settings(routes={"*": ["twilio", "nexmo"]}, LATENCY_THRESHOLD=1.0)):
+        backend = get_sms_backend(US_NUMBER)
+        backend.providers["twilio"].delay = 2.5
+        for _ in range(4):
+            assert backend.send_sms(US_NUMBER, "Hello").startswith("twilio-")
+
+        health = backend.health["twilio"]
+        assert health.state == OPEN
+        assert health.p95_latency == pytest.approx(2.5)
+        assert backend.send_sms(US_NUMBER, "Hello") == "nexmo-1"
+
+
+def test_all_providers_failing(phone_settings, clock, caplog):
+    with phone_settings(**_routing_settings(routes={"*": ["twilio", "nexmo"]})):
+        backend = get_sms_backend(US_NUMBER)
+        backend.providers["twilio"].fail = True
+        backend.providers["nexmo"].fail = True
+
+        with pytest.raises(RoutingError) as exc:
+            backend.send_sms(US_NUMBER, "Hello")
+        assert [name for name, _ in exc.value.errors] == ["twilio", "nexmo"]
+
+        with caplog.at_level(logging.ERROR):
+            assert send_security_code_and_generate_session_token(US_NUMBER)
+        assert "All providers failed: twilio: twilio is down; nexmo: nexmo is down" in caplog.text
+
+
+def test_open_breakers_are_tried_when_nothing_else_is_left(phone_settings, clock):
+    with phone_settings(**_routing_settings(routes={"*": ["twilio"]})):
+        backend = get_sms_backend(US_NUMBER)
+        backend.providers["twilio"].fail = True
+        for _ in range(4):
+            with pytest.raises(RoutingError):
+                backend.send_sms(US_NUMBER, "Hello")
+        assert backend.health["twilio"].state == OPEN
+
+        backend.providers["twilio"].fail = False
+        assert backend.send_sms(US_NUMBER, "Hello") == "twilio-1"
+
+
+def test_async_send_fails_over(phone_settings, clock):
+    with phone_settings(**_routing_settings(routes={"*": ["twilio", "nexmo"]})):
+        backend = get_sms_backend(US_NUMBER)
+        backend.providers["twilio"].fail = True
+
+        assert async_to_sync(backend.asend_sms)(US_NUMBER, "Hello") == "nexmo-1"
+        assert backend.health["twilio"].error_rate == 1.0
+        assert backend.health["nexmo"].p95_latency == pytest.approx(0.1)
+
+
+@pytest.mark.parametrize(
+    "options, message",
+    [
+        ({"PROVIDERS": {}}, "RoutingBackend needs at least one provider"),
+        ({"PROVIDERS": {"twilio": {"OPTIONS": {}}}}, "Please specify BACKEND for provider 'twilio'"),
+        ({"ROUTES": {"44": ["sinch"]}}, "Unknown provider\\(s\\) in RoutingBackend ROUTES: sinch"),
+    ],
+)
+def test_invalid_configuration(phone_settings, options, message):
+    with phone_settings(**_routing_settings(**options)):
+        with pytest.raises(ImproperlyConfigured, match=message):
+            get_sms_backend(US_NUMBER)
@@ -7,6 +7,7 @@ import warnings
 import pytest
 from django.conf import settings
 from django.core.exceptions import ImproperlyConfigured
+from django.db import DatabaseError
 from django.test import override_settings
 from nexmo.errors import ClientError
 from twilio.base.exceptions import TwilioRestException
@@ -16,9 +17,12 @@ import phone_verify.services
 from phone_verify.backends import get_sms_backend
 from phone_verify.backends.base import BaseBackend
 from phone_verify.constants import get_security_code_expiration
+from phone_verify.dispatch import OutboxDispatcher, SynchronousDispatcher, ThreadPoolDispatcher, get_dispatcher
+from phone_verify.models import SMSOutbox, SMSVerification
 from phone_verify.services import (
     PhoneVerificationService,
     send_security_code_and_generate_session_token,
+    send_security_codes_and_generate_session_tokens,
     verify_security_code,
 )
 
@@ -237,3 +241,90 @@ def test_i18n_message_generation_and_sending_service(client, mocker, backend):
             app=backend['APP_NAME'], security_code="123456"
         )
         mock_api.assert_called_with("+13478379634", actual_message)
+
+
+def test_thread_pool_dispatcher_sends_in_background(backend, mocker):
+    backend["DISPATCHER"] = "phone_verify.dispatch.ThreadPoolDispatcher"
+    backend["DISPATCHER_OPTIONS"] = {"MAX_WORKERS": 2}
+    with override_settings(PHONE_VERIFICATION=backend):
+        mock_send_sms = mocker.patch(f"{backend['BACKEND']}.send_sms")
+        session_token = send_security_code_and_generate_session_token("+13478379634")
+        dispatcher = get_dispatcher()
+        assert isinstance(dispatcher, ThreadPoolDispatcher)
+        dispatcher.executor.shutdown(wait=True)
+
+    assert session_token
+    mock_send_sms.assert_called_once()
+    assert mock_send_sms.call_args[0][0] == "+13478379634"
+
+
+def test_thread_pool_dispatcher_logs_send_errors(backend, mocker):
+    backend["DISPATCHER"] = "phone_verify.dispatch.ThreadPoolDispatcher"
+    with override_settings(PHONE_VERIFICATION=backend):
+        mocker.patch(f"{backend['BACKEND']}.send_sms", side_effect=RuntimeError("provider down"))
+        mock_logger = mocker.patch("phone_verify.dispatch.logger")
+        send_security_code_and_generate_session_token("+13478379634")
+        get_dispatcher().executor.shutdown(wait=True)
+
+    mock_logger.error.assert_called_once_with(
+        "Error in sending verification code to +13478379634: provider down"
+    )
+
+
+def test_outbox_dispatcher_queues_message(backend, mocker):
+    backend["DISPATCHER"] = "phone_verify.dispatch.OutboxDispatcher"
+    with override_settings(PHONE_VERIFICATION=backend):
+        mock_send_sms = mocker.patch(f"{backend['BACKEND']}.send_sms")
+        send_security_code_and_generate_session_token("+13478379634")
+
+    assert not mock_send_sms.called
+    verification = SMSVerification.objects.get(phone_number="+13478379634")
+    outbox = SMSOutbox.objects.get()
+    assert outbox.status == SMSOutbox.STATUS_PENDING
+    assert str(outbox.phone_number) == "+13478379634"
+    assert verification.security_code in outbox.message
+
+
+def test_outbox_dispatcher_enqueues_in_the_same_transaction(backend, mocker):
+    backend["DISPATCHER"] = "phone_verify.dispatch.OutboxDispatcher"
+    with override_settings(PHONE_VERIFICATION=backend):
+        mocker.patch.object(OutboxDispatcher, "dispatch", side_effect=DatabaseError("outbox unavailable"))
+        with pytest.raises(DatabaseError):
+            send_security_code_and_generate_session_token("+13478379634")
+
+    # The code was rolled back with the failed enqueue: no code without its message.
+    assert not SMSVerification.objects.exists()
+    assert not SMSOutbox.objects.exists()
+
+
+def test_get_dispatcher_defaults_to_synchronous(backend):
+    with override_settings(PHONE_VERIFICATION=backend):
+        assert isinstance(get_dispatcher(), SynchronousDispatcher)
+
+
+def test_send_security_codes_and_generate_session_tokens(backend, mocker):
+    numbers = ["+13478379634", "+13478379633", "+13478379632"]
+    with override_settings(PHONE_VERIFICATION=backend):
+        SMSVerification.objects.create(phone_number=numbers[0], security_code="111111", session_token="old")
+
+        def send(number, message):
+            if number == numbers[1]:
+                raise ValueError("provider down")
+            return "id"
+
+        mock_send = mocker.patch(f"{backend['BACKEND']}._send_bulk_message", side_effect=send)
+        mock_logger = mocker.patch("phone_verify.services.logger")
+
+        session_tokens = send_security_codes_and_generate_session_tokens(numbers + [numbers[0]], batch_size=2)
+
+    assert list(session_tokens) == numbers
+    assert not SMSVerification.objects.filter(session_token="old").exists()
+    for number in numbers:
+        verification = SMSVerification.objects.get(phone_number=number)
+        assert verification.session_token == session_tokens[number]
+        mock_send.assert_any_call(
+            number,
+            f"Welcome to Phone Verify! Please use security code {verification.security_code} to proceed.",
+        )
+    assert mock_send.call_count == 3
+    mock_logger.error.assert_called_once_with(f"Error in sending verification code to {numbers[1]}: provider down")
@@ -1,8 +1,26 @@
+import os
+
+# PHONE_VERIFY_TEST_DATABASE=postgresql runs the suite, including the
+# PostgreSQL-only tests, against PostgreSQL configured with the usual PGHOST,
+# PGPORT, PGUSER and PGPASSWORD environment variables.
+if os.environ.get("PHONE_VERIFY_TEST_DATABASE") == "postgresql":
+    DATABASE = {
+        "ENGINE": "django.db.backends.postgresql",
+        "NAME": os.environ.get("PGDATABASE", "phone_verify"),
+        "HOST": os.environ.get("PGHOST", "localhost"),
+        "PORT": os.environ.get("PGPORT", "5432"),
+        "USER": os.environ.get("PGUSER", ""),
+        "PASSWORD": os.environ.get("PGPASSWORD", ""),
+    }
+else:
+    DATABASE = {"ENGINE": "django.db.backends.sqlite3"}
+
 DJANGO_SETTINGS = {
     "SECRET_KEY": "change-me-later",
-    "DATABASES": {"default": {"ENGINE": "django.db.backends.sqlite3"}},
+    "DATABASES": {"default": DATABASE},
     "ROOT_URLCONF": "phone_verify.urls",
     "INSTALLED_APPS": [
+        "django.contrib.admin",
         "django.contrib.auth",
         "django.contrib.contenttypes",
         "phone_verify",
@@ -0,0 +1,332 @@
+# -*- coding: utf-8 -*-
+
+import hashlib
+import threading
+import time
+from datetime import timedelta
+
+# Third Party Stuff
+import pytest
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.db import OperationalError, connection
+from django.utils import timezone
+from freezegun import freeze_time
+
+# phone_verify Stuff
+from phone_verify.backends import get_sms_backend
+from phone_verify.backends.base import BaseBackend
+from phone_verify.models import SMSVerification
+from phone_verify.storage import (
+    CacheVerificationStore,
+    ModelVerificationStore,
+    get_verification_store,
+    security_code_digest,
+)
+
+pytestmark = pytest.mark.django_db
+
+PHONE_NUMBER = "+13478379634"
+
+STORES = {
+    "model": "phone_verify.storage.ModelVerificationStore",
+    "model_hashed": "phone_verify.storage.ModelVerificationStore",
+    "cache": "phone_verify.storage.CacheVerificationStore",
+}
+STORAGE_OPTIONS = {
+    "model_hashed": {"HASH_SECURITY_CODES": True},
+}
+
+
+@pytest.fixture(params=sorted(STORES))
+def store(request, phone_settings):
+    """Run a test against each built-in store, backed by the local-memory cache."""
+    cache.clear()
+    with phone_settings(
+        STORAGE=STORES[request.param],
+        STORAGE_OPTIONS=STORAGE_OPTIONS.get(request.param, {}),
+        SECURITY_CODE_EXPIRATION_SECONDS=60,
+        MAX_FAILED_ATTEMPTS=2,
+    ):
+        yield request.param
+    cache.clear()
+
+
+def test_get_verification_store(store):
+    expected = CacheVerificationStore if store == "cache" else ModelVerificationStore
+    assert type(get_verification_store()) is expected
+    assert get_sms_backend(PHONE_NUMBER).store is get_verification_store()
+
+
+def test_validate_statuses(store, settings):
+    backend = get_sms_backend(PHONE_NUMBER)
+    security_code, session_token = backend.create_security_code_and_session_token(PHONE_NUMBER)
+
+    verification, status = backend.validate_security_code("000000", PHONE_NUMBER, "unknown-token")
+    assert (verification, status) == (None, BaseBackend.SESSION_TOKEN_INVALID)
+
+    verification, status = backend.validate_security_code("000000", PHONE_NUMBER, session_token)
+    assert status == BaseBackend.SECURITY_CODE_INVALID
+    assert verification.failed_attempts == 1
+
+    verification, status = backend.validate_security_code(security_code, PHONE_NUMBER, session_token)
+    assert status == BaseBackend.SECURITY_CODE_VALID
+    assert verification.is_verified is True
+    assert verification.failed_attempts == 0
+    assert str(verification.phone_number) == PHONE_NUMBER
+
+    settings.PHONE_VERIFICATION = {**settings.PHONE_VERIFICATION, "VERIFY_SECURITY_CODE_ONLY_ONCE": True}
+    verification, status = backend.validate_security_code(security_code, PHONE_NUMBER, session_token)
+    assert status == BaseBackend.SECURITY_CODE_VERIFIED
+
+    verification, status = backend.validate_security_code("000000", PHONE_NUMBER, session_token)
+    assert status == BaseBackend.SECURITY_CODE_INVALID
+    verification, status = backend.validate_security_code(security_code, PHONE_NUMBER, session_token)
+    assert status == BaseBackend.SECURITY_CODE_TOO_MANY_ATTEMPTS
+    assert verification.failed_attempts == 2
+
+
+def test_validate_expired(store):
+    backend = get_sms_backend(PHONE_NUMBER)
+    security_code, session_token = backend.create_security_code_and_session_token(PHONE_NUMBER)
+
+    with freeze_time(timezone.now() + timedelta(seconds=61)):
+        verification, status = backend.validate_security_code(security_code, PHONE_NUMBER, session_token)
+
+    assert status == BaseBackend.SECURITY_CODE_EXPIRED
+    assert verification.is_verified is False
+
+
+def test_new_code_replaces_previous_session(store):
+    backend = get_sms_backend(PHONE_NUMBER)
+    old_code, old_token = backend.create_security_code_and_session_token(PHONE_NUMBER)
+    new_code, new_token = backend.create_security_code_and_session_token(PHONE_NUMBER)
+
+    _, status = backend.validate_security_code(old_code, PHONE_NUMBER, old_token)
+    assert status == BaseBackend.SESSION_TOKEN_INVALID
+    _, status = backend.validate_security_code(new_code, PHONE_NUMBER, new_token)
+    assert status == BaseBackend.SECURITY_CODE_VALID
+
+
+def test_save_many(store):
+    numbers = ["+13478379634", "+13478379633", "+13478379632"]
+    backend = get_sms_backend(None)
+    issued = backend.create_security_codes_and_session_tokens(numbers, batch_size=2)
+
+    for number, security_code, session_token in issued:
+        _, status = backend.validate_security_code(security_code, number, session_token)
+        assert status == BaseBackend.SECURITY_CODE_VALID
+
+
+def test_sandbox_bypass(store, settings):
+    settings.PHONE_VERIFICATION = {
+        **settings.PHONE_VERIFICATION,
+        "BACKEND": "phone_verify.backends.twilio.TwilioSandboxBackend",
+    }
+    backend = get_sms_backend(PHONE_NUMBER)
+    _, session_token = backend.create_security_code_and_session_token(PHONE_NUMBER)
+
+    verification, status = backend.validate_security_code("123456", PHONE_NUMBER, "unknown-token")
+    assert status == BaseBackend.SECURITY_CODE_VALID
+    assert not verification
+
+    backend.validate_security_code("000000", PHONE_NUMBER, session_token)
+    backend.validate_security_code("000000", PHONE_NUMBER, session_token)
+    _, status = backend.validate_security_code("123456", PHONE_NUMBER, session_token)
+    assert status == BaseBackend.SECURITY_CODE_TOO_MANY_ATTEMPTS
+
+
+def test_async_save_and_validate(store):
+    backend = get_sms_backend(PHONE_NUMBER)
+    security_code, session_token = async_to_sync(backend.acreate_security_code_and_session_token)(PHONE_NUMBER)
+
+    _, status = async_to_sync(backend.avalidate_security_code)("000000", PHONE_NUMBER, session_token)
+    assert status == BaseBackend.SECURITY_CODE_INVALID
+    _, status = async_to_sync(backend.avalidate_security_code)(security_code, PHONE_NUMBER, session_token)
+    assert status == BaseBackend.SECURITY_CODE_VALID
+
+
+@pytest.fixture
+def cache_store(phone_settings):
+    cache.clear()
+    with phone_settings(
+        STORAGE=STORES["cache"],
+        STORAGE_OPTIONS={"KEY_PREFIX": "otp", "GRACE_SECONDS": 30},
+        SECURITY_CODE_EXPIRATION_SECONDS=60,
+        MAX_FAILED_ATTEMPTS=5,
+    ):
+        yield get_verification_store()
+    cache.clear()
+
+
+def test_cache_store_uses_ttl_and_never_touches_the_database(cache_store, mocker, django_assert_num_queries):
+    mock_set = mocker.spy(cache, "set")
+    backend = get_sms_backend(PHONE_NUMBER)
+
+    with django_assert_num_queries(0):
+        security_code, session_token = backend.create_security_code_and_session_token(PHONE_NUMBER)
+        backend.validate_security_code(security_code, PHONE_NUMBER, session_token)
+
+    assert mock_set.call_args_list[0] == mocker.call(
+        "otp:verification:{}".format(PHONE_NUMBER), mocker.ANY, 90
+    )
+    assert not SMSVerification.objects.exists()
+
+
+def test_cache_store_counts_concurrent_failures_atomically(cache_store):
+    backend = get_sms_backend(PHONE_NUMBER)
+    _, session_token = backend.create_security_code_and_session_token(PHONE_NUMBER)
+    statuses = []
+    barrier = threading.Barrier(10)
+
+    def guess():
+        barrier.wait()
+        statuses.append(backend.validate_security_code("000000", PHONE_NUMBER, session_token)[1])
+
+    threads = [threading.Thread(target=guess) for _ in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert statuses.count(BaseBackend.SECURITY_CODE_INVALID) == 5
+    assert statuses.count(BaseBackend.SECURITY_CODE_TOO_MANY_ATTEMPTS) == 5
+    digest = hashlib.sha256(session_token.encode()).hexdigest()
+    assert cache.get("otp:attempts:{}:{}".format(PHONE_NUMBER, digest)) == 5
+
+
+def test_cache_store_verify_racing_a_new_registration_keeps_the_new_code(cache_store, mocker):
+    backend = get_sms_backend(PHONE_NUMBER)
+    security_code, session_token = backend.create_security_code_and_session_token(PHONE_NUMBER)
+    new_codes = []
+    get_status = cache_store._get_status
+
+    def register_while_verifying(verification, security_code):
+        new_codes.append(backend.create_security_code_and_session_token(PHONE_NUMBER))
+        return get_status(verification, security_code)
+
+    mocker.patch.object(cache_store, "_get_status", side_effect=register_while_verifying)
+    verification, status = backend.validate_security_code(security_code, PHONE_NUMBER, session_token)
+    mocker.stopall()
+
+    assert status == BaseBackend.SECURITY_CODE_VALID
+    new_security_code, new_session_token = new_codes[0]
+    verification, status = backend.validate_security_code(new_security_code, PHONE_NUMBER, new_session_token)
+    assert status == BaseBackend.SECURITY_CODE_VALID
+    assert backend.validate_security_code(security_code, PHONE_NUMBER, session_token)[1] == (
+        BaseBackend.SESSION_TOKEN_INVALID
+    )
+
+
+@pytest.fixture
+def model_store(phone_settings):
+    with phone_settings(MAX_FAILED_ATTEMPTS=5):
+        yield get_verification_store()
+
+
+def test_model_store_upserts_on_phone_number(model_store, django_assert_num_queries):
+    backend = get_sms_backend(PHONE_NUMBER)
+    _, old_token = backend.create_security_code_and_session_token(PHONE_NUMBER)
+    backend.validate_security_code("000000", PHONE_NUMBER, old_token)
+    old = SMSVerification.objects.get()
+
+    with freeze_time(timezone.now() + timedelta(seconds=30)), django_assert_num_queries(1):
+        security_code, session_token = backend.create_security_code_and_session_token(PHONE_NUMBER)
+
+    new = SMSVerification.objects.get()
+    assert new.pk == old.pk
+    assert (new.security_code, new.session_token) == (security_code, session_token)
+    assert new.failed_attempts == 0
+    assert new.is_verified is False
+    assert new.created_at > old.created_at
+
+
+def test_model_store_without_upsert_support(model_store, mocker):
+    mocker.patch.object(ModelVerificationStore, "_upsert_kwargs", return_value=None)
+    backend = get_sms_backend(PHONE_NUMBER)
+    backend.create_security_code_and_session_token(PHONE_NUMBER)
+    _, session_token = backend.create_security_code_and_session_token(PHONE_NUMBER)
+    _, other_token = async_to_sync(backend.acreate_security_code_and_session_token)("+13478379633")
+    issued = backend.create_security_codes_and_session_tokens([PHONE_NUMBER, "+13478379632"])
+
+    assert SMSVerification.objects.count() == 3
+    assert SMSVerification.objects.get(phone_number=PHONE_NUMBER).session_token == issued[0][2]
+    assert SMSVerification.objects.get(phone_number="+13478379633").session_token == other_token
+
+
+@pytest.fixture
+def hashed_store(phone_settings):
+    with phone_settings(STORAGE_OPTIONS={"HASH_SECURITY_CODES": True}, MAX_FAILED_ATTEMPTS=5):
+        yield get_verification_store()
+
+
+def test_hashed_store_keeps_only_a_digest(hashed_store):
+    backend = get_sms_backend(PHONE_NUMBER)
+    security_code, session_token = backend.create_security_code_and_session_token(PHONE_NUMBER)
+
+    verification = SMSVerification.objects.get()
+    digest = bytes(verification.security_code_digest)
+    assert verification.security_code == ""
+    assert len(digest) == 32
+    assert digest == security_code_digest(PHONE_NUMBER, security_code)
+    assert digest != security_code_digest("+13478379633", security_code)
+
+    _, status = backend.validate_security_code(security_code, PHONE_NUMBER, session_token)
+    assert status == BaseBackend.SECURITY_CODE_VALID
+
+
+def test_hashed_store_row_lock_fallback(hashed_store, mocker):
+    mocker.patch("phone_verify.storage._supports_update_returning", return_value=False)
+    backend = get_sms_backend(PHONE_NUMBER)
+    security_code, session_token = backend.create_security_code_and_session_token(PHONE_NUMBER)
+
+    verification, status = backend.validate_security_code("000000", PHONE_NUMBER, session_token)
+    assert status == BaseBackend.SECURITY_CODE_INVALID
+    assert verification.failed_attempts == 1
+    _, status = backend.validate_security_code(security_code, PHONE_NUMBER, session_token)
+    assert status == BaseBackend.SECURITY_CODE_VALID
+
+
+def test_hashed_store_rejects_codes_stored_in_plain_text(hashed_store):
+    ModelVerificationStore().save(PHONE_NUMBER, "123456", "plain-token")
+
+    _, status = get_sms_backend(PHONE_NUMBER).validate_security_code("123456", PHONE_NUMBER, "plain-token")
+
+    assert status == BaseBackend.SECURITY_CODE_INVALID
+
+
+@pytest.mark.django_db(transaction=True)
+def test_concurrent_registers_for_one_number_leave_one_row(model_store):
+    backend = get_sms_backend(PHONE_NUMBER)
+    session_tokens = []
+    errors = []
+    barrier = threading.Barrier(8)
+
+    def register():
+        barrier.wait()
+        try:
+            while True:
+                try:
+                    session_tokens.append(backend.create_security_code_and_session_token(PHONE_NUMBER)[1])
+                    return
+                except OperationalError as exc:
+                    # The shared-cache in-memory SQLite test database reports
+                    # writer contention immediately instead of waiting.
+                    if "locked" not in str(exc):
+                        raise
+                    time.sleep(0.001)
+        except Exception as exc:
+            errors.append(exc)
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=register) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert len(session_tokens) == 8
+    verification = SMSVerification.objects.get(phone_number=PHONE_NUMBER)
+    assert verification.session_token in session_tokens
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+
+import time
+from unittest.mock import patch
+
+# Third Party Stuff
+import jwt
+import pytest
+from django.conf import settings
+
+# phone_verify Stuff
+from phone_verify import tokens
+from phone_verify.backends.base import BaseBackend
+from phone_verify.tokens import (
+    CompactSessionTokenGenerator,
+    JWTSessionTokenGenerator,
+    NonceBuffer,
+    get_session_token_generator,
+)
+
+PHONE_NUMBER = "+13478379634"
+
+
+class CustomGenerator(JWTSessionTokenGenerator):
+    pass
+
+
+def test_jwt_session_token_decodes_with_pyjwt():
+    exp = int(time.time()) + 60
+    generator = JWTSessionTokenGenerator()
+    session_token = generator.generate(PHONE_NUMBER, exp)
+
+    assert jwt.get_unverified_header(session_token) == {"alg": "HS256", "typ": "JWT"}
+    payload = jwt.decode(session_token, settings.SECRET_KEY, algorithms=["HS256"])
+    assert payload["phone_number"] == PHONE_NUMBER
+    assert payload["exp"] == exp
+    assert len(payload["nonce"]) == 11
+    assert generator.check(session_token, PHONE_NUMBER) is None
+    assert "exp" not in jwt.decode(generator.generate(PHONE_NUMBER), settings.SECRET_KEY, algorithms=["HS256"])
+
+
+@pytest.mark.parametrize("generator_cls", [JWTSessionTokenGenerator, CompactSessionTokenGenerator])
+@pytest.mark.parametrize("buffer_size", [0, 16])
+def test_session_tokens_are_unique(generator_cls, buffer_size):
+    generator = generator_cls(BUFFER_SIZE=buffer_size)
+
+    assert len({generator.generate(PHONE_NUMBER) for _ in range(100)}) == 100
+
+
+def test_nonce_buffer_draws_nonces_in_blocks():
+    buffer = NonceBuffer(8, size=4)
+    with patch("phone_verify.tokens.secrets.token_bytes", wraps=tokens.secrets.token_bytes) as token_bytes:
+        nonces = [buffer.take() for _ in range(8)]
+
+    assert [call.args for call in token_bytes.call_args_list] == [(32,), (32,)]
+    assert len(set(nonces)) == 8
+    assert all(len(nonce) == 8 for nonce in nonces)
+
+
+def test_nonce_buffer_is_emptied_after_fork():
+    buffer = NonceBuffer(8, size=4)
+    buffer.take()
+
+    # What `os.register_at_fork` runs in the child.
+    tokens._discard_buffers()
+
+    with patch("phone_verify.tokens.secrets.token_bytes", wraps=tokens.secrets.token_bytes) as token_bytes:
+        buffer.take()
+    assert token_bytes.call_count == 1
+
+
+def test_session_token_generator_follows_settings(phone_settings):
+    with phone_settings(
+        SESSION_TOKEN_FORMAT="tests.test_tokens.CustomGenerator",
+        SESSION_TOKEN_OPTIONS={"BUFFER_SIZE": 64},
+    ):
+        generator = get_session_token_generator()
+        assert isinstance(generator, CustomGenerator)
+        assert generator.nonces.size == 64
+        assert get_session_token_generator() is generator
+        assert BaseBackend.generate_session_token(PHONE_NUMBER).count(".") == 2
+
+    with phone_settings(SESSION_TOKEN_FORMAT="compact"):
+        assert isinstance(get_session_token_generator(), CompactSessionTokenGenerator)
+    assert type(get_session_token_generator()) is JWTSessionTokenGenerator